@@ -1,32 +1,85 @@
 from datetime import datetime, timedelta, timezone
-from typing import Optional
+from typing import Dict, Optional
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from concurrent.futures import ThreadPoolExecutor
+from cache import LRUCache
+from database import db
+import asyncio
+import hashlib
+import logging
 import os
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
 
 # Configuration
 SECRET_KEY = os.environ.get("JWT_SECRET_KEY", "slayk-super-secret-key-change-in-production")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24  # 24 hours
 
+# Verified token payloads, keyed by token digest, so repeat requests skip jwt.decode
+TOKEN_CACHE_MAX_ENTRIES = int(os.environ.get("TOKEN_CACHE_MAX_ENTRIES", "10000"))
+# Each worker reloads revocations from Mongo this often to pick up other workers' logouts
+REVOKED_TOKENS_REFRESH_SECONDS = float(os.environ.get("REVOKED_TOKENS_REFRESH_SECONDS", "30"))
+
+# bcrypt releases the GIL, so hashing runs on a small thread pool instead of the event loop.
+# Jobs beyond the workers plus the queue limit are rejected with 503 rather than piling up.
+PASSWORD_HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+PASSWORD_HASH_QUEUE_LIMIT = int(os.environ.get("PASSWORD_HASH_QUEUE_LIMIT", "16"))
+
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 security = HTTPBearer()
 
+_password_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash")
+_password_jobs = 0
+
+token_cache = LRUCache(maxsize=TOKEN_CACHE_MAX_ENTRIES)
+# Revoked token ids -> exp timestamp, mirrored from the revoked_tokens collection
+_revoked: Dict[str, float] = {}
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
+async def run_password_job(func, *args):
+    """Run a bcrypt call on the password pool, or fail fast with 503 when it is saturated."""
+    global _password_jobs
+    if _password_jobs >= PASSWORD_HASH_WORKERS + PASSWORD_HASH_QUEUE_LIMIT:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many sign-in attempts in progress, please retry",
+            headers={"Retry-After": "1"},
+        )
+    _password_jobs += 1
+    loop = asyncio.get_running_loop()
+    future = _password_executor.submit(func, *args)
+    # A cancelled request doesn't stop a running bcrypt call, so the job counts until it finishes
+    future.add_done_callback(lambda _: loop.call_soon_threadsafe(password_job_done))
+    return await asyncio.wrap_future(future)
+
+def password_job_done() -> None:
+    global _password_jobs
+    _password_jobs -= 1
+
+async def check_password(plain_password: str, hashed_password: str) -> bool:
+    return await run_password_job(verify_password, plain_password, hashed_password)
+
+async def hash_password(password: str) -> str:
+    return await run_password_job(get_password_hash, password)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     to_encode = data.copy()
     if expires_delta:
         expire = datetime.now(timezone.utc) + expires_delta
     else:
         expire = datetime.now(timezone.utc) + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
+    to_encode.update({"exp": expire, "jti": uuid.uuid4().hex})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
@@ -37,9 +90,66 @@ def decode_token(token: str) -> Optional[dict]:
     except JWTError:
         return None
 
+def token_digest(token: str) -> bytes:
+    return hashlib.blake2b(token.encode(), digest_size=16).digest()
+
+def token_id(payload: dict, digest: bytes) -> str:
+    # Tokens issued before jti was added are identified by their digest
+    return payload.get("jti") or digest.hex()
+
+def verify_token(token: str) -> Optional[dict]:
+    """Decode and verify a token, using the cache, and reject revoked ones."""
+    digest = token_digest(token)
+    payload = token_cache.get(digest)
+    if payload is None:
+        payload = decode_token(token)
+        if payload is None:
+            return None
+        if "exp" in payload:
+            token_cache.set(digest, payload, payload["exp"])
+    if token_id(payload, digest) in _revoked:
+        return None
+    return payload
+
+async def revoke_token(token: str, payload: dict) -> None:
+    digest = token_digest(token)
+    jti = token_id(payload, digest)
+    exp = payload.get("exp", time.time() + ACCESS_TOKEN_EXPIRE_MINUTES * 60)
+    # The TTL index drops the record once the token would have expired anyway
+    await db.revoked_tokens.update_one(
+        {"jti": jti},
+        {"$setOnInsert": {"jti": jti, "expires_at": datetime.fromtimestamp(exp, tz=timezone.utc)}},
+        upsert=True
+    )
+    _revoked[jti] = exp
+    token_cache.invalidate(digest)
+
+async def load_revoked_tokens() -> int:
+    """Merge unexpired revocations from Mongo into the in-memory set and drop expired ones."""
+    revoked = {
+        doc['jti']: doc['expires_at'].timestamp()
+        async for doc in db.revoked_tokens.find(
+            {"expires_at": {"$gt": datetime.now(timezone.utc)}},
+            {"_id": 0, "jti": 1, "expires_at": 1}
+        )
+    }
+    now = time.time()
+    for jti in [jti for jti, exp in _revoked.items() if exp <= now]:
+        del _revoked[jti]
+    _revoked.update(revoked)
+    return len(_revoked)
+
+async def refresh_revoked_tokens_periodically(interval: float = REVOKED_TOKENS_REFRESH_SECONDS) -> None:
+    """Background job for the app lifespan."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await load_revoked_tokens()
+        except Exception:
+            logger.exception("Reloading revoked tokens failed")
+
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    token = credentials.credentials
-    payload = decode_token(token)
+    payload = verify_token(credentials.credentials)
     if payload is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -0,0 +1,123 @@
+"""
+Count the MongoDB commands each write route sends
+Run: python -m benchmarks.commands [--db slayk_command_counts] [--output FILE]
+
+Needs MONGO_URL to point at a running server. The routes run in-process
+against a scratch database (dropped afterwards), and a CommandListener
+records every command sent while each request is handled. The process exits
+non-zero when a route sends more commands than its budget, so an extra
+round trip shows up as a failure.
+"""
+from pymongo import monitoring
+from typing import List
+import argparse
+import asyncio
+import json
+import os
+import sys
+
+from benchmarks.asgi import asgi_request
+
+
+class CommandCounter(monitoring.CommandListener):
+    def __init__(self):
+        self.commands: List[str] = []
+        self.recording = False
+
+    def started(self, event):
+        if self.recording:
+            self.commands.append(event.command_name)
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+counter = CommandCounter()
+
+
+async def count(app, method: str, path: str, body=None, params=None) -> dict:
+    counter.commands = []
+    counter.recording = True
+    try:
+        status, _, _ = await asgi_request(
+            app, method, path, params,
+            headers={"content-type": "application/json"},
+            body=json.dumps(body).encode() if body is not None else b"",
+        )
+    finally:
+        counter.recording = False
+    return {"status": status, "commands": counter.commands}
+
+
+async def run() -> dict:
+    from server import app
+    from database import db, client, supports_transactions
+    from indexes import ensure_indexes
+    from search import with_search_fields
+    from benchmarks.serialization import make_orders, make_products
+
+    await ensure_indexes(db)
+    products = [with_search_fields(p) for p in make_products(4)]
+    orders = make_orders(3)
+    await db.categories.insert_many([
+        {"id": "bedsheets", "name": "Bedsheets", "slug": "bedsheets", "count": len(products)},
+        {"id": "curtains", "name": "Curtains", "slug": "curtains", "count": 0},
+    ])
+    await db.products.insert_many(products)
+    await db.orders.insert_many(orders)
+
+    # Writes that move category counts run in a transaction where supported, which adds a commitTransaction
+    commit = 1 if await supports_transactions() else 0
+
+    # (name, method, path, params, body, expected status, budget)
+    scenarios = [
+        ("update_product", "PUT", f"/api/products/{products[0]['id']}", None, {"price": 1999.0}, 200, 1),
+        ("update_product:searchable", "PUT", f"/api/products/{products[0]['id']}", None, {"name": "Renamed"}, 200, 2),
+        ("update_product:category", "PUT", f"/api/products/{products[3]['id']}", None, {"category": "curtains"}, 200, 2 + commit),
+        ("update_product:missing", "PUT", "/api/products/missing", None, {"price": 1.0}, 404, 1),
+        ("update_stock", "PATCH", f"/api/products/{products[1]['id']}/stock", {"stock_quantity": 5}, None, 200, 1),
+        ("delete_product", "DELETE", f"/api/products/{products[2]['id']}", None, None, 200, 2 + commit),
+        ("delete_product:missing", "DELETE", "/api/products/missing", None, None, 404, 1 + commit),
+        ("update_order", "PUT", f"/api/orders/{orders[0]['id']}", None, {"status": "Processing"}, 200, 3 + commit),
+        ("bulk_update_orders", "PATCH", "/api/orders/bulk", None, [
+            {"order_id": orders[1]['id'], "status": "Shipped", "tracking_number": "TRK1"},
+            {"order_number": orders[2]['order_number'], "status": "Cancelled"},
+        ], 200, 4 + commit),
+        ("delete_order", "DELETE", f"/api/orders/{orders[0]['id']}", None, None, 200, 3 + commit),
+        ("delete_order:missing", "DELETE", "/api/orders/missing", None, None, 404, 1 + commit),
+    ]
+
+    report = {"routes": {}, "ok": True}
+    try:
+        for name, method, path, params, body, expected, budget in scenarios:
+            result = await count(app, method, path, body, params)
+            ok = result["status"] == expected and len(result["commands"]) <= budget
+            report["routes"][name] = {**result, "count": len(result["commands"]), "budget": budget, "ok": ok}
+            report["ok"] = report["ok"] and ok
+    finally:
+        await client.drop_database(db.name)
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="MongoDB commands per write route")
+    parser.add_argument("--db", default="slayk_command_counts", help="scratch database, dropped afterwards")
+    parser.add_argument("--output", help="write the JSON report to this file instead of stdout")
+    args = parser.parse_args()
+
+    # Listeners registered globally apply to clients created afterwards, so
+    # this has to happen before database.py is imported
+    os.environ["DB_NAME"] = args.db
+    monitoring.register(counter)
+
+    report = asyncio.run(run())
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    sys.exit(0 if report["ok"] else 1)
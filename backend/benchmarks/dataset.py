@@ -0,0 +1,23 @@
+"""
+Seeded synthetic catalog and order history for the load benchmark.
+
+An in-memory slice of the dataset generate_data.py writes: the same seed and
+sizes always produce the same documents (ids included), so two benchmark
+runs see identical data.
+"""
+from datetime import datetime, timezone
+from typing import Dict, List
+
+from category_counts import with_category_counts
+from generate_data import CATEGORIES, DatasetSpec, generate_batch
+
+
+def make_dataset(products: int, orders: int, seed: int = 42) -> Dict[str, List[dict]]:
+    end = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    spec = DatasetSpec(seed, len(CATEGORIES), products, 0, end, 180)
+    product_docs = generate_batch("products", spec, 0, products)
+    return {
+        "categories": with_category_counts(generate_batch("categories", spec, 0, len(CATEGORIES)), product_docs),
+        "products": product_docs,
+        "orders": generate_batch("orders", spec, 0, orders),
+    }
@@ -0,0 +1,207 @@
+"""
+Load test for the storefront and admin API
+Run: python -m benchmarks.load [--products 2000] [--orders 5000] [--requests 3000] [--concurrency 16]
+                               [--seed 42] [--db slayk_load] [--standin] [--output FILE]
+
+Starts the app from server.py in-process (lifespan included) against
+MONGO_URL, in a scratch database that is dropped afterwards. When no mongod
+answers, or with --standin, it runs on the in-process stand-in from
+benchmarks/standin.py instead. A seeded synthetic dataset is loaded and a
+weighted mix of storefront and admin scenarios is driven through the ASGI
+app. The JSON report has throughput and p50/p95/p99 latency overall and per
+scenario, and the same seed gives the same dataset and request plan, so
+reports from two releases can be diffed.
+"""
+from dotenv import load_dotenv
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+
+from benchmarks.asgi import asgi_request, summarize
+
+load_dotenv(Path(__file__).parent.parent / '.env')
+
+# name -> (weight, statuses that count as success)
+SCENARIOS: Dict[str, Tuple[int, Tuple[int, ...]]] = {
+    "browse_categories": (15, (200,)),
+    "category_listing": (20, (200,)),
+    "search": (15, (200,)),
+    "product_detail": (25, (200,)),
+    "checkout": (5, (200, 409)),
+    "dashboard_polling": (10, (200,)),
+    "order_paging": (10, (200,)),
+}
+SEARCH_TERMS = ["cotton", "velvet curtain", "rug", "lamp", "bath towel", "dinner set", "boho", "sage", "lin", "kitch"]
+PAGE_SIZE = 20
+
+
+def mongod_available(url: str) -> bool:
+    from pymongo import MongoClient
+    from pymongo.errors import PyMongoError
+
+    if not url:
+        return False
+    try:
+        MongoClient(url, serverSelectionTimeoutMS=1500).admin.command("ping")
+        return True
+    except PyMongoError:
+        return False
+
+
+class LoadContext:
+    def __init__(self, app, dataset: Dict[str, List[dict]]):
+        self.app = app
+        self.category_slugs = [c["slug"] for c in dataset["categories"]]
+        self.product_slugs = [p["slug"] for p in dataset["products"]]
+        self.in_stock = [p for p in dataset["products"] if p["stock_quantity"] > 0]
+        # Cursors handed out by earlier order pages; paging follows them like the admin UI does
+        self.order_cursors: List[str] = []
+
+    async def get(self, path: str, params: dict = None) -> Tuple[int, Dict[str, str]]:
+        status, headers, _ = await asgi_request(self.app, "GET", path, params, {"accept-encoding": "gzip"})
+        return status, headers
+
+    async def browse_categories(self, rng: random.Random) -> int:
+        return (await self.get("/api/categories"))[0]
+
+    async def category_listing(self, rng: random.Random) -> int:
+        params = {"category": rng.choice(self.category_slugs), "limit": PAGE_SIZE, "fields": "card"}
+        return (await self.get("/api/products", params))[0]
+
+    async def search(self, rng: random.Random) -> int:
+        return (await self.get("/api/products", {"search": rng.choice(SEARCH_TERMS), "limit": PAGE_SIZE}))[0]
+
+    async def product_detail(self, rng: random.Random) -> int:
+        return (await self.get(f"/api/products/slug/{rng.choice(self.product_slugs)}"))[0]
+
+    async def checkout(self, rng: random.Random) -> int:
+        items = [{
+            "product_id": p["id"], "product_name": p["name"], "product_image": p["image"],
+            "quantity": 1, "price": p["price"], "selected_size": p["sizes"][0], "selected_color": p["colors"][0],
+        } for p in rng.sample(self.in_stock, min(len(self.in_stock), rng.randint(1, 2)))]
+        subtotal = sum(item["price"] for item in items)
+        body = {
+            "items": items,
+            "shipping_address": {
+                "first_name": "Load", "last_name": "Test", "email": "load@example.com", "address": "1 Test Street",
+                "city": "Pune", "state": "Maharashtra", "pincode": "411001", "phone": "9000000000",
+            },
+            "payment_method": "card", "subtotal": subtotal, "shipping": 0, "total": subtotal,
+        }
+        status, _, _ = await asgi_request(
+            self.app, "POST", "/api/orders", headers={"content-type": "application/json"}, body=json.dumps(body).encode()
+        )
+        return status
+
+    async def dashboard_polling(self, rng: random.Random) -> int:
+        return (await self.get("/api/dashboard/stats"))[0]
+
+    async def order_paging(self, rng: random.Random) -> int:
+        params = {"limit": PAGE_SIZE, "fields": "summary"}
+        if self.order_cursors and rng.random() < 0.7:
+            params["cursor"] = self.order_cursors.pop(rng.randrange(len(self.order_cursors)))
+        status, headers = await self.get("/api/orders", params)
+        cursor = headers.get("x-next-cursor")
+        if cursor:
+            self.order_cursors.append(cursor)
+        return status
+
+
+async def drive_plan(ctx: LoadContext, plan: List[Tuple[str, int]], concurrency: int) -> dict:
+    latencies: Dict[str, List[float]] = {name: [] for name in SCENARIOS}
+    statuses: Dict[str, Dict[str, int]] = {name: {} for name in SCENARIOS}
+    errors: Dict[str, int] = {name: 0 for name in SCENARIOS}
+    steps = iter(plan)
+
+    async def worker():
+        for name, seed in steps:
+            scenario: Callable = getattr(ctx, name)
+            started = time.perf_counter()
+            status = await scenario(random.Random(seed))
+            latencies[name].append(time.perf_counter() - started)
+            statuses[name][str(status)] = statuses[name].get(str(status), 0) + 1
+            if status not in SCENARIOS[name][1]:
+                errors[name] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - started
+
+    report = {
+        "total": summarize([l for samples in latencies.values() for l in samples], elapsed, sum(errors.values())),
+        "scenarios": {},
+    }
+    for name, samples in latencies.items():
+        report["scenarios"][name] = {**summarize(samples, elapsed, errors[name]), "statuses": statuses[name]}
+    return report
+
+
+def make_plan(requests: int, seed: int) -> List[Tuple[str, int]]:
+    rng = random.Random(seed)
+    names = list(SCENARIOS)
+    weights = [SCENARIOS[name][0] for name in names]
+    return [(name, rng.getrandbits(32)) for name in rng.choices(names, weights, k=requests)]
+
+
+async def run(args, backend: str) -> dict:
+    from server import app
+    from database import client, db
+    from benchmarks.dataset import make_dataset
+
+    dataset = make_dataset(args.products, args.orders, args.seed)
+    await client.drop_database(db.name)
+    try:
+        async with app.router.lifespan_context(app):
+            for name in ("categories", "products", "orders"):
+                for start in range(0, len(dataset[name]), 1000):
+                    await getattr(db, name).insert_many([dict(doc) for doc in dataset[name][start:start + 1000]])
+
+            ctx = LoadContext(app, dataset)
+            await drive_plan(ctx, make_plan(min(args.requests, 200), args.seed + 1), args.concurrency)  # warm-up
+            report = await drive_plan(ctx, make_plan(args.requests, args.seed), args.concurrency)
+    finally:
+        await client.drop_database(db.name)
+
+    return {
+        "config": {
+            "backend": backend, "products": args.products, "orders": args.orders, "requests": args.requests,
+            "concurrency": args.concurrency, "seed": args.seed,
+            "weights": {name: weight for name, (weight, _) in SCENARIOS.items()},
+        },
+        **report,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Storefront and admin API load test")
+    parser.add_argument("--products", type=int, default=2000)
+    parser.add_argument("--orders", type=int, default=5000)
+    parser.add_argument("--requests", type=int, default=3000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--db", default="slayk_load", help="scratch database, dropped afterwards")
+    parser.add_argument("--standin", action="store_true", help="use the in-process stand-in even if mongod is up")
+    parser.add_argument("--output", help="write the JSON report to this file instead of stdout")
+    args = parser.parse_args()
+
+    os.environ["DB_NAME"] = args.db
+    if args.standin or not mongod_available(os.environ.get("MONGO_URL")):
+        from benchmarks import standin
+        standin.install()
+        os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+        backend = "standin"
+    else:
+        backend = "mongod"
+
+    report = asyncio.run(run(args, backend))
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
@@ -0,0 +1,110 @@
+"""
+Measure login latency and event-loop lag with bcrypt inline versus on the password pool
+Run: python -m benchmarks.login [--logins 48] [--concurrency 8] [--pings 400]
+
+Each mode runs a burst of logins alongside a stream of cheap requests (the
+stand-in for storefront traffic) while a sampler records how late the event
+loop wakes up. With bcrypt inline every login stalls the loop; on the pool the
+loop stays responsive and only login latency reflects hashing cost.
+"""
+from fastapi import FastAPI, HTTPException
+from typing import List
+import argparse
+import asyncio
+import json
+import time
+
+from auth import check_password, get_password_hash, verify_password, PASSWORD_HASH_WORKERS, PASSWORD_HASH_QUEUE_LIMIT
+from benchmarks.asgi import asgi_request, drive, percentile
+
+PASSWORD = "admin123"
+LAG_INTERVAL = 0.005
+
+
+def build_app(hashed: str) -> FastAPI:
+    app = FastAPI()
+
+    @app.post("/inline/login")
+    async def inline_login():
+        if not verify_password(PASSWORD, hashed):
+            raise HTTPException(status_code=401)
+        return {"ok": True}
+
+    @app.post("/pool/login")
+    async def pool_login():
+        if not await check_password(PASSWORD, hashed):
+            raise HTTPException(status_code=401)
+        return {"ok": True}
+
+    @app.get("/ping")
+    async def ping():
+        return {"ok": True}
+
+    return app
+
+
+async def sample_lag(samples: List[float], stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(LAG_INTERVAL)
+        samples.append(time.perf_counter() - started - LAG_INTERVAL)
+
+
+async def run_mode(app: FastAPI, mode: str, logins: int, concurrency: int, pings: int) -> dict:
+    lag: List[float] = []
+    stop = asyncio.Event()
+    sampler = asyncio.create_task(sample_lag(lag, stop))
+
+    async def login(i):
+        status, _, _ = await asgi_request(app, "POST", f"/{mode}/login")
+        return status
+
+    async def ping(i):
+        status, _, _ = await asgi_request(app, "GET", "/ping")
+        await asyncio.sleep(0.001)
+        return status
+
+    login_stats, ping_stats = await asyncio.gather(drive(login, logins, concurrency), drive(ping, pings, 1))
+    stop.set()
+    await sampler
+
+    samples = sorted(lag)
+    return {
+        "login": login_stats,
+        "ping": ping_stats,
+        "loop_lag": {
+            "samples": len(samples),
+            "p50_ms": round(percentile(samples, 0.50) * 1000, 3),
+            "p99_ms": round(percentile(samples, 0.99) * 1000, 3),
+            "max_ms": round(samples[-1] * 1000, 3) if samples else 0.0,
+        },
+    }
+
+
+async def run(logins: int, concurrency: int, pings: int) -> dict:
+    app = build_app(get_password_hash(PASSWORD))
+    results = {
+        "logins": logins, "concurrency": concurrency, "pings": pings,
+        "pool_workers": PASSWORD_HASH_WORKERS, "pool_queue_limit": PASSWORD_HASH_QUEUE_LIMIT,
+        "modes": {},
+    }
+    for mode in ("inline", "pool"):
+        await run_mode(app, mode, min(logins, 4), 2, 10)  # warm-up
+        results["modes"][mode] = await run_mode(app, mode, logins, concurrency, pings)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inline vs pooled bcrypt under concurrent load")
+    parser.add_argument("--logins", type=int, default=48)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--pings", type=int, default=400)
+    parser.add_argument("--output", help="write the JSON report to this file instead of stdout")
+    args = parser.parse_args()
+    report = asyncio.run(run(args.logins, args.concurrency, args.pings))
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
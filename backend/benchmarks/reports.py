@@ -0,0 +1,91 @@
+"""
+Time the snapshot reports over millions of line items
+Run: python -m benchmarks.reports [--orders 50000] [--copies 40] [--partitions 4]
+
+Generates --orders synthetic orders, repeats their columns --copies times
+with fresh ids, and writes them as --partitions snapshot partitions in a
+temporary directory. Loading (memory maps plus the newest-row merge across
+partitions) and each report are timed; no Mongo server is needed.
+"""
+from datetime import datetime, timezone
+from pathlib import Path
+import argparse
+import json
+import tempfile
+import time
+
+import numpy as np
+
+from generate_data import CATEGORIES, DatasetSpec, generate_batch
+from order_reports import aov_report, basket_size_report, cohort_report, top_skus_report
+from order_snapshot import flatten, load_snapshot, write_manifest, write_partition
+
+
+def repeat_columns(columns: dict, copies: int) -> dict:
+    orders = {name: np.tile(column, copies) for name, column in columns["orders"].items()}
+    orders["id"] = np.arange(len(orders["id"])).astype("S36")
+    items = {name: np.tile(column, copies) for name, column in columns["items"].items()}
+    per_copy = len(columns["orders"]["id"])
+    items["order"] = items["order"] + np.repeat(np.arange(copies) * per_copy, len(columns["items"]["order"]))
+    return {"orders": orders, "items": items}
+
+
+def write_snapshot(directory: Path, columns: dict, partitions: int) -> None:
+    bounds = np.linspace(0, len(columns["orders"]["id"]), partitions + 1).astype(int)
+    written = []
+    for number, (low, high) in enumerate(zip(bounds, bounds[1:]), start=1):
+        rows = (columns["items"]["order"] >= low) & (columns["items"]["order"] < high)
+        part = {
+            "orders": {name: column[low:high] for name, column in columns["orders"].items()},
+            "items": {name: column[rows] for name, column in columns["items"].items()},
+        }
+        part["items"]["order"] = part["items"]["order"] - low
+        written.append(write_partition(directory, f"part-{number:06d}", part))
+    write_manifest(directory, {"generation": 1, "watermark": None, "partitions": written, "updated_at": None})
+
+
+def timed(fn, *args, **kwargs) -> float:
+    started = time.perf_counter()
+    fn(*args, **kwargs)
+    return round(time.perf_counter() - started, 3)
+
+
+def run(orders: int, copies: int, partitions: int) -> dict:
+    spec = DatasetSpec(42, len(CATEGORIES), 2000, max(orders // 5, 1), datetime.now(timezone.utc), 730)
+    columns = repeat_columns(flatten(generate_batch("orders", spec, 0, orders)), copies)
+
+    with tempfile.TemporaryDirectory() as temp:
+        directory = Path(temp)
+        write_snapshot(directory, columns, partitions)
+        started = time.perf_counter()
+        snapshot = load_snapshot(directory)
+        load_seconds = round(time.perf_counter() - started, 3)
+        return {
+            "orders": len(snapshot.orders["id"]),
+            "items": len(snapshot.items["order"]),
+            "partitions": partitions,
+            "seconds": {
+                "load": load_seconds,
+                "aov": timed(aov_report, snapshot, None, None, "month"),
+                "aov_weekly": timed(aov_report, snapshot, None, None, "week"),
+                "basket_size": timed(basket_size_report, snapshot, None, None),
+                "top_skus": timed(top_skus_report, snapshot, None, None, "revenue", 50),
+                "cohorts": timed(cohort_report, snapshot, None, None, 12),
+            },
+        }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Snapshot report timings")
+    parser.add_argument("--orders", type=int, default=50_000, help="distinct synthetic orders to generate")
+    parser.add_argument("--copies", type=int, default=40, help="times the generated orders are repeated")
+    parser.add_argument("--partitions", type=int, default=4)
+    parser.add_argument("--output", help="write the JSON report to this file instead of stdout")
+    args = parser.parse_args()
+    report = run(args.orders, args.copies, args.partitions)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
@@ -0,0 +1,116 @@
+"""
+Compare the validated response path with the orjson fast path for list endpoints
+Run: python -m benchmarks.serialization [--rows 500] [--requests 300] [--concurrency 8]
+
+Both routes return the same in-memory documents, so the difference is purely
+per-row Pydantic validation + serialization versus direct encoding.
+"""
+from fastapi import FastAPI, Response
+from datetime import datetime, timedelta, timezone
+from typing import List
+import argparse
+import asyncio
+import json
+import uuid
+
+from models import Order, Product
+from serialization import fast_encode, validated_encode
+from benchmarks.asgi import asgi_request, drive
+
+
+def make_products(rows: int) -> List[dict]:
+    now = datetime.now(timezone.utc)
+    return [{
+        "id": str(uuid.uuid4()), "name": f"Product {i}", "slug": f"product-{i}", "category": "bedsheets",
+        "price": 2499.0, "original_price": 4999.0, "discount": 50, "rating": 4.6, "reviews": 120 + i,
+        "description": "Premium cotton bedsheet set with two pillow covers. " * 3,
+        "features": ["100% Cotton", "300 Thread Count", "Machine Washable"],
+        "colors": ["Sage Green", "Dusty Rose"], "sizes": ["Single", "Double", "King"],
+        "image": "https://images.unsplash.com/photo-1522771739844-6a9f6d5f14af?w=600&h=600&fit=crop",
+        "images": ["https://images.unsplash.com/photo-1522771739844-6a9f6d5f14af?w=600&h=600&fit=crop"],
+        "in_stock": True, "is_new": False, "is_best_seller": i % 7 == 0, "stock_quantity": 100,
+        "created_at": now - timedelta(minutes=i), "updated_at": now,
+    } for i in range(rows)]
+
+
+def make_orders(rows: int) -> List[dict]:
+    now = datetime.now(timezone.utc)
+    return [{
+        "id": str(uuid.uuid4()), "order_number": f"SLAYK-{i:08X}",
+        "items": [{
+            "product_id": str(uuid.uuid4()), "product_name": f"Product {j}", "product_image": "https://example.com/p.jpg",
+            "quantity": 1 + j, "price": 999.0, "selected_size": "Double", "selected_color": "Navy",
+        } for j in range(3)],
+        "shipping_address": {
+            "first_name": "Priya", "last_name": "Sharma", "email": "priya@example.com", "address": "123 MG Road",
+            "city": "Mumbai", "state": "Maharashtra", "pincode": "400001", "phone": "9876543210",
+        },
+        "payment_method": "card", "subtotal": 5994.0, "shipping": 0.0, "total": 5994.0,
+        "status": "Pending", "tracking_number": None,
+        "created_at": now - timedelta(minutes=i), "updated_at": now,
+    } for i in range(rows)]
+
+
+def build_app(products: List[dict], orders: List[dict]) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/validated/products", response_model=List[Product])
+    async def validated_products():
+        return products
+
+    @app.get("/fast/products", response_model=List[Product])
+    async def fast_products():
+        return Response(content=fast_encode(products, List[Product]), media_type="application/json")
+
+    @app.get("/validated/orders", response_model=List[Order])
+    async def validated_orders():
+        return orders
+
+    @app.get("/fast/orders", response_model=List[Order])
+    async def fast_orders():
+        return Response(content=fast_encode(orders, List[Order]), media_type="application/json")
+
+    return app
+
+
+async def run(rows: int, requests: int, concurrency: int) -> dict:
+    products, orders = make_products(rows), make_orders(rows)
+    app = build_app(products, orders)
+
+    # Both paths must produce the same documents
+    for resource, model, docs in (("products", List[Product], products), ("orders", List[Order], orders)):
+        assert json.loads(fast_encode(docs, model)) == json.loads(validated_encode(docs, model)), resource
+
+    results = {"rows": rows, "requests": requests, "concurrency": concurrency, "routes": {}}
+    for resource in ("products", "orders"):
+        for mode in ("validated", "fast"):
+            path = f"/{mode}/{resource}"
+
+            async def call(i, path=path):
+                status, _, _ = await asgi_request(app, "GET", path)
+                return status
+
+            await drive(call, min(requests, 20), concurrency)  # warm-up
+            results["routes"][f"{resource}:{mode}"] = await drive(call, requests, concurrency)
+
+    for resource in ("products", "orders"):
+        validated = results["routes"][f"{resource}:validated"]
+        fast = results["routes"][f"{resource}:fast"]
+        results["routes"][f"{resource}:speedup"] = round(fast["rps"] / validated["rps"], 2) if validated["rps"] else None
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Validated vs fast JSON list responses")
+    parser.add_argument("--rows", type=int, default=500)
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--output", help="write the JSON report to this file instead of stdout")
+    args = parser.parse_args()
+    report = asyncio.run(run(args.rows, args.requests, args.concurrency))
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
@@ -0,0 +1,74 @@
+"""
+In-process MongoDB stand-in for the benchmarks when no mongod is reachable.
+
+install() swaps Motor's client for mongomock-motor (pip install
+mongomock-motor) and papers over the few server features the app uses that
+mongomock lacks. $text queries match nothing, so product search exercises
+its prefix fallback, and capped collections are created as plain ones.
+Aggregation stages it doesn't implement ($indexStats) fail the way an
+unsupported server would, and admin commands answer as a standalone server,
+so transactions are not used. Timings measure the app on
+top of mongomock, which is useful for comparing app-side changes but says
+nothing about query plans.
+"""
+from pymongo.errors import OperationFailure
+
+
+def install() -> None:
+    """Must run before database.py is imported."""
+    try:
+        from mongomock_motor import AsyncMongoMockClient
+    except ImportError:
+        raise SystemExit("No mongod available and mongomock-motor is not installed: pip install mongomock-motor")
+    import mongomock.aggregate
+    import mongomock.collection
+    import mongomock.database
+    import motor.motor_asyncio
+
+    class StandInClient(AsyncMongoMockClient):
+        def __init__(self, *args, **kwargs):
+            # Pool, timeout and listener options have no meaning in-process
+            super().__init__(*args, tz_aware=kwargs.get("tz_aware", False))
+
+    process_pipeline = mongomock.aggregate.process_pipeline
+
+    def process_supported_pipeline(*args, **kwargs):
+        try:
+            return process_pipeline(*args, **kwargs)
+        except NotImplementedError as e:
+            raise OperationFailure(str(e))
+
+    def command(self, command, *args, **kwargs):
+        name = command if isinstance(command, str) else next(iter(command))
+        if name in ("hello", "isMaster", "ping"):
+            return {"ok": 1.0, "isWritablePrimary": True}
+        raise OperationFailure(f"Command {name} is not supported by the in-process stand-in")
+
+    find = mongomock.collection.Collection.find
+
+    def find_without_text(self, filter=None, projection=None, *args, **kwargs):
+        if filter and "$text" in filter:
+            filter = {**{k: v for k, v in filter.items() if k != "$text"}, "_id": {"$exists": False}}
+        if isinstance(projection, dict):
+            projection = {k: v for k, v in projection.items() if not isinstance(v, dict)} or None
+        return find(self, filter, projection, *args, **kwargs)
+
+    create_collection = mongomock.database.Database.create_collection
+
+    def create_uncapped_collection(self, name, **kwargs):
+        return create_collection(self, name)
+
+    sort = mongomock.collection.Cursor.sort
+
+    def sort_without_meta(self, key_or_list, direction=None):
+        if isinstance(key_or_list, list):
+            key_or_list = [(k, d) for k, d in key_or_list if not isinstance(d, dict)]
+        return sort(self, key_or_list, direction)
+
+    motor.motor_asyncio.AsyncIOMotorClient = StandInClient
+    mongomock.aggregate.process_pipeline = process_supported_pipeline
+    mongomock.collection.aggregate.process_pipeline = process_supported_pipeline
+    mongomock.database.Database.command = command
+    mongomock.database.Database.create_collection = create_uncapped_collection
+    mongomock.collection.Collection.find = find_without_text
+    mongomock.collection.Cursor.sort = sort_without_meta
@@ -0,0 +1,218 @@
+"""
+In-process caches for hot read paths.
+
+Entries expire after a short TTL and are dropped explicitly by the write
+routes that change the underlying data. Concurrent misses for the same key
+share a single load, so N pollers cost one set of queries per TTL window.
+Each worker process has its own caches, so a write handled by another worker
+becomes visible here once the TTL runs out.
+"""
+from fastapi import Request, Response
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, Set, Tuple
+from collections import OrderedDict
+import asyncio
+import gzip
+import hashlib
+import os
+import time
+from serialization import encode
+
+DASHBOARD_CACHE_TTL_SECONDS = float(os.environ.get("DASHBOARD_CACHE_TTL_SECONDS", "5"))
+RESPONSE_CACHE_TTL_SECONDS = float(os.environ.get("RESPONSE_CACHE_TTL_SECONDS", "30"))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.environ.get("RESPONSE_CACHE_MAX_ENTRIES", "2048"))
+USER_CACHE_TTL_SECONDS = float(os.environ.get("USER_CACHE_TTL_SECONDS", "60"))
+
+# Bodies smaller than this aren't worth compressing
+GZIP_MIN_SIZE = 1024
+
+
+class TTLCache:
+    def __init__(self, ttl: float, maxsize: int = 1024):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._entries: Dict[Hashable, Tuple[float, Any]] = {}
+        self._loading: Dict[Hashable, asyncio.Future] = {}
+        self._generation = 0
+
+    def __contains__(self, key: Hashable) -> bool:
+        missing = object()
+        return self.get(key, missing) is not missing
+
+    def get(self, key: Hashable, default=None):
+        entry = self._entries.get(key)
+        if entry is None:
+            return default
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return default
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        if len(self._entries) >= self.maxsize and key not in self._entries:
+            self._evict()
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+
+    def invalidate(self, key: Hashable = None) -> None:
+        """Drop one key, or everything when no key is given."""
+        self._generation += 1
+        if key is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(key, None)
+
+    async def get_or_load(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        missing = object()
+        value = self.get(key, missing)
+        if value is not missing:
+            return value
+
+        pending = self._loading.get(key)
+        if pending is not None:
+            return await asyncio.shield(pending)
+
+        future = asyncio.get_running_loop().create_future()
+        self._loading[key] = future
+        generation = self._generation
+        try:
+            value = await loader()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Nobody else may be waiting; mark the exception as retrieved
+            future.exception()
+            raise
+        finally:
+            self._loading.pop(key, None)
+        # A write that happened while loading makes this result stale
+        if generation == self._generation:
+            self.set(key, value)
+        future.set_result(value)
+        return value
+
+    def _evict(self) -> None:
+        now = time.monotonic()
+        for key in [k for k, (expires_at, _) in self._entries.items() if expires_at <= now]:
+            del self._entries[key]
+        if len(self._entries) >= self.maxsize:
+            # Oldest insertion first
+            del self._entries[next(iter(self._entries))]
+
+
+class LRUCache:
+    """Bounded LRU whose entries each expire at their own wall-clock time (e.g. a token's exp)."""
+
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+
+    def get(self, key: Hashable, default=None):
+        entry = self._entries.get(key)
+        if entry is None:
+            return default
+        expires_at, value = entry
+        if expires_at <= time.time():
+            del self._entries[key]
+            return default
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any, expires_at: float) -> None:
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, key: Hashable = None) -> None:
+        if key is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class CachedBody:
+    __slots__ = ("body", "gzipped", "etag", "headers")
+
+    def __init__(self, body: bytes, headers: Dict[str, str]):
+        self.body = body
+        self.gzipped = gzip.compress(body, compresslevel=6) if len(body) >= GZIP_MIN_SIZE else None
+        self.etag = '"%s"' % hashlib.blake2b(body, digest_size=16).hexdigest()
+        self.headers = headers
+
+
+class ResponseCache:
+    """Serialized JSON responses keyed by path and query string.
+
+    Entries carry tags (e.g. "products", "product:<id>") so that write routes
+    can drop exactly the responses they affect. Responses carry a strong ETag;
+    a matching If-None-Match is answered with 304 straight from the cache.
+    """
+
+    def __init__(self, ttl: float, maxsize: int):
+        self._cache = TTLCache(ttl=ttl, maxsize=maxsize)
+        self._tags: Dict[str, Set[Hashable]] = {}
+
+    @staticmethod
+    def key_for(request: Request) -> Tuple[str, Tuple[Tuple[str, str], ...]]:
+        return request.url.path, tuple(sorted(request.query_params.multi_items()))
+
+    def invalidate(self, *tags: str) -> None:
+        for tag in tags:
+            for key in self._tags.pop(tag, ()):
+                self._cache.invalidate(key)
+
+    def clear(self) -> None:
+        self._tags.clear()
+        self._cache.invalidate()
+
+    async def respond(
+        self,
+        request: Request,
+        response_model: Any,
+        loader: Callable[[Dict[str, str]], Awaitable[Any]],
+        tags: Callable[[Any], Iterable[str]],
+    ) -> Response:
+        """Serve `request` from the cache, loading and storing it on a miss.
+
+        `loader` receives a dict it may fill with extra response headers and
+        returns the data to encode with `response_model`; `tags` maps that data
+        to the tags the entry is filed under.
+        """
+        key = self.key_for(request)
+
+        async def load() -> CachedBody:
+            headers: Dict[str, str] = {}
+            data = await loader(headers)
+            cached = CachedBody(encode(data, response_model), headers)
+            for tag in tags(data):
+                keys = self._tags.setdefault(tag, set())
+                if len(keys) >= self._cache.maxsize:
+                    # Forget keys whose entries have expired or been evicted
+                    keys.intersection_update(k for k in list(keys) if k in self._cache)
+                keys.add(key)
+            return cached
+
+        cached = await self._cache.get_or_load(key, load)
+        return self.to_response(request, cached)
+
+    @staticmethod
+    def to_response(request: Request, cached: CachedBody) -> Response:
+        headers = {**cached.headers, "ETag": cached.etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match and cached.etag in [tag.strip() for tag in if_none_match.split(",")]:
+            return Response(status_code=304, headers=headers)
+        if cached.gzipped is not None and "gzip" in request.headers.get("accept-encoding", ""):
+            headers["Content-Encoding"] = "gzip"
+            return Response(content=cached.gzipped, media_type="application/json", headers=headers)
+        return Response(content=cached.body, media_type="application/json", headers=headers)
+
+
+dashboard_cache = TTLCache(ttl=DASHBOARD_CACHE_TTL_SECONDS, maxsize=16)
+response_cache = ResponseCache(ttl=RESPONSE_CACHE_TTL_SECONDS, maxsize=RESPONSE_CACHE_MAX_ENTRIES)
+# User documents for /api/auth/me, keyed by user id
+user_cache = TTLCache(ttl=USER_CACHE_TTL_SECONDS, maxsize=1024)
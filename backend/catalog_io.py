@@ -0,0 +1,260 @@
+"""
+Streaming product import and export in NDJSON and CSV.
+
+Imports read the request body chunk by chunk, validate each row against
+ProductCreate and upsert valid rows by slug in bulk_write batches, so memory
+stays constant in the size of the upload. A row only overwrites the fields it
+gives; ProductCreate's defaults apply to new products. Each batch moves the
+category counts of the products it inserts or recategorizes in the same
+transaction.
+Exports stream the products cursor row by row. In CSV, list fields
+(features, colors, sizes, images) are joined with "|".
+"""
+from pydantic import ValidationError
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from datetime import datetime, timezone
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from models import ProductCreate
+from database import run_transaction
+from search import build_search_prefixes, PREFIX_FIELDS
+from category_counts import apply_category_deltas, category_deltas
+from images import with_image_variants
+import codecs
+import csv
+import io
+import orjson
+import uuid
+
+IMPORT_BATCH_SIZE = 500
+EXPORT_BATCH_SIZE = 500
+# The per-row error report is capped so a bad upload can't exhaust memory
+MAX_REPORTED_ERRORS = 1000
+
+LIST_FIELDS = ("features", "colors", "sizes", "images")
+LIST_SEPARATOR = "|"
+
+EXPORT_COLUMNS = ["id"] + list(ProductCreate.model_fields) + ["rating", "reviews", "created_at", "updated_at"]
+
+FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending
+
+
+async def iter_ndjson_rows(chunks: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, Optional[dict], Optional[str]]]:
+    """Yield (row number, row, error) for each non-blank line."""
+    number = 0
+    async for line in iter_lines(chunks):
+        number += 1
+        if not line.strip():
+            continue
+        try:
+            row = orjson.loads(line)
+        except orjson.JSONDecodeError as e:
+            yield number, None, f"Invalid JSON: {e}"
+            continue
+        if not isinstance(row, dict):
+            yield number, None, "Expected a JSON object"
+            continue
+        yield number, row, None
+
+
+def csv_row_to_product(row: Dict[str, str]) -> dict:
+    product = {}
+    for field, value in row.items():
+        if field is None or value is None:
+            continue
+        if field in LIST_FIELDS:
+            product[field] = [v.strip() for v in value.split(LIST_SEPARATOR) if v.strip()]
+        elif value != "":
+            product[field] = value
+    return product
+
+
+async def iter_csv_rows(chunks: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, Optional[dict], Optional[str]]]:
+    """Yield (row number, row, error) for each record after the header.
+
+    Physical lines are joined until the quotes balance, so quoted fields may
+    contain newlines.
+    """
+    header = None
+    number = 0
+    record = ""
+    async for line in iter_lines(chunks):
+        record = f"{record}\n{line}" if record else line
+        if record.count('"') % 2:
+            continue
+        values = next(csv.reader([record.rstrip("\r")]), [])
+        record = ""
+        if header is None:
+            header = [name.strip() for name in values]
+            continue
+        number += 1
+        if not any(v.strip() for v in values):
+            continue
+        if len(values) > len(header):
+            yield number, None, f"Expected {len(header)} columns, got {len(values)}"
+            continue
+        yield number, csv_row_to_product(dict(zip(header, values))), None
+    if record:
+        number += 1
+        yield number, None, "Unterminated quoted field"
+
+
+def product_upsert(product: ProductCreate, existing: Optional[dict], now: datetime) -> UpdateOne:
+    """Upsert by slug, setting only the fields the row gave; `existing` is the stored product, if any."""
+    fields = with_image_variants(product.model_dump(exclude_unset=True))
+    defaults = {field: value for field, value in product.model_dump().items() if field not in fields}
+    return UpdateOne(
+        {"slug": product.slug},
+        {
+            "$set": {
+                **fields,
+                "updated_at": now,
+                # Searchable fields the row leaves out keep their stored values
+                "search_prefixes": build_search_prefixes({**(existing or {}), **fields}),
+            },
+            "$setOnInsert": {**defaults, "id": str(uuid.uuid4()), "rating": 4.5, "reviews": 0, "created_at": now},
+        },
+        upsert=True
+    )
+
+
+async def write_batch(db, batch: List[Tuple[int, str, str, ProductCreate]], session=None) -> dict:
+    """Upsert one batch and apply its category count changes; returns the bulk write result.
+
+    Outside a transaction, rows that fail are reported in the result and the
+    rest still count. Inside one, a failed row aborts the batch, so the
+    BulkWriteError is raised for the caller to retry without that row.
+    """
+    stored = {
+        product['slug']: product
+        async for product in db.products.find(
+            {"slug": {"$in": [slug for _, slug, _, _ in batch]}},
+            {"_id": 0, "slug": 1, "category": 1, **{field: 1 for field in PREFIX_FIELDS}},
+            session=session
+        )
+    }
+    current = {slug: product['category'] for slug, product in stored.items()}
+    now = datetime.now(timezone.utc)
+    ops = []
+    for _, slug, _, product in batch:
+        ops.append(product_upsert(product, stored.get(slug), now))
+        stored[slug] = {**stored.get(slug, {}), **product.model_dump(include=set(PREFIX_FIELDS), exclude_unset=True)}
+    try:
+        result = await db.products.bulk_write(ops, ordered=False, session=session)
+        details = result.bulk_api_result
+    except BulkWriteError as e:
+        if session is not None:
+            raise
+        details = e.details
+
+    failed = {error["index"] for error in details.get("writeErrors", [])}
+    moves = []
+    for index, (_, slug, category, _) in enumerate(batch):
+        if index not in failed:
+            # Later rows for the same slug see the earlier row's category
+            moves.append((current.get(slug), category))
+            current[slug] = category
+    await apply_category_deltas(db, category_deltas(moves), session)
+    return details
+
+
+async def import_products(db, rows: AsyncIterator[Tuple[int, Optional[dict], Optional[str]]]) -> dict:
+    report = {"processed": 0, "inserted": 0, "updated": 0, "failed": 0, "errors": [], "errors_truncated": False}
+
+    def fail(number: int, error, slug: Optional[str] = None) -> None:
+        report["failed"] += 1
+        if len(report["errors"]) < MAX_REPORTED_ERRORS:
+            report["errors"].append({"row": number, "slug": slug, "error": error})
+        else:
+            report["errors_truncated"] = True
+
+    batch: List[Tuple[int, str, str, ProductCreate]] = []
+
+    def fail_rows(details: dict) -> set:
+        for error in details.get("writeErrors", []):
+            number, slug, _, _ = batch[error["index"]]
+            fail(number, error.get("errmsg", "Write failed"), slug)
+        return {error["index"] for error in details.get("writeErrors", [])}
+
+    async def flush() -> None:
+        while batch:
+            try:
+                details = await run_transaction(lambda session: write_batch(db, batch, session))
+            except BulkWriteError as e:
+                # The transaction was rolled back; retry the batch without the failed rows
+                failed = fail_rows(e.details)
+                if not failed:
+                    raise
+                batch[:] = [row for index, row in enumerate(batch) if index not in failed]
+                continue
+            fail_rows(details)
+            report["inserted"] += details.get("nUpserted", 0)
+            report["updated"] += details.get("nMatched", 0)
+            batch.clear()
+
+    async for number, row, error in rows:
+        report["processed"] += 1
+        if error is not None:
+            fail(number, error)
+            continue
+        try:
+            product = ProductCreate.model_validate(row)
+        except ValidationError as e:
+            fail(number, e.errors(include_url=False, include_context=False), row.get("slug"))
+            continue
+        batch.append((number, product.slug, product.category, product))
+        if len(batch) >= IMPORT_BATCH_SIZE:
+            await flush()
+    await flush()
+    return report
+
+
+async def iter_export_docs(db, query: dict) -> AsyncIterator[dict]:
+    projection = {"_id": 0, **{column: 1 for column in EXPORT_COLUMNS}}
+    async for product in db.products.find(query, projection).sort("slug", 1).batch_size(EXPORT_BATCH_SIZE):
+        yield product
+
+
+async def export_ndjson(db, query: dict) -> AsyncIterator[bytes]:
+    async for product in iter_export_docs(db, query):
+        yield orjson.dumps(product, option=orjson.OPT_UTC_Z | orjson.OPT_APPEND_NEWLINE)
+
+
+def csv_line(values: list) -> bytes:
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator="\n").writerow(values)
+    return buffer.getvalue().encode()
+
+
+def csv_value(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, list):
+        return LIST_SEPARATOR.join(str(v) for v in value)
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+async def export_csv(db, query: dict) -> AsyncIterator[bytes]:
+    yield csv_line(EXPORT_COLUMNS)
+    async for product in iter_export_docs(db, query):
+        yield csv_line([csv_value(product.get(column)) for column in EXPORT_COLUMNS])
@@ -0,0 +1,96 @@
+"""
+Category product counts.
+
+`categories.count` is a denormalized count of the products in each category.
+Every product write moves the counts it affects in the same transaction
+(where the deployment supports transactions), via category_deltas() and
+apply_category_deltas(). reconcile_category_counts() recomputes every count
+with one $group over products and writes only the categories whose stored
+count is wrong; it runs periodically in the background to catch any drift.
+"""
+from pymongo import UpdateOne
+from typing import Dict, Iterable, List, Optional, Tuple
+from collections import Counter
+from cache import response_cache
+import asyncio
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# How often the background job recomputes counts; 0 disables it
+CATEGORY_RECONCILE_INTERVAL_SECONDS = float(os.environ.get("CATEGORY_RECONCILE_INTERVAL_SECONDS", "3600"))
+
+
+def category_deltas(moves: Iterable[Tuple[Optional[str], Optional[str]]]) -> Dict[str, int]:
+    """Net count changes for (old category, new category) moves; None means created or deleted."""
+    deltas: Counter = Counter()
+    for old, new in moves:
+        if old == new:
+            continue
+        if old is not None:
+            deltas[old] -= 1
+        if new is not None:
+            deltas[new] += 1
+    return {slug: delta for slug, delta in deltas.items() if delta}
+
+
+async def apply_category_deltas(db, deltas: Dict[str, int], session=None) -> bool:
+    """$inc the changed counts in one bulk write; returns whether anything changed."""
+    if not deltas:
+        return False
+    await db.categories.bulk_write([
+        UpdateOne({"slug": slug}, {"$inc": {"count": delta}})
+        for slug, delta in deltas.items()
+    ], ordered=False, session=session)
+    return True
+
+
+def with_category_counts(categories: List[dict], products: List[dict]) -> List[dict]:
+    """Set each category's count from an in-memory product list (used when seeding)."""
+    counts = Counter(product['category'] for product in products)
+    for category in categories:
+        category['count'] = counts.get(category['slug'], 0)
+    return categories
+
+
+async def reconcile_category_counts(db) -> Dict[str, dict]:
+    """Recompute all category counts; returns {slug: {"from": old, "to": new}} for each correction applied.
+
+    Stored counts are read before the products are counted, and each
+    correction only applies if the stored count is still the one read. A
+    count that a product write moved in the meantime is left for the next
+    pass instead of being overwritten.
+    """
+    stored = {category['slug']: category.get('count') async for category in db.categories.find({}, {"_id": 0, "slug": 1, "count": 1})}
+    actual = {
+        row['_id']: row['count']
+        async for row in db.products.aggregate([{"$group": {"_id": "$category", "count": {"$sum": 1}}}])
+    }
+    corrections = {
+        slug: {"from": count, "to": actual.get(slug, 0)}
+        for slug, count in stored.items() if count != actual.get(slug, 0)
+    }
+
+    if corrections:
+        # One update per correction, so each one's matched_count says whether it applied
+        results = await asyncio.gather(*[
+            db.categories.update_one({"slug": slug, "count": change["from"]}, {"$set": {"count": change["to"]}})
+            for slug, change in corrections.items()
+        ])
+        corrections = {slug: change for (slug, change), result in zip(corrections.items(), results) if result.matched_count}
+        response_cache.invalidate("categories")
+    return corrections
+
+
+async def reconcile_periodically(db, interval: float = CATEGORY_RECONCILE_INTERVAL_SECONDS) -> None:
+    """Background job for the app lifespan; logs every correction it makes."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            corrections = await reconcile_category_counts(db)
+        except Exception:
+            logger.exception("Category count reconciliation failed")
+            continue
+        for slug, change in corrections.items():
+            logger.warning("Corrected category count for %s: %s -> %s", slug, change["from"], change["to"])
@@ -3,32 +3,22 @@ Create default admin user for SLAYK
 Run: python create_admin.py
 """
 import asyncio
-from motor.motor_asyncio import AsyncIOMotorClient
-from dotenv import load_dotenv
-from pathlib import Path
-from passlib.context import CryptContext
-import os
 import uuid
 from datetime import datetime, timezone
-
-ROOT_DIR = Path(__file__).parent
-load_dotenv(ROOT_DIR / '.env')
-
-mongo_url = os.environ.get('MONGO_URL')
-db_name = os.environ.get('DB_NAME', 'slayk')
-client = AsyncIOMotorClient(mongo_url)
-db = client[db_name]
-
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from auth import hash_password
+from database import client, db
+from indexes import ensure_indexes
 
 async def create_admin():
     print("🔐 Creating admin user...")
     
+    await ensure_indexes(db)
+    
     # Check if admin already exists
     existing = await db.users.find_one({"email": "admin@slayk.com"})
     if existing:
         print("⚠️ Admin user already exists, updating password...")
-        hashed_password = pwd_context.hash("admin123")
+        hashed_password = await hash_password("admin123")
         await db.users.update_one(
             {"email": "admin@slayk.com"},
             {"$set": {"hashed_password": hashed_password}}
@@ -36,14 +26,14 @@ async def create_admin():
         print("✅ Admin password updated!")
     else:
         # Create new admin
-        hashed_password = pwd_context.hash("admin123")
+        hashed_password = await hash_password("admin123")
         admin_user = {
             "id": str(uuid.uuid4()),
             "email": "admin@slayk.com",
             "name": "Admin",
             "role": "admin",
             "hashed_password": hashed_password,
-            "created_at": datetime.now(timezone.utc).isoformat()
+            "created_at": datetime.now(timezone.utc)
         }
         await db.users.insert_one(admin_user)
         print("✅ Admin user created!")
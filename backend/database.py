@@ -1,6 +1,9 @@
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.errors import PyMongoError
 from dotenv import load_dotenv
 from pathlib import Path
+from monitoring import CommandMonitor, PoolMonitor
+import asyncio
 import os
 
 ROOT_DIR = Path(__file__).parent
@@ -9,5 +12,59 @@ load_dotenv(ROOT_DIR / '.env')
 mongo_url = os.environ.get('MONGO_URL')
 db_name = os.environ.get('DB_NAME', 'slayk')
 
-client = AsyncIOMotorClient(mongo_url)
+# Connection pool sizing; size workers x MONGO_MAX_POOL_SIZE against what the server can take
+MONGO_MAX_POOL_SIZE = int(os.environ.get('MONGO_MAX_POOL_SIZE', '100'))
+MONGO_MIN_POOL_SIZE = int(os.environ.get('MONGO_MIN_POOL_SIZE', '10'))
+MONGO_MAX_IDLE_TIME_MS = int(os.environ.get('MONGO_MAX_IDLE_TIME_MS', '300000'))
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.environ.get('MONGO_WAIT_QUEUE_TIMEOUT_MS', '5000'))
+MONGO_CONNECT_TIMEOUT_MS = int(os.environ.get('MONGO_CONNECT_TIMEOUT_MS', '5000'))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.environ.get('MONGO_SERVER_SELECTION_TIMEOUT_MS', '5000'))
+
+pool_monitor = PoolMonitor()
+command_monitor = CommandMonitor()
+
+# The one client for the whole process; server.py's lifespan warms and closes it
+client = AsyncIOMotorClient(
+    mongo_url,
+    maxPoolSize=MONGO_MAX_POOL_SIZE,
+    minPoolSize=MONGO_MIN_POOL_SIZE,
+    maxIdleTimeMS=MONGO_MAX_IDLE_TIME_MS,
+    waitQueueTimeoutMS=MONGO_WAIT_QUEUE_TIMEOUT_MS,
+    connectTimeoutMS=MONGO_CONNECT_TIMEOUT_MS,
+    serverSelectionTimeoutMS=MONGO_SERVER_SELECTION_TIMEOUT_MS,
+    event_listeners=[pool_monitor, command_monitor],
+    # Timestamps are stored as BSON dates; read them back as aware UTC datetimes
+    tz_aware=True,
+)
 db = client[db_name]
+
+_supports_transactions = None
+
+async def supports_transactions() -> bool:
+    """Transactions need a replica set or a sharded cluster."""
+    global _supports_transactions
+    if _supports_transactions is None:
+        try:
+            hello = await client.admin.command("hello")
+        except PyMongoError:
+            return False
+        _supports_transactions = "setName" in hello or hello.get("msg") == "isdbgrid"
+    return _supports_transactions
+
+async def run_transaction(callback):
+    """Run `callback(session)` in a transaction when supported, otherwise `callback(None)`."""
+    if not await supports_transactions():
+        return await callback(None)
+    async with await client.start_session() as session:
+        return await session.with_transaction(callback)
+
+async def warm_pool() -> None:
+    """Open MONGO_MIN_POOL_SIZE connections so early requests skip connection setup."""
+    await asyncio.gather(*[client.admin.command("ping") for _ in range(max(MONGO_MIN_POOL_SIZE, 1))])
+
+def pool_stats() -> dict:
+    return {
+        "max_pool_size": MONGO_MAX_POOL_SIZE,
+        "min_pool_size": MONGO_MIN_POOL_SIZE,
+        **pool_monitor.stats(),
+    }
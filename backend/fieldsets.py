@@ -0,0 +1,77 @@
+"""
+Sparse fieldsets for list endpoints.
+
+`?fields=` takes a comma-separated mix of field names and preset names, e.g.
+`?fields=card` or `?fields=summary,items`. The selection is pushed down into
+the Mongo projection and the rows are validated against a model narrowed to
+the selected fields, so bytes, BSON decoding and validation all scale with
+what the caller renders.
+"""
+from fastapi import HTTPException
+from pydantic import create_model
+from typing import Dict, FrozenSet, List, Optional, Tuple
+import functools
+
+PRODUCT_PRESETS: Dict[str, Tuple[str, ...]] = {
+    "card": ("id", "name", "slug", "price", "original_price", "discount", "image", "rating"),
+}
+
+ORDER_PRESETS: Dict[str, Tuple[str, ...]] = {
+    # Every Order field except items
+    "summary": ("id", "order_number", "status", "subtotal", "shipping", "total", "payment_method", "tracking_number",
+                "shipping_address", "created_at", "updated_at"),
+}
+
+
+def fields_description(presets: Dict[str, Tuple[str, ...]]) -> str:
+    names = "; ".join(f"`{name}` = {', '.join(fields)}" for name, fields in presets.items())
+    return f"Comma-separated field names and/or presets to return ({names}). Defaults to all fields."
+
+
+def parse_fields(fields: Optional[str], model: type, presets: Dict[str, Tuple[str, ...]]) -> Optional[FrozenSet[str]]:
+    """Resolve `fields` into a set of model field names, or None for the full document."""
+    if not fields or not fields.strip():
+        return None
+    selected = set()
+    for name in (part.strip() for part in fields.split(",")):
+        if not name:
+            continue
+        if name in presets:
+            selected.update(presets[name])
+        elif name in model.model_fields:
+            selected.add(name)
+        else:
+            raise HTTPException(status_code=400, detail=f"Unknown field or preset: {name}")
+    # Rows are always addressable by id
+    selected.add("id")
+    return frozenset(selected)
+
+
+def sparse_projection(selected: FrozenSet[str], extra: Tuple[str, ...] = ()) -> dict:
+    """Projection for the selected fields plus `extra` ones needed internally (e.g. sort keys)."""
+    projection = {"_id": 0}
+    projection.update({field: 1 for field in selected.union(extra)})
+    return projection
+
+
+def strip_unselected(docs: List[dict], selected: FrozenSet[str]) -> List[dict]:
+    for doc in docs:
+        for field in [f for f in doc if f not in selected]:
+            del doc[field]
+    return docs
+
+
+@functools.lru_cache(maxsize=128)
+def sparse_model(model: type, selected: FrozenSet[str]) -> type:
+    """A copy of `model` restricted to the selected fields."""
+    definitions = {
+        name: (field.annotation, field)
+        for name, field in model.model_fields.items()
+        if name in selected
+    }
+    return create_model(f"{model.__name__}Fields", __config__=model.model_config, **definitions)
+
+
+def sparse_list_model(model: type, selected: Optional[FrozenSet[str]]):
+    return List[model] if selected is None else List[sparse_model(model, selected)]
+
@@ -0,0 +1,363 @@
+"""
+Generate a synthetic store dataset of any size
+Run: python generate_data.py [--products 100000] [--orders 500000] [--users 50000] [--categories 8]
+                             [--seed 42] [--end YYYY-MM-DD] [--days 365] [--append]
+                             [--batch-size 1000] [--workers N] [--concurrency 8]
+
+Every document is a pure function of the seed and its index, so a seed
+always produces the same dataset regardless of batch size or worker count,
+and orders can reference any product or customer by index without reading
+them back. Product popularity and repeat customers follow Zipf
+distributions, carts hold several items, and order dates lean towards the
+end of the window, peak in the evening and carry a status that matches their
+age. Batches are generated in worker processes and written with concurrent
+unordered insert_many calls.
+
+Without --append the categories, products, orders and generated customers
+are replaced (admin users are kept). With --append the counts given are
+added on top of the existing dataset, continuing its indexes with its seed
+and category count; --end and --days may move the order window forward.
+Dataset state is kept in the `synthetic_data` collection, and the sales
+rollups are rebuilt once the orders are in.
+"""
+from concurrent.futures import Executor, ProcessPoolExecutor
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from math import gcd, sqrt
+from typing import Callable, Counter, List, NamedTuple, Optional
+import argparse
+import asyncio
+import collections
+import os
+import random
+import time
+import uuid
+
+import numpy as np
+
+from category_counts import apply_category_deltas
+from sales_rollups import rebuild_sales_rollups
+from search import with_search_fields
+
+STATE_ID = "state"
+
+CATEGORIES = [
+    ("bedsheets", "Bedsheets", "photo-1522771739844-6a9f6d5f14af", ["Sheet Set", "Fitted Sheet", "Duvet Cover", "Bedsheet"]),
+    ("curtains", "Curtains", "photo-1513519245088-0e12902e5a38", ["Blackout Curtain", "Sheer Curtain", "Curtain Pair"]),
+    ("cushion-covers", "Cushion Covers", "photo-1586023492125-27b2c045efd7", ["Cushion Cover", "Throw Pillow Cover"]),
+    ("rugs-carpets", "Rugs & Carpets", "photo-1600166898405-da9535204843", ["Area Rug", "Runner", "Doormat"]),
+    ("wall-decor", "Wall Decor", "photo-1513519245088-0e12902e5a38", ["Wall Art", "Mirror", "Wall Clock"]),
+    ("kitchen", "Kitchen", "photo-1556909114-f6e7ad7d3136", ["Dinner Set", "Serving Bowl", "Table Runner"]),
+    ("lighting", "Lighting", "photo-1524484485831-a92ffc0de03f", ["Table Lamp", "Floor Lamp", "Pendant Light"]),
+    ("bath", "Bath", "photo-1620626011761-996317b8d101", ["Bath Towel Set", "Bath Mat", "Shower Curtain"]),
+]
+MATERIALS = ["Cotton", "Linen", "Velvet", "Jute", "Ceramic", "Bamboo", "Silk", "Wool", "Chenille", "Terry"]
+STYLES = ["Classic", "Boho", "Minimal", "Royal", "Floral", "Geometric", "Vintage", "Coastal", "Botanical", "Nordic"]
+COLORS = ["Sage Green", "Dusty Rose", "Navy", "Ivory", "Charcoal", "Mustard", "Teal", "Terracotta", "White", "Natural"]
+SIZES = ["Single", "Double", "Queen", "King"]
+FEATURES = ["Machine Washable", "Handmade", "Fade Resistant", "Eco Friendly", "Easy Care", "Premium Quality"]
+FIRST_NAMES = ["Priya", "Rahul", "Anita", "Vikram", "Sneha", "Arjun", "Kavya", "Rohan", "Meera", "Aditya", "Isha", "Karan"]
+LAST_NAMES = ["Sharma", "Mehta", "Desai", "Singh", "Iyer", "Patel", "Reddy", "Nair", "Gupta", "Kapoor", "Joshi", "Rao"]
+CITIES = [
+    ("Mumbai", "Maharashtra", "400001"), ("Delhi", "Delhi", "110001"), ("Bangalore", "Karnataka", "560001"),
+    ("Jaipur", "Rajasthan", "302001"), ("Chennai", "Tamil Nadu", "600001"), ("Pune", "Maharashtra", "411001"),
+    ("Hyderabad", "Telangana", "500001"), ("Kolkata", "West Bengal", "700001"),
+]
+PAYMENT_METHODS = ["upi", "card", "cod", "netbanking"]
+PAYMENT_WEIGHTS = [45, 30, 18, 7]
+# Share of orders by hour of day (UTC+5:30 evenings peak around 14:00-16:00 UTC)
+HOUR_WEIGHTS = [3, 2, 2, 3, 4, 5, 6, 6, 6, 6, 7, 7, 7, 8, 9, 9, 8, 6, 4, 3, 2, 2, 2, 2]
+CART_SIZE_WEIGHTS = [55, 25, 11, 5, 2, 1, 1]
+QUANTITY_WEIGHTS = [80, 15, 5]
+# (max age in days, statuses, weights): older orders have mostly been delivered or cancelled
+STATUS_BY_AGE = [
+    (1, ["Pending", "Processing", "Cancelled"], [60, 32, 8]),
+    (3, ["Pending", "Processing", "Shipped", "Cancelled"], [5, 40, 45, 10]),
+    (10, ["Shipped", "Delivered", "Cancelled"], [40, 50, 10]),
+    (None, ["Delivered", "Cancelled"], [89, 11]),
+]
+HOURS_TO_STATUS = {"Pending": 0, "Processing": 6, "Shipped": 30, "Delivered": 96, "Cancelled": 12}
+
+# bcrypt hash of a random password nobody kept, so generated customers can't log in
+UNUSABLE_PASSWORD_HASH = "$2b$12$Mydo9vMWyZDhYl/9ASFMA.h7pLAcPGuOpOLCzeZcE1tqbDp8N4RtG"
+# What seed_data.py and POST /api/settings/seed load
+DEMO_DATASET = {"categories": len(CATEGORIES), "products": 120, "users": 40, "orders": 300, "seed": 42}
+
+PRODUCT_POPULARITY_EXPONENT = 1.1
+CUSTOMER_LOYALTY_EXPONENT = 0.6
+CATEGORY_SKEW_EXPONENT = 0.5
+
+
+class DatasetSpec(NamedTuple):
+    seed: int
+    categories: int
+    # Totals that orders draw products and customers from
+    products: int
+    users: int
+    end: datetime
+    days: int
+    password_hash: str = UNUSABLE_PASSWORD_HASH
+
+
+def image_url(photo: str, size: int) -> str:
+    return f"https://images.unsplash.com/{photo}?w={size}&h={size}&fit=crop"
+
+
+def document_rng(seed: int, kind: str, index: int) -> random.Random:
+    return random.Random(f"{seed}:{kind}:{index}")
+
+
+def new_id(rng: random.Random) -> str:
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+
+@lru_cache(maxsize=16)
+def zipf_cdf(n: int, exponent: float) -> np.ndarray:
+    cdf = np.cumsum(1.0 / np.arange(1, n + 1, dtype=np.float64) ** exponent)
+    return cdf / cdf[-1]
+
+
+@lru_cache(maxsize=16)
+def rank_stride(n: int) -> int:
+    # Popularity rank r belongs to index (r * stride) % n, so the popular documents are spread over the range
+    stride = 2654435761 % n or 1
+    while gcd(stride, n) != 1:
+        stride += 1
+    return stride
+
+
+def zipf_index(rng: random.Random, n: int, exponent: float) -> int:
+    rank = min(int(zipf_cdf(n, exponent).searchsorted(rng.random(), side="right")), n - 1)
+    return rank * rank_stride(n) % n
+
+
+def make_category(spec: DatasetSpec, i: int) -> dict:
+    rng = document_rng(spec.seed, "category", i)
+    slug, name, photo, _ = CATEGORIES[i % len(CATEGORIES)]
+    if i >= len(CATEGORIES):
+        style = STYLES[(i // len(CATEGORIES) - 1) % len(STYLES)]
+        slug, name = f"{style.lower()}-{slug}-{i}", f"{style} {name}"
+    return {"id": new_id(rng), "name": name, "slug": slug, "image": image_url(photo, 400), "count": 0}
+
+
+def make_product(spec: DatasetSpec, i: int) -> dict:
+    rng = document_rng(spec.seed, "product", i)
+    # Everything an order item copies is drawn first and doesn't depend on the date window
+    category = zipf_index(rng, spec.categories, CATEGORY_SKEW_EXPONENT)
+    _, _, photo, kinds = CATEGORIES[category % len(CATEGORIES)]
+    name = f"{rng.choice(STYLES)} {rng.choice(MATERIALS)} {rng.choice(kinds)}"
+    original_price = float(rng.randrange(499, 9999, 100))
+    discount = rng.choice([0, 0, 10, 20, 30, 40, 50])
+    price = round(original_price * (100 - discount) / 100, 2)
+    colors = rng.sample(COLORS, rng.randint(1, 4))
+    sizes = rng.sample(SIZES, rng.randint(1, 3))
+    image = image_url(photo, 600)
+    product_id = new_id(rng)
+
+    stock = rng.choice([0, rng.randint(1, 10), rng.randint(11, 500), rng.randint(11, 500)])
+    created_at = spec.end - timedelta(seconds=rng.randrange((spec.days + 180) * 86400))
+    return with_search_fields({
+        "id": product_id, "name": name, "slug": f"{name.lower().replace(' ', '-')}-{i}",
+        "category": make_category(spec, category)["slug"],
+        "price": price, "original_price": original_price, "discount": discount,
+        "rating": round(rng.uniform(3.5, 5.0), 1), "reviews": int(rng.paretovariate(1.2) * 10),
+        "description": f"{name} made from premium {name.split()[1].lower()}.",
+        "features": rng.sample(FEATURES, 2), "colors": colors, "sizes": sizes,
+        "image": image, "images": [image],
+        "in_stock": stock > 0, "is_new": rng.random() < 0.1, "is_best_seller": rng.random() < 0.05,
+        "stock_quantity": stock, "created_at": created_at, "updated_at": created_at,
+    })
+
+
+@lru_cache(maxsize=65536)
+def product_for_order(seed: int, categories: int, i: int) -> tuple:
+    """(id, name, image, price, sizes, colors, category) of product i; independent of the date window."""
+    product = make_product(DatasetSpec(seed, categories, 0, 0, datetime.now(timezone.utc), 0), i)
+    return product["id"], product["name"], product["image"], product["price"], product["sizes"], product["colors"], product["category"]
+
+
+def make_user(spec: DatasetSpec, i: int) -> dict:
+    rng = document_rng(spec.seed, "user", i)
+    first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+    city, state, pincode = rng.choice(CITIES)
+    return {
+        "id": new_id(rng), "email": f"{first}.{last}.{i}@example.com".lower(), "name": f"{first} {last}",
+        "role": "customer", "hashed_password": spec.password_hash,
+        "address": {"address": f"{rng.randint(1, 999)} {rng.choice(['MG Road', 'Park Street', 'Civil Lines', 'Brigade Road'])}",
+                    "city": city, "state": state, "pincode": pincode, "phone": f"9{rng.randrange(10 ** 9):09d}"},
+        "created_at": spec.end - timedelta(seconds=rng.randrange((spec.days + 365) * 86400)),
+    }
+
+
+@lru_cache(maxsize=65536)
+def customer_for_order(seed: int, i: int) -> tuple:
+    """(name, email, address) of customer i; independent of the date window."""
+    customer = make_user(DatasetSpec(seed, 0, 0, 0, datetime.now(timezone.utc), 0), i)
+    return customer["name"], customer["email"], customer["address"]
+
+
+def make_order(spec: DatasetSpec, i: int) -> dict:
+    rng = document_rng(spec.seed, "order", i)
+    items = {}
+    for _ in range(rng.choices(range(1, len(CART_SIZE_WEIGHTS) + 1), CART_SIZE_WEIGHTS)[0]):
+        product_id, name, image, price, sizes, colors, category = product_for_order(
+            spec.seed, spec.categories, zipf_index(rng, spec.products, PRODUCT_POPULARITY_EXPONENT)
+        )
+        quantity = rng.choices(range(1, len(QUANTITY_WEIGHTS) + 1), QUANTITY_WEIGHTS)[0]
+        if product_id in items:
+            items[product_id]["quantity"] += quantity
+            continue
+        items[product_id] = {
+            "product_id": product_id, "product_name": name, "product_image": image, "quantity": quantity,
+            "price": price, "selected_size": rng.choice(sizes), "selected_color": rng.choice(colors),
+            "category": category,
+        }
+    subtotal = round(sum(item["price"] * item["quantity"] for item in items.values()), 2)
+    shipping = 0.0 if subtotal >= 999 else 99.0
+
+    if spec.users:
+        name, email, customer_address = customer_for_order(spec.seed, zipf_index(rng, spec.users, CUSTOMER_LOYALTY_EXPONENT))
+        first, last = name.split(" ", 1)
+        address = {"first_name": first, "last_name": last, "email": email, **customer_address}
+    else:
+        city, state, pincode = rng.choice(CITIES)
+        address = {"first_name": rng.choice(FIRST_NAMES), "last_name": rng.choice(LAST_NAMES), "email": f"guest{i}@example.com",
+                   "address": f"{i} MG Road", "city": city, "state": state, "pincode": pincode, "phone": "9876543210"}
+
+    # sqrt skews days towards the end of the window, like a growing store
+    day = min(int(spec.days * (1 - sqrt(rng.random()))), spec.days - 1)
+    created_at = spec.end - timedelta(days=day + 1) + timedelta(
+        hours=rng.choices(range(24), HOUR_WEIGHTS)[0], seconds=rng.randrange(3600)
+    )
+    age_days = (spec.end - created_at).total_seconds() / 86400
+    statuses, weights = next((s, w) for limit, s, w in STATUS_BY_AGE if limit is None or age_days < limit)
+    status = rng.choices(statuses, weights)[0]
+    updated_at = min(created_at + timedelta(hours=HOURS_TO_STATUS[status] * rng.uniform(0.5, 1.5)), spec.end)
+    return {
+        "id": new_id(rng), "order_number": f"SLAYK-S{i:09d}", "items": list(items.values()),
+        "shipping_address": address,
+        "payment_method": rng.choices(PAYMENT_METHODS, PAYMENT_WEIGHTS)[0],
+        "subtotal": subtotal, "shipping": shipping, "total": subtotal + shipping,
+        "status": status, "tracking_number": f"TRK{i:09d}" if status in ("Shipped", "Delivered") else None,
+        "created_at": created_at, "updated_at": updated_at,
+    }
+
+
+GENERATORS = {"categories": make_category, "products": make_product, "users": make_user, "orders": make_order}
+
+
+def generate_batch(kind: str, spec: DatasetSpec, start: int, stop: int) -> List[dict]:
+    make = GENERATORS[kind]
+    return [make(spec, i) for i in range(start, stop)]
+
+
+async def insert_generated(db, kind: str, spec: DatasetSpec, start: int, stop: int, batch_size: int,
+                           executor: Optional[Executor], concurrency: int,
+                           on_batch: Optional[Callable[[List[dict]], None]] = None) -> None:
+    """Generate documents [start, stop) in batches and insert them with up to `concurrency` batches in flight."""
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def batch(lo: int, hi: int) -> None:
+        async with semaphore:
+            if executor is None:
+                docs = generate_batch(kind, spec, lo, hi)
+            else:
+                docs = await loop.run_in_executor(executor, generate_batch, kind, spec, lo, hi)
+            await db[kind].insert_many(docs, ordered=False)
+            if on_batch:
+                on_batch(docs)
+
+    await asyncio.gather(*[batch(lo, min(lo + batch_size, stop)) for lo in range(start, stop, batch_size)])
+
+
+async def generate_dataset(db, *, categories: int, products: int, users: int, orders: int, seed: int,
+                           end: Optional[datetime] = None, days: int = 365, append: bool = False,
+                           batch_size: int = 1000, executor: Optional[Executor] = None, concurrency: int = 8,
+                           report: Callable[[str], None] = lambda line: None) -> dict:
+    """Write (or with append=True, extend) the dataset; returns the new dataset state."""
+    state = await db.synthetic_data.find_one({"_id": STATE_ID})
+    if append:
+        if state is None:
+            raise ValueError("No generated dataset to append to; run without --append first")
+        if categories:
+            raise ValueError("Categories are fixed when a dataset is created; append products, users and orders")
+        seed = state["seed"]
+        end = end or state["end"].replace(tzinfo=timezone.utc)
+        days = days or state["days"]
+    else:
+        await db.categories.delete_many({})
+        await db.products.delete_many({})
+        await db.orders.delete_many({})
+        await db.users.delete_many({"role": "customer"})
+        state = {"categories": 0, "products": 0, "users": 0, "orders": 0}
+        end = end or datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+
+    totals = {kind: state[kind] + added for kind, added in
+              (("categories", categories), ("products", products), ("users", users), ("orders", orders))}
+    if totals["categories"] < 1 or (orders and totals["products"] < 1):
+        raise ValueError("A dataset needs at least one category, and one product before it can have orders")
+    spec = DatasetSpec(seed, totals["categories"], totals["products"], totals["users"], end, days)
+
+    category_counts: Counter = collections.Counter()
+    for kind in ("categories", "products", "users", "orders"):
+        if totals[kind] == state[kind]:
+            continue
+        started = time.perf_counter()
+        on_batch = (lambda docs: category_counts.update(p["category"] for p in docs)) if kind == "products" else None
+        await insert_generated(db, kind, spec, state[kind], totals[kind], batch_size, executor, concurrency, on_batch)
+        elapsed = time.perf_counter() - started
+        added = totals[kind] - state[kind]
+        report(f"✅ {kind}: {added:,} in {elapsed:.1f}s ({added / elapsed:,.0f}/s)")
+    await apply_category_deltas(db, dict(category_counts))
+    if orders or not append:
+        started = time.perf_counter()
+        written = await rebuild_sales_rollups(db)
+        report(f"✅ sales rollups: {written:,} in {time.perf_counter() - started:.1f}s")
+
+    new_state = {"seed": seed, "end": end, "days": days, **totals, "updated_at": datetime.now(timezone.utc)}
+    await db.synthetic_data.replace_one({"_id": STATE_ID}, new_state, upsert=True)
+    return new_state
+
+
+async def main(args) -> None:
+    from database import client, db
+    from indexes import ensure_indexes
+
+    await ensure_indexes(db)
+    end = datetime.strptime(args.end, "%Y-%m-%d").replace(tzinfo=timezone.utc) if args.end else None
+    executor = ProcessPoolExecutor(args.workers) if args.workers > 0 else None
+    print(f"🌱 {'Appending to' if args.append else 'Generating'} the dataset...")
+    try:
+        state = await generate_dataset(
+            db, categories=args.categories, products=args.products, users=args.users, orders=args.orders,
+            seed=args.seed, end=end, days=args.days, append=args.append, batch_size=args.batch_size,
+            executor=executor, concurrency=args.concurrency, report=print,
+        )
+    finally:
+        if executor:
+            executor.shutdown()
+        client.close()
+    print(f"🎉 Dataset now has {state['categories']:,} categories, {state['products']:,} products, "
+          f"{state['users']:,} customers and {state['orders']:,} orders (seed {state['seed']})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--categories", type=int, default=None, help="default 8 for a new dataset")
+    parser.add_argument("--products", type=int, default=0)
+    parser.add_argument("--users", type=int, default=0, help="customer accounts, reused by their orders")
+    parser.add_argument("--orders", type=int, default=0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--end", help="last day of the order window (YYYY-MM-DD, exclusive); default today")
+    parser.add_argument("--days", type=int, default=None, help="length of the order window; default 365")
+    parser.add_argument("--append", action="store_true", help="add to the existing dataset instead of replacing it")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="generator processes; 0 generates inline")
+    parser.add_argument("--concurrency", type=int, default=8, help="insert_many calls in flight")
+    args = parser.parse_args()
+    if args.categories is None:
+        args.categories = 0 if args.append else len(CATEGORIES)
+    if args.days is None:
+        args.days = 0 if args.append else 365
+    asyncio.run(main(args))
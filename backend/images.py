@@ -0,0 +1,228 @@
+"""
+Uploaded images.
+
+Uploads are streamed to a temporary file in UPLOAD_TMP_DIR while they are
+hashed, so memory stays constant in the size of the file. UPLOAD_TMP_DIR is
+a sibling of UPLOAD_DIR on the same volume: partial files are never served,
+and moving a finished file into place is an atomic rename. Files are stored by the
+SHA-256 of their content: uploading an image that is already known returns
+the existing record without writing or resizing anything. New images get
+thumb, card and detail variants in WebP and JPEG, rendered on a process pool
+so the event loop and the GIL stay free:
+
+    /uploads/images/ab/<sha256>/original.jpg
+    /uploads/images/ab/<sha256>/card.webp, card.jpg, ...
+
+nginx serves /uploads/ from the same volume with immutable caching, which is
+safe because a path's content never changes. with_image_variants() points a
+product's `image` at the card variant and its `images` at the detail variant
+when they are given as upload URLs, so listing grids don't fetch detail-size
+images.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from fastapi import HTTPException, status
+from pathlib import Path
+from typing import AsyncIterator, Optional
+import asyncio
+import hashlib
+import multiprocessing
+import os
+import re
+import shutil
+import tempfile
+import time
+
+from PIL import ExifTags, Image, ImageOps, UnidentifiedImageError
+
+UPLOAD_DIR = Path(os.environ.get("UPLOAD_DIR", Path(__file__).parent / "uploads"))
+# Not served; must be on the same filesystem as UPLOAD_DIR
+UPLOAD_TMP_DIR = Path(os.environ.get("UPLOAD_TMP_DIR", UPLOAD_DIR.parent / "upload_tmp"))
+UPLOAD_URL = "/uploads"
+MAX_IMAGE_UPLOAD_BYTES = int(os.environ.get("MAX_IMAGE_UPLOAD_BYTES", str(20 * 1024 * 1024)))
+IMAGE_PROCESS_WORKERS = int(os.environ.get("IMAGE_PROCESS_WORKERS", str(min(2, os.cpu_count() or 1))))
+# Larger images are refused rather than decoded (decompression bombs)
+Image.MAX_IMAGE_PIXELS = int(os.environ.get("MAX_IMAGE_PIXELS", str(50_000_000)))
+
+# Longest edge of each variant, largest first; images are never upscaled
+VARIANTS = {"detail": 1200, "card": 400, "thumb": 160}
+FORMATS = {
+    "webp": ("WEBP", {"quality": 80, "method": 4}),
+    "jpg": ("JPEG", {"quality": 82, "optimize": True, "progressive": True}),
+}
+# The variant each product field should reference
+PRODUCT_IMAGE_VARIANT = "card"
+PRODUCT_GALLERY_VARIANT = "detail"
+
+# Leading bytes of the accepted formats -> extension of the stored original
+SIGNATURES = [
+    (re.compile(rb"^\xff\xd8\xff"), "jpg"),
+    (re.compile(rb"^\x89PNG\r\n\x1a\n"), "png"),
+    (re.compile(rb"^RIFF....WEBP", re.DOTALL), "webp"),
+]
+SIGNATURE_BYTES = 12
+FILE_MODE = 0o644
+# Staged files older than this at startup were left by a worker that died mid-upload
+STALE_TEMP_SECONDS = 3600
+
+UPLOAD_URL_RE = re.compile(rf"^{UPLOAD_URL}/images/[0-9a-f]{{2}}/(?P<hash>[0-9a-f]{{64}})/(?P<name>\w+)\.(?P<ext>\w+)$")
+
+# Spawned rather than forked: the app process runs Motor's threads
+_image_executor = ProcessPoolExecutor(max_workers=IMAGE_PROCESS_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+
+
+def image_directory(content_hash: str) -> Path:
+    return UPLOAD_DIR / "images" / content_hash[:2] / content_hash
+
+
+def image_url(content_hash: str, name: str, ext: str) -> str:
+    return f"{UPLOAD_URL}/images/{content_hash[:2]}/{content_hash}/{name}.{ext}"
+
+
+def sniff(head: bytes) -> Optional[str]:
+    return next((ext for signature, ext in SIGNATURES if signature.match(head)), None)
+
+
+def render_variants(original: str, directory: str) -> dict:
+    """Write every variant of `original` into `directory`; runs on the image process pool."""
+    try:
+        with Image.open(original) as image:
+            # Recorded before draft() shrinks the decode; EXIF orientations 5-8 swap the axes
+            width, height = image.size
+            if image.getexif().get(ExifTags.Base.Orientation) in (5, 6, 7, 8):
+                width, height = height, width
+            # JPEG decoders can scale by 1/2..1/8 while decoding, which is much cheaper than resizing afterwards
+            image.draft("RGB", (max(VARIANTS.values()),) * 2)
+            image = ImageOps.exif_transpose(image)
+            image.load()
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError, SyntaxError) as e:
+        raise ValueError("Not a readable JPEG, PNG or WebP image") from e
+
+    if image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA" if "transparency" in image.info or image.mode in ("LA", "PA") else "RGB")
+    variants = {}
+    # Each variant is resized from the previous, larger one
+    for name, edge in VARIANTS.items():
+        image.thumbnail((edge, edge), Image.Resampling.LANCZOS)
+        # JPEG has no alpha channel; transparent areas become white
+        flat = image
+        if image.mode == "RGBA":
+            flat = Image.new("RGB", image.size, "white")
+            flat.paste(image, mask=image.getchannel("A"))
+        for ext, (image_format, options) in FORMATS.items():
+            # Unique names: concurrent uploads of the same new file render the same variants
+            fd, temp_path = tempfile.mkstemp(dir=UPLOAD_TMP_DIR, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as out:
+                    (image if image_format == "WEBP" else flat).save(out, image_format, **options)
+                # mkstemp creates files readable by the owner only; nginx serves these
+                os.chmod(temp_path, FILE_MODE)
+                os.replace(temp_path, os.path.join(directory, f"{name}.{ext}"))
+            except BaseException:
+                os.unlink(temp_path)
+                raise
+        variants[name] = {"width": image.width, "height": image.height}
+    return {"width": width, "height": height, "variants": variants}
+
+
+async def receive_upload(chunks: AsyncIterator[bytes]):
+    """Stream the body to a temporary file; returns (path, sha256 hex, size, extension)."""
+    UPLOAD_TMP_DIR.mkdir(parents=True, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=UPLOAD_TMP_DIR, suffix=".tmp")
+    digest = hashlib.sha256()
+    size = 0
+    head = b""
+    ext = None
+    try:
+        with os.fdopen(fd, "wb") as out:
+            async for chunk in chunks:
+                size += len(chunk)
+                if size > MAX_IMAGE_UPLOAD_BYTES:
+                    raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                                        detail=f"Images are limited to {MAX_IMAGE_UPLOAD_BYTES // (1024 * 1024)} MB")
+                if ext is None:
+                    head += chunk[:SIGNATURE_BYTES]
+                    if len(head) >= SIGNATURE_BYTES:
+                        ext = sniff(head)
+                        if ext is None:
+                            raise HTTPException(status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+                                                detail="Upload a JPEG, PNG or WebP image")
+                digest.update(chunk)
+                out.write(chunk)
+        if ext is None:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Empty or truncated image")
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+    return temp_path, digest.hexdigest(), size, ext
+
+
+def remove_stale_temp_files(max_age: float = STALE_TEMP_SECONDS) -> int:
+    """Delete staged files left behind by a crash; returns how many were removed."""
+    cutoff = time.time() - max_age
+    removed = 0
+    for path in UPLOAD_TMP_DIR.glob("*.tmp"):
+        try:
+            # Other workers may be streaming into younger files right now
+            if path.stat().st_mtime < cutoff:
+                path.unlink()
+                removed += 1
+        except FileNotFoundError:
+            continue
+    return removed
+
+
+async def store_image(db, chunks: AsyncIterator[bytes]) -> dict:
+    """Store an uploaded image and its variants, or return the existing record for the same content."""
+    temp_path, content_hash, size, ext = await receive_upload(chunks)
+    existing = await db.images.find_one({"hash": content_hash}, {"_id": 0})
+    if existing:
+        os.unlink(temp_path)
+        return {**existing, "deduplicated": True}
+
+    directory = image_directory(content_hash)
+    directory.mkdir(parents=True, exist_ok=True)
+    original = directory / f"original.{ext}"
+    os.chmod(temp_path, FILE_MODE)
+    os.replace(temp_path, original)
+    try:
+        rendered = await asyncio.get_running_loop().run_in_executor(
+            _image_executor, render_variants, str(original), str(directory)
+        )
+    except ValueError as e:
+        shutil.rmtree(directory, ignore_errors=True)
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    record = {
+        "hash": content_hash,
+        "bytes": size,
+        "width": rendered["width"],
+        "height": rendered["height"],
+        "original": image_url(content_hash, "original", ext),
+        "variants": {
+            name: {**dimensions, **{fmt: image_url(content_hash, name, fmt) for fmt in FORMATS}}
+            for name, dimensions in rendered["variants"].items()
+        },
+        "created_at": datetime.now(timezone.utc),
+    }
+    # A concurrent upload of the same file may have won the race; either record describes the same files
+    await db.images.update_one({"hash": content_hash}, {"$setOnInsert": record}, upsert=True)
+    return {**record, "deduplicated": False}
+
+
+def variant_url(url: str, variant: str) -> str:
+    """The `variant` of an uploaded image URL (WebP unless a JPEG was given); other URLs are returned as is."""
+    match = UPLOAD_URL_RE.match(url or "")
+    if not match:
+        return url
+    ext = "jpg" if match["ext"] == "jpg" and match["name"] != "original" else "webp"
+    return image_url(match["hash"], variant, ext)
+
+
+def with_image_variants(fields: dict) -> dict:
+    """Point uploaded `image`/`images` URLs in product fields at the variants their views display."""
+    if fields.get("image"):
+        fields["image"] = variant_url(fields["image"], PRODUCT_IMAGE_VARIANT)
+    if fields.get("images"):
+        fields["images"] = [variant_url(url, PRODUCT_GALLERY_VARIANT) for url in fields["images"]]
+    return fields
@@ -0,0 +1,133 @@
+"""
+Index registry for every collection the API queries.
+
+Indexes are declared here once and applied idempotently with ensure_indexes()
+at startup and from the maintenance scripts (create_admin.py, seed_data.py).
+"""
+from pymongo import IndexModel, ASCENDING, DESCENDING, TEXT
+from pymongo.errors import CollectionInvalid, OperationFailure
+import logging
+
+logger = logging.getLogger(__name__)
+
+INDEXES = {
+    "products": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("slug", ASCENDING)], name="slug_unique", unique=True),
+        IndexModel([("created_at", ASCENDING), ("id", ASCENDING)], name="created_at_id"),
+        IndexModel([("category", ASCENDING), ("created_at", ASCENDING), ("id", ASCENDING)], name="category_created_at_id"),
+        IndexModel(
+            [("name", TEXT), ("features", TEXT), ("colors", TEXT), ("description", TEXT)],
+            name="product_search",
+            weights={"name": 10, "features": 4, "colors": 4, "description": 1},
+            default_language="english",
+        ),
+        IndexModel([("search_prefixes", ASCENDING)], name="search_prefixes"),
+        IndexModel([("stock_quantity", ASCENDING), ("id", ASCENDING)], name="stock_quantity_id"),
+    ],
+    "orders": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("created_at", DESCENDING), ("id", DESCENDING)], name="created_at_id"),
+        IndexModel([("status", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], name="status_created_at_id"),
+        IndexModel([("order_number", ASCENDING)], name="order_number"),
+        # Incremental order snapshot reads
+        IndexModel([("updated_at", ASCENDING)], name="updated_at"),
+    ],
+    "categories": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("slug", ASCENDING)], name="slug_unique", unique=True),
+    ],
+    "users": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+    ],
+    # Records expire with the token they revoke
+    "revoked_tokens": [
+        IndexModel([("jti", ASCENDING)], name="jti_unique", unique=True),
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+    "settings": [
+        IndexModel([("key", ASCENDING)], name="key_unique", unique=True),
+    ],
+    # Date-range reads of one series; the _id is the composite key that writes upsert on
+    "sales_rollups": [
+        IndexModel([("granularity", ASCENDING), ("dimension", ASCENDING), ("key", ASCENDING), ("bucket", ASCENDING)], name="series_bucket"),
+        IndexModel([("granularity", ASCENDING), ("dimension", ASCENDING), ("bucket", ASCENDING)], name="dimension_bucket"),
+    ],
+    # Uploaded images are deduplicated by content hash
+    "images": [
+        IndexModel([("hash", ASCENDING)], name="hash_unique", unique=True),
+    ],
+}
+
+
+async def ensure_indexes(db) -> dict:
+    """Create every registered index that does not exist yet.
+
+    Returns a mapping of collection name to the index names that were missing
+    before this call. An index that cannot be built (e.g. a unique index over
+    duplicate data) is logged and skipped so startup is never blocked.
+    """
+    missing = {}
+    for collection_name, models in INDEXES.items():
+        collection = db[collection_name]
+        existing = await collection.index_information()
+        for model in models:
+            name = model.document["name"]
+            if name in existing:
+                continue
+            missing.setdefault(collection_name, []).append(name)
+            try:
+                await collection.create_indexes([model])
+            except OperationFailure as e:
+                logger.error("Could not create index %s.%s: %s", collection_name, name, e)
+    return missing
+
+
+async def index_report(db) -> dict:
+    """Compare the registry with what exists in the database.
+
+    For each collection, lists registered indexes that are missing, indexes in
+    the database that are not registered, and indexes with no recorded
+    accesses since the server started (from $indexStats).
+    """
+    report = {}
+    for collection_name, models in INDEXES.items():
+        collection = db[collection_name]
+        registered = {model.document["name"] for model in models}
+        existing = await collection.index_information()
+
+        unused = []
+        try:
+            async for stat in collection.aggregate([{"$indexStats": {}}]):
+                if stat["name"] != "_id_" and stat["accesses"]["ops"] == 0:
+                    unused.append(stat["name"])
+        except OperationFailure as e:
+            logger.warning("$indexStats unavailable for %s: %s", collection_name, e)
+
+        report[collection_name] = {
+            "missing": sorted(registered - set(existing)),
+            "unregistered": sorted(set(existing) - registered - {"_id_"}),
+            "unused": sorted(unused),
+        }
+    return report
+
+
+def log_index_report(report: dict) -> None:
+    for collection_name, entry in report.items():
+        if entry["missing"]:
+            logger.warning("Missing indexes on %s: %s", collection_name, ", ".join(entry["missing"]))
+        if entry["unregistered"]:
+            logger.info("Unregistered indexes on %s: %s", collection_name, ", ".join(entry["unregistered"]))
+        if entry["unused"]:
+            logger.info("Unused indexes on %s since server start: %s", collection_name, ", ".join(entry["unused"]))
+
+
+async def ensure_capped_collection(db, name: str, size: int) -> None:
+    """Create a capped collection unless it already exists; run before ensure_indexes."""
+    try:
+        await db.create_collection(name, capped=True, size=size)
+    except CollectionInvalid:
+        pass
+    except OperationFailure as e:
+        logger.warning("Could not create capped %s collection: %s", name, e)
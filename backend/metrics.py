@@ -0,0 +1,237 @@
+"""
+Prometheus-style metrics served at /api/metrics.
+
+MetricsMiddleware records a latency histogram and status counts per route
+template (e.g. /api/products/{product_id}). While a request is handled its
+RequestContext is the current one, so the Mongo CommandMonitor (see
+monitoring.py) can charge command time to the route that issued it; Motor
+runs driver calls with a copy of the caller's context, which is what makes
+that attribution work across threads. Metrics are kept per worker process in
+plain locked counters and rendered in the text exposition format on demand.
+"""
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+import asyncio
+import os
+import threading
+import time
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+EVENT_LOOP_LAG_INTERVAL_SECONDS = float(os.environ.get("EVENT_LOOP_LAG_INTERVAL_SECONDS", "0.5"))
+# When set, scrapers must send it as a bearer token
+METRICS_BEARER_TOKEN = os.environ.get("METRICS_BEARER_TOKEN")
+
+
+def format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [
+        '%s="%s"' % (name, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for name, value in zip(names, values)
+    ]
+    if extra:
+        pairs.append(extra)
+    return "{%s}" % ",".join(pairs) if pairs else ""
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = (), kind: str = "counter"):
+        self.name, self.help, self.labels, self.kind = name, help, labels, kind
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels: Tuple[str, ...] = (), amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def set(self, labels: Tuple[str, ...], value: float) -> None:
+        with self._lock:
+            self._values[labels] = value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{format_labels(self.labels, labels)} {value:g}")
+        return lines
+
+
+def Gauge(name: str, help: str, labels: Tuple[str, ...] = ()) -> Counter:
+    return Counter(name, help, labels, kind="gauge")
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = (), buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name, self.help, self.labels, self.buckets = name, help, labels, buckets
+        # labels -> [count per bucket..., +Inf count, sum]
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels: Tuple[str, ...], value: float) -> None:
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = i
+                break
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted((labels, list(values)) for labels, values in self._series.items())
+        for labels, values in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), values):
+                cumulative += count
+                le = 'le="%s"' % ("+Inf" if bound == float("inf") else f"{bound:g}")
+                lines.append(f"{self.name}_bucket{format_labels(self.labels, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{format_labels(self.labels, labels)} {values[-1]:.6f}")
+            lines.append(f"{self.name}_count{format_labels(self.labels, labels)} {cumulative}")
+        return lines
+
+
+REQUEST_DURATION = Histogram("http_request_duration_seconds", "Request latency by route.", ("method", "route"))
+REQUESTS = Counter("http_requests_total", "Requests by route and status code.", ("method", "route", "status"))
+REQUEST_MONGO_SECONDS = Counter("http_request_mongo_seconds_total", "Time spent in Mongo commands by route.", ("method", "route"))
+REQUEST_MONGO_COMMANDS = Counter("http_request_mongo_commands_total", "Mongo commands issued by route.", ("method", "route"))
+MONGO_DURATION = Histogram("mongodb_command_duration_seconds", "Mongo command latency.", ("command", "collection"))
+MONGO_FAILURES = Counter("mongodb_command_failures_total", "Failed Mongo commands.", ("command", "collection"))
+LOOP_LAG = Histogram("event_loop_lag_seconds", "How late the event loop wakes a sleeping task.")
+LOOP_LAG_MAX = Gauge("event_loop_lag_max_seconds", "Largest event loop lag seen.")
+
+METRICS = [REQUEST_DURATION, REQUESTS, REQUEST_MONGO_SECONDS, REQUEST_MONGO_COMMANDS, MONGO_DURATION, MONGO_FAILURES, LOOP_LAG, LOOP_LAG_MAX]
+
+
+class RequestContext:
+    __slots__ = ("method", "scope", "mongo_seconds", "mongo_commands", "phases")
+
+    def __init__(self, scope: dict):
+        self.method = scope["method"]
+        self.scope = scope
+        self.mongo_seconds = 0.0
+        self.mongo_commands = 0
+        # Seconds per named phase; only collected while the request is being profiled
+        self.phases: Optional[Dict[str, float]] = None
+
+    @property
+    def route(self) -> str:
+        # FastAPI stores the matched route in the scope once routing is done
+        return getattr(self.scope.get("route"), "path", "unmatched")
+
+
+request_context: ContextVar[Optional[RequestContext]] = ContextVar("request_context", default=None)
+_context_lock = threading.Lock()
+
+
+def current_route() -> Optional[str]:
+    context = request_context.get()
+    return context.route if context is not None else None
+
+
+def record_mongo_time(seconds: float) -> None:
+    """Charge a finished Mongo command to the current request, if any."""
+    context = request_context.get()
+    if context is not None:
+        with _context_lock:
+            context.mongo_seconds += seconds
+            context.mongo_commands += 1
+
+
+class PhaseTimer:
+    """`with PhaseTimer("serialization"):` adds the block's time to a profiled request's phases."""
+    __slots__ = ("phases", "name", "started")
+
+    def __init__(self, name: str):
+        context = request_context.get()
+        self.phases = context.phases if context is not None else None
+        self.name = name
+
+    def __enter__(self):
+        if self.phases is not None:
+            self.started = time.perf_counter()
+
+    def __exit__(self, *exc):
+        if self.phases is not None:
+            self.phases[self.name] = self.phases.get(self.name, 0.0) + time.perf_counter() - self.started
+
+
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        context = RequestContext(scope)
+        token = request_context.set(context)
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            request_context.reset(token)
+            labels = (context.method, context.route)
+            REQUEST_DURATION.observe(labels, elapsed)
+            REQUESTS.inc(labels + (str(status),))
+            if context.mongo_commands:
+                REQUEST_MONGO_SECONDS.inc(labels, context.mongo_seconds)
+                REQUEST_MONGO_COMMANDS.inc(labels, context.mongo_commands)
+
+
+async def monitor_loop_lag(interval: float = EVENT_LOOP_LAG_INTERVAL_SECONDS) -> None:
+    """Background job for the app lifespan."""
+    worst = 0.0
+    while True:
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        lag = max(time.perf_counter() - started - interval, 0.0)
+        LOOP_LAG.observe((), lag)
+        if lag > worst:
+            worst = lag
+            LOOP_LAG_MAX.set((), worst)
+
+
+def render_pool(stats: dict) -> List[str]:
+    wait = stats["wait_ms"]
+    lines = []
+    for name, kind, help, value in (
+        ("mongodb_pool_max_size", "gauge", "Configured maximum pool size.", stats["max_pool_size"]),
+        ("mongodb_pool_connections_open", "gauge", "Open pool connections.", stats["connections_open"]),
+        ("mongodb_pool_connections_in_use", "gauge", "Checked-out pool connections.", stats["connections_in_use"]),
+        ("mongodb_pool_checkouts_total", "counter", "Connection checkouts.", stats["checkouts"]),
+        ("mongodb_pool_checkout_failures_total", "counter", "Failed connection checkouts.", stats["checkout_failures"]),
+    ):
+        lines += [f"# HELP {name} {help}", f"# TYPE {name} {kind}", f"{name} {value}"]
+
+    name = "mongodb_pool_checkout_wait_seconds"
+    lines += [f"# HELP {name} Time spent waiting for a pool connection.", f"# TYPE {name} histogram"]
+    cumulative = 0
+    for bound, count in wait["histogram"].items():
+        cumulative += count
+        le = bound if bound == "+Inf" else f"{float(bound) / 1000:g}"
+        lines.append(f'{name}_bucket{{le="{le}"}} {cumulative}')
+    lines.append(f"{name}_sum {wait['total'] / 1000:.6f}")
+    lines.append(f"{name}_count {cumulative}")
+    return lines
+
+
+def render(pool: Optional[dict] = None) -> str:
+    lines: List[str] = []
+    for metric in METRICS:
+        lines += metric.render()
+    if pool is not None:
+        lines += render_pool(pool)
+    return "\n".join(lines) + "\n"
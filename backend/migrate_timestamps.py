@@ -0,0 +1,106 @@
+"""
+Convert ISO-string timestamps written by older releases into BSON dates
+Run: python migrate_timestamps.py [--batch-size 1000] [--pause-ms 0] [--restart]
+
+The migration is online and resumable: documents are walked in _id order in
+batches, each conversion only applies if the field still holds the string that
+was read, and the last processed _id of every collection is checkpointed in
+the `migrations` collection so an interrupted run continues where it stopped.
+"""
+import argparse
+import asyncio
+import time
+from datetime import datetime, timezone
+from pymongo import UpdateOne
+from database import client, db
+from models import parse_timestamp
+
+MIGRATION_ID = "timestamps_to_bson_dates"
+
+TIMESTAMP_FIELDS = {
+    "products": ["created_at", "updated_at"],
+    "orders": ["created_at", "updated_at"],
+    "users": ["created_at"],
+    "settings": ["updated_at"],
+    "status_checks": ["timestamp"],
+}
+
+
+def conversion_for(doc: dict, fields: list):
+    # Filtering on the original strings keeps a concurrent write from being overwritten
+    match = {"_id": doc["_id"]}
+    update = {}
+    for field in fields:
+        value = doc.get(field)
+        if isinstance(value, str):
+            try:
+                update[field] = parse_timestamp(value)
+            except ValueError:
+                continue
+            match[field] = value
+    return UpdateOne(match, {"$set": update}) if update else None
+
+
+async def migrate_collection(collection_name: str, fields: list, batch_size: int, pause: float) -> None:
+    collection = db[collection_name]
+    checkpoint_id = f"{MIGRATION_ID}:{collection_name}"
+    checkpoint = await db.migrations.find_one({"_id": checkpoint_id}) or {}
+    if checkpoint.get("done"):
+        print(f"✅ {collection_name}: already migrated")
+        return
+
+    last_id = checkpoint.get("last_id")
+    processed = checkpoint.get("processed", 0)
+    converted = checkpoint.get("converted", 0)
+    total = await collection.estimated_document_count()
+    projection = {field: 1 for field in fields}
+    started = time.monotonic()
+
+    while True:
+        query = {"_id": {"$gt": last_id}} if last_id is not None else {}
+        batch = await collection.find(query, projection).sort("_id", 1).limit(batch_size).to_list(batch_size)
+        if not batch:
+            break
+
+        ops = [op for op in (conversion_for(doc, fields) for doc in batch) if op is not None]
+        if ops:
+            result = await collection.bulk_write(ops, ordered=False)
+            converted += result.modified_count
+
+        last_id = batch[-1]["_id"]
+        processed += len(batch)
+        await db.migrations.update_one(
+            {"_id": checkpoint_id},
+            {"$set": {"last_id": last_id, "processed": processed, "converted": converted, "updated_at": datetime.now(timezone.utc)}},
+            upsert=True
+        )
+
+        rate = processed / max(time.monotonic() - started, 1e-6)
+        print(f"   {collection_name}: {processed}/{total} scanned, {converted} converted ({rate:.0f} docs/s)", end="\r")
+        if pause:
+            await asyncio.sleep(pause)
+
+    await db.migrations.update_one({"_id": checkpoint_id}, {"$set": {"done": True}}, upsert=True)
+    print(f"\n✅ {collection_name}: {processed} scanned, {converted} converted")
+
+
+async def migrate(batch_size: int, pause_ms: int, restart: bool, collections: list) -> None:
+    print("🕒 Migrating timestamps to BSON dates...")
+    if restart:
+        await db.migrations.delete_many({"_id": {"$regex": f"^{MIGRATION_ID}:"}})
+
+    for collection_name in collections:
+        await migrate_collection(collection_name, TIMESTAMP_FIELDS[collection_name], batch_size, pause_ms / 1000)
+
+    print("🎉 Timestamp migration complete!")
+    client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--pause-ms", type=int, default=0, help="sleep between batches to limit load on a live server")
+    parser.add_argument("--restart", action="store_true", help="ignore checkpoints and scan everything again")
+    parser.add_argument("--collections", nargs="+", choices=sorted(TIMESTAMP_FIELDS), default=list(TIMESTAMP_FIELDS))
+    args = parser.parse_args()
+    asyncio.run(migrate(args.batch_size, args.pause_ms, args.restart, args.collections))
@@ -1,5 +1,5 @@
-from pydantic import BaseModel, Field, EmailStr, ConfigDict
-from typing import List, Optional
+from pydantic import BaseModel, Field, EmailStr, ConfigDict, model_validator
+from typing import Dict, List, Optional, Union
 from datetime import datetime, timezone
 import uuid
 
@@ -94,6 +94,8 @@ class OrderItem(BaseModel):
     price: float
     selected_size: Optional[str] = None
     selected_color: Optional[str] = None
+    # The product's category when the order was placed; set by the server
+    category: Optional[str] = None
 
 class ShippingAddress(BaseModel):
     first_name: str
@@ -117,6 +119,51 @@ class OrderUpdate(BaseModel):
     status: Optional[str] = None
     tracking_number: Optional[str] = None
 
+# Allowed status changes for bulk fulfilment updates; setting the current status again is always allowed
+ORDER_STATUS_TRANSITIONS: Dict[str, List[str]] = {
+    "Pending": ["Processing", "Shipped", "Cancelled"],
+    "Processing": ["Shipped", "Cancelled"],
+    "Shipped": ["Delivered"],
+    "Delivered": [],
+    "Cancelled": [],
+}
+
+# Orders in these statuses count towards revenue
+REVENUE_STATUSES = ["Delivered", "Shipped", "Processing"]
+
+def parse_timestamp(value: Union[datetime, str]) -> datetime:
+    """An aware datetime; documents written by older releases hold ISO strings until migrate_timestamps.py converts them."""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value
+
+class BulkOrderUpdate(BaseModel):
+    order_id: Optional[str] = None
+    order_number: Optional[str] = None
+    status: str
+    tracking_number: Optional[str] = None
+
+    @model_validator(mode="after")
+    def check_reference(self):
+        if (self.order_id is None) == (self.order_number is None):
+            raise ValueError("Provide exactly one of order_id or order_number")
+        return self
+
+class BulkOrderResult(BaseModel):
+    order_id: Optional[str] = None
+    order_number: Optional[str] = None
+    outcome: str  # updated, not_found, invalid_transition, duplicate, conflict
+    previous_status: Optional[str] = None
+    status: Optional[str] = None
+    detail: Optional[str] = None
+
+class BulkOrderUpdateResponse(BaseModel):
+    updated: int
+    failed: int
+    results: List[BulkOrderResult]
+
 class Order(BaseModel):
     model_config = ConfigDict(extra="ignore")
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -0,0 +1,161 @@
+"""
+Driver-level instrumentation registered on the shared Mongo client.
+
+pymongo calls these listeners synchronously from the threads Motor runs its
+operations on, so all state is guarded by a lock and kept to counters.
+"""
+from pymongo import monitoring
+from metrics import MONGO_DURATION, MONGO_FAILURES, current_route, record_mongo_time
+from slow_queries import slow_query_log
+import threading
+import time
+
+# Upper bounds (ms) of the checkout wait-time histogram buckets
+WAIT_BUCKETS_MS = (0.1, 0.5, 1, 5, 10, 50, 100, 500, 1000, 5000)
+
+
+class PoolMonitor(monitoring.ConnectionPoolListener):
+    """Connection counts and checkout wait times for the connection pool."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.connections_open = 0
+            self.connections_in_use = 0
+            self.checkouts = 0
+            self.checkout_failures = 0
+            self.wait_total_ms = 0.0
+            self.wait_max_ms = 0.0
+            self.wait_buckets = [0] * (len(WAIT_BUCKETS_MS) + 1)
+
+    def _record_wait(self) -> float:
+        started = getattr(self._local, "started", None)
+        self._local.started = None
+        return (time.perf_counter() - started) * 1000 if started is not None else 0.0
+
+    def connection_check_out_started(self, event):
+        self._local.started = time.perf_counter()
+
+    def connection_checked_out(self, event):
+        wait_ms = self._record_wait()
+        with self._lock:
+            self.checkouts += 1
+            self.connections_in_use += 1
+            self.wait_total_ms += wait_ms
+            self.wait_max_ms = max(self.wait_max_ms, wait_ms)
+            for i, bound in enumerate(WAIT_BUCKETS_MS):
+                if wait_ms <= bound:
+                    self.wait_buckets[i] += 1
+                    break
+            else:
+                self.wait_buckets[-1] += 1
+
+    def connection_check_out_failed(self, event):
+        self._record_wait()
+        with self._lock:
+            self.checkout_failures += 1
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.connections_in_use -= 1
+
+    def connection_created(self, event):
+        with self._lock:
+            self.connections_open += 1
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.connections_open -= 1
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def _wait_percentile(self, fraction: float) -> float:
+        # Upper bound of the bucket holding the given fraction of checkouts
+        target = self.checkouts * fraction
+        seen = 0
+        for bound, count in zip(WAIT_BUCKETS_MS + (float("inf"),), self.wait_buckets):
+            seen += count
+            if seen >= target:
+                return bound if bound != float("inf") else self.wait_max_ms
+        return 0.0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "connections_open": self.connections_open,
+                "connections_in_use": self.connections_in_use,
+                "checkouts": self.checkouts,
+                "checkout_failures": self.checkout_failures,
+                "wait_ms": {
+                    "total": round(self.wait_total_ms, 3),
+                    "avg": round(self.wait_total_ms / self.checkouts, 3) if self.checkouts else 0.0,
+                    "max": round(self.wait_max_ms, 3),
+                    "p50_le": self._wait_percentile(0.5) if self.checkouts else 0.0,
+                    "p99_le": self._wait_percentile(0.99) if self.checkouts else 0.0,
+                    # Checkouts per bucket, keyed by the bucket's upper bound
+                    "histogram": {
+                        **{str(bound): count for bound, count in zip(WAIT_BUCKETS_MS, self.wait_buckets)},
+                        "+Inf": self.wait_buckets[-1],
+                    },
+                },
+            }
+
+
+def command_collection(event: monitoring.CommandStartedEvent) -> str:
+    target = event.command.get(event.command_name)
+    if isinstance(target, str):
+        return target
+    # getMore names its collection separately; aggregate: 1 runs against the database
+    collection = event.command.get("collection")
+    return collection if isinstance(collection, str) else ""
+
+
+class CommandMonitor(monitoring.CommandListener):
+    """Per command/collection latency, charged to the request that issued the command.
+
+    Commands over the slow-query threshold are also handed to slow_query_log.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._inflight = {}
+
+    def started(self, event):
+        with self._lock:
+            self._inflight[(event.connection_id, event.request_id)] = (
+                event.command_name, command_collection(event), event.database_name, event.command
+            )
+
+    def _finished(self, event, reply: dict):
+        with self._lock:
+            started = self._inflight.pop((event.connection_id, event.request_id), None)
+        command_name, collection, database, command = started or (event.command_name, "", "", None)
+        seconds = event.duration_micros / 1e6
+        MONGO_DURATION.observe((command_name, collection), seconds)
+        record_mongo_time(seconds)
+        if command is not None and slow_query_log.is_slow(seconds * 1000):
+            slow_query_log.record(command_name, collection, database, command, reply, seconds * 1000, current_route())
+        return command_name, collection
+
+    def succeeded(self, event):
+        self._finished(event, event.reply)
+
+    def failed(self, event):
+        MONGO_FAILURES.inc(self._finished(event, {}))
@@ -0,0 +1,166 @@
+"""
+Admin reports over the columnar order snapshot.
+
+Each report is a few whole-column NumPy operations (pandas to factorize ids
+and for the cohort grid) over order_snapshot's arrays, so they take seconds
+over millions of line items and send nothing to Mongo. Like the dashboard,
+only orders in a REVENUE_STATUSES status count. Results are as fresh as the
+snapshot; the admin routes return its generation and watermark alongside
+them.
+"""
+from datetime import date, timedelta
+from typing import Optional
+from models import REVENUE_STATUSES
+from order_snapshot import STATUSES, Snapshot
+
+import numpy as np
+import pandas as pd
+
+PERIODS = ("day", "week", "month")
+# Basket sizes from this many units up share the last histogram bucket
+MAX_BASKET_UNITS = 10
+REVENUE_CODES = np.array([STATUSES.index(status) for status in REVENUE_STATUSES], dtype=np.int8)
+
+
+def counted_orders(snapshot: Snapshot, start: Optional[date], end: Optional[date]) -> np.ndarray:
+    """Mask of revenue orders created between start and end (inclusive days; None is unbounded)."""
+    created = snapshot.orders["created_at"]
+    mask = np.isin(snapshot.orders["status"], REVENUE_CODES)
+    if start:
+        mask &= created >= np.datetime64(start, "ms")
+    if end:
+        mask &= created < np.datetime64(end + timedelta(days=1), "ms")
+    return mask
+
+
+def period_start(created: np.ndarray, period: str) -> np.ndarray:
+    days = created.astype("datetime64[D]")
+    if period == "week":
+        # Day 0 of datetime64 was a Thursday; weeks start on Monday
+        return days - (days.astype(np.int64) + 3) % 7
+    return days.astype("datetime64[M]").astype("datetime64[D]") if period == "month" else days
+
+
+def safe_ratio(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+    return np.divide(numerator, denominator, out=np.zeros(len(numerator)), where=denominator > 0)
+
+
+def aov_report(snapshot: Snapshot, start: Optional[date], end: Optional[date], period: str = "month") -> dict:
+    """Orders, revenue and average order value per day, week or month."""
+    mask = counted_orders(snapshot, start, end)
+    totals, units = snapshot.orders["total"][mask], snapshot.orders["units"][mask]
+    buckets, index = np.unique(period_start(snapshot.orders["created_at"][mask], period), return_inverse=True)
+    orders = np.bincount(index, minlength=len(buckets))
+    revenue = np.bincount(index, weights=totals, minlength=len(buckets))
+    unit_counts = np.bincount(index, weights=units, minlength=len(buckets))
+    aov, units_per_order = safe_ratio(revenue, orders), safe_ratio(unit_counts, orders)
+    return {
+        "period": period,
+        "orders": int(mask.sum()),
+        "revenue": round(float(totals.sum()), 2),
+        "aov": round(float(totals.mean()), 2) if len(totals) else 0,
+        "series": [
+            {"period": str(bucket), "orders": int(orders[i]), "revenue": round(float(revenue[i]), 2),
+             "aov": round(float(aov[i]), 2), "units_per_order": round(float(units_per_order[i]), 2)}
+            for i, bucket in enumerate(buckets)
+        ],
+    }
+
+
+def basket_size_report(snapshot: Snapshot, start: Optional[date], end: Optional[date]) -> dict:
+    """Distribution of units and lines per order, with the average order value at each size."""
+    mask = counted_orders(snapshot, start, end)
+    units, lines, totals = snapshot.orders["units"][mask], snapshot.orders["lines"][mask], snapshot.orders["total"][mask]
+    if not len(units):
+        return {"orders": 0, "mean_units": 0, "mean_lines": 0, "percentiles": {}, "distribution": []}
+    sizes = np.clip(units, 1, MAX_BASKET_UNITS) - 1
+    orders = np.bincount(sizes, minlength=MAX_BASKET_UNITS)
+    revenue = np.bincount(sizes, weights=totals, minlength=MAX_BASKET_UNITS)
+    aov = safe_ratio(revenue, orders)
+    p50, p90, p99 = np.percentile(units, [50, 90, 99])
+    return {
+        "orders": int(len(units)),
+        "mean_units": round(float(units.mean()), 2),
+        "mean_lines": round(float(lines.mean()), 2),
+        "percentiles": {"p50": float(p50), "p90": float(p90), "p99": float(p99)},
+        "distribution": [
+            {"units": f"{size + 1}+" if size + 1 == MAX_BASKET_UNITS else str(size + 1),
+             "orders": int(orders[size]), "share": round(float(orders[size] / len(units)), 4), "aov": round(float(aov[size]), 2)}
+            for size in range(MAX_BASKET_UNITS)
+        ],
+    }
+
+
+def top_skus_report(snapshot: Snapshot, start: Optional[date], end: Optional[date], sort: str = "revenue", limit: int = 20) -> dict:
+    """Best-selling products by revenue, units or orders."""
+    items = snapshot.items
+    item_mask = counted_orders(snapshot, start, end)[items["order"]]
+    quantity, price = items["quantity"][item_mask], items["price"][item_mask]
+    # Hashing is several times faster than np.unique's sort for byte strings
+    index, products = pd.factorize(items["product_id"][item_mask])
+    products = products.astype(bytes)
+    # One key per (order, product) pair; sorting and keeping the first of each run dedups them
+    pairs = np.sort(items["order"][item_mask] * len(products) + index)
+    pairs = pairs[np.concatenate(([True], pairs[1:] != pairs[:-1]))] if len(pairs) else pairs
+    metrics = {
+        "revenue": np.bincount(index, weights=quantity * price, minlength=len(products)),
+        "units": np.bincount(index, weights=quantity, minlength=len(products)),
+        # An order can hold a product on several lines (sizes, colours) but counts once
+        "orders": np.bincount(pairs % len(products), minlength=len(products)),
+    }
+    top = np.lexsort((products, -metrics[sort]))[:limit]
+    # Names come from each product's most recent line
+    last_row = np.full(len(products), -1, dtype=np.int64)
+    np.maximum.at(last_row, index, np.arange(len(index)))
+    names = items["product_name"][item_mask][last_row[top]]
+    total_revenue = metrics["revenue"].sum()
+    return {
+        "sort": sort,
+        "products": int(len(products)),
+        "skus": [
+            {"product_id": products[k].decode(), "name": names[rank].decode("utf-8", "replace"),
+             "revenue": round(float(metrics["revenue"][k]), 2), "units": int(metrics["units"][k]), "orders": int(metrics["orders"][k]),
+             "revenue_share": round(float(metrics["revenue"][k] / total_revenue), 4) if total_revenue else 0}
+            for rank, k in enumerate(top)
+        ],
+    }
+
+
+def cohort_report(snapshot: Snapshot, start: Optional[date], end: Optional[date], months: int = 12) -> dict:
+    """Customers by month of first order, and how many ordered again in each following month.
+
+    Customers are identified by shipping email. First orders are found over the
+    whole snapshot; start and end only choose which cohorts are reported.
+    """
+    mask = counted_orders(snapshot, None, None) & (snapshot.orders["customer"] != b"")
+    customers, _ = pd.factorize(snapshot.orders["customer"][mask])
+    month = snapshot.orders["created_at"][mask].astype("datetime64[M]").astype(np.int64)
+    frame = pd.DataFrame({"customer": customers, "month": month, "total": snapshot.orders["total"][mask]})
+    frame["cohort"] = frame.groupby("customer")["month"].transform("min")
+    frame["offset"] = frame["month"] - frame["cohort"]
+    if start:
+        frame = frame[frame["cohort"] >= np.datetime64(start, "M").astype(np.int64)]
+    if end:
+        frame = frame[frame["cohort"] <= np.datetime64(end, "M").astype(np.int64)]
+    frame = frame[frame["offset"] < months]
+    if frame.empty:
+        return {"months": months, "cohorts": []}
+
+    offsets = range(months)
+    active = (frame.drop_duplicates(["customer", "offset"]).groupby(["cohort", "offset"]).size()
+              .unstack(fill_value=0).reindex(columns=offsets, fill_value=0))
+    revenue = frame.groupby(["cohort", "offset"])["total"].sum().unstack(fill_value=0).reindex(columns=offsets, fill_value=0)
+    # Months after the snapshot's last order haven't happened yet
+    last_month = int(month.max())
+    cohorts = []
+    for cohort, counts in active.iterrows():
+        observed = min(months, last_month - cohort + 1)
+        size = int(counts[0])
+        cohorts.append({
+            "cohort": str(np.datetime64(cohort, "M")),
+            "customers": size,
+            "active": [int(n) for n in counts[:observed]],
+            "retention": [round(n / size, 4) for n in counts[:observed]],
+            "revenue": [round(float(r), 2) for r in revenue.loc[cohort][:observed]],
+        })
+    return {"months": months, "cohorts": cohorts}
@@ -0,0 +1,274 @@
+"""
+Columnar snapshot of the orders for reporting
+Run: python order_snapshot.py [--full]
+
+Orders and their line items are flattened into NumPy arrays, one .npy file
+per column, that reports memory-map instead of querying Mongo:
+
+    snapshots/orders/manifest.json
+    snapshots/orders/part-000001/orders/{id,customer,created_at,status,total,units,lines}.npy
+    snapshots/orders/part-000001/items/{order,product_id,product_name,quantity,price}.npy
+
+`items/order` is the row of the item's order within its partition. Each run
+reads the orders updated since the manifest's watermark (from a secondary
+when there is one) into a new partition; an order that changed again
+appears in several partitions and readers keep its newest row. The watermark
+trails the run's start by SNAPSHOT_OVERLAP_SECONDS so orders whose writes
+committed late are read again rather than missed. Once there are more than
+SNAPSHOT_MAX_PARTITIONS partitions they are compacted into one. Deleted
+orders stay in the snapshot until the next --full rebuild. Orders whose
+created_at can't be read are logged and left out.
+
+The manifest is replaced atomically after its partitions are written, so
+readers always see a complete snapshot. Runs from several workers or cron
+take a file lock; a run that finds it held is skipped.
+"""
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from pymongo import ReadPreference
+from typing import Dict, Iterable, List, NamedTuple, Optional
+from models import ORDER_STATUS_TRANSITIONS, parse_timestamp
+import argparse
+import asyncio
+import fcntl
+import json
+import logging
+import os
+import shutil
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_DIR = Path(os.environ.get("ORDER_SNAPSHOT_DIR", Path(__file__).parent / "snapshots" / "orders"))
+# 0 disables the background job; run order_snapshot.py from cron instead
+ORDER_SNAPSHOT_INTERVAL_SECONDS = float(os.environ.get("ORDER_SNAPSHOT_INTERVAL_SECONDS", "0"))
+SNAPSHOT_OVERLAP_SECONDS = int(os.environ.get("SNAPSHOT_OVERLAP_SECONDS", "300"))
+SNAPSHOT_MAX_PARTITIONS = int(os.environ.get("SNAPSHOT_MAX_PARTITIONS", "24"))
+# Orders per partition file set, which bounds the job's memory on a full rebuild
+PARTITION_ORDERS = 500_000
+READ_BATCH_SIZE = 5000
+
+# Status codes stored in orders/status index into this tuple
+STATUSES = tuple(ORDER_STATUS_TRANSITIONS)
+SNAPSHOT_PROJECTION = {
+    "_id": 0, "id": 1, "status": 1, "created_at": 1, "total": 1, "shipping_address.email": 1,
+    "items.product_id": 1, "items.product_name": 1, "items.quantity": 1, "items.price": 1,
+}
+ORDER_DTYPES = {"created_at": "datetime64[ms]", "status": np.int8, "total": np.float64, "units": np.int32, "lines": np.int16}
+ITEM_DTYPES = {"order": np.int64, "quantity": np.int32, "price": np.float64}
+
+
+class Snapshot(NamedTuple):
+    """Live order and item columns, one row per order and per line item."""
+    orders: Dict[str, np.ndarray]
+    items: Dict[str, np.ndarray]
+    generation: int
+    watermark: Optional[datetime]
+
+
+def column_array(name: str, values: list, dtypes: dict) -> np.ndarray:
+    if name in dtypes:
+        return np.array(values, dtype=dtypes[name])
+    # Strings are fixed-width UTF-8 bytes so the files can be memory-mapped
+    return np.array(values, dtype=bytes) if values else np.array([], dtype="S1")
+
+
+def flatten(orders: Iterable[dict]) -> Dict[str, Dict[str, np.ndarray]]:
+    """Column arrays for one partition of order documents."""
+    columns = {"orders": {name: [] for name in ("id", "customer", "created_at", "status", "total", "units", "lines")},
+               "items": {name: [] for name in ("order", "product_id", "product_name", "quantity", "price")}}
+    status_codes = {status: code for code, status in enumerate(STATUSES)}
+    order_cols, item_cols = columns["orders"], columns["items"]
+    for order in orders:
+        try:
+            # Orders not yet migrated by migrate_timestamps.py hold ISO strings
+            created_at = parse_timestamp(order.get("created_at")).astimezone(timezone.utc).replace(tzinfo=None)
+        except (AttributeError, ValueError):
+            logger.warning("Order %s left out of the snapshot: unreadable created_at %r", order["id"], order.get("created_at"))
+            continue
+        row = len(order_cols["id"])
+        items = order.get("items") or []
+        order_cols["id"].append(order["id"].encode())
+        order_cols["customer"].append(((order.get("shipping_address") or {}).get("email") or "").strip().lower().encode())
+        order_cols["created_at"].append(created_at)
+        order_cols["status"].append(status_codes.get(order["status"], -1))
+        order_cols["total"].append(order["total"])
+        order_cols["units"].append(sum(item["quantity"] for item in items))
+        order_cols["lines"].append(len(items))
+        for item in items:
+            item_cols["order"].append(row)
+            item_cols["product_id"].append(item["product_id"].encode())
+            item_cols["product_name"].append(item.get("product_name", "").encode())
+            item_cols["quantity"].append(item["quantity"])
+            item_cols["price"].append(item["price"])
+    return {
+        "orders": {name: column_array(name, values, ORDER_DTYPES) for name, values in order_cols.items()},
+        "items": {name: column_array(name, values, ITEM_DTYPES) for name, values in item_cols.items()},
+    }
+
+
+def write_partition(directory: Path, name: str, columns: Dict[str, Dict[str, np.ndarray]]) -> dict:
+    for table, arrays in columns.items():
+        (directory / name / table).mkdir(parents=True, exist_ok=True)
+        for column, array in arrays.items():
+            np.save(directory / name / table / f"{column}.npy", array)
+    return {"name": name, "orders": len(columns["orders"]["id"]), "items": len(columns["items"]["order"])}
+
+
+def read_manifest(directory: Path = SNAPSHOT_DIR) -> Optional[dict]:
+    try:
+        return json.loads((directory / "manifest.json").read_text())
+    except FileNotFoundError:
+        return None
+
+
+def write_manifest(directory: Path, manifest: dict) -> None:
+    """Swap in a new manifest, then remove the partitions it no longer lists."""
+    temp = directory / "manifest.json.tmp"
+    temp.write_text(json.dumps(manifest, indent=2))
+    os.replace(temp, directory / "manifest.json")
+    listed = {partition["name"] for partition in manifest["partitions"]}
+    for path in directory.glob("part-*"):
+        if path.name not in listed:
+            # Readers that already mapped these files keep them until they close
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def next_partition_name(manifest: Optional[dict]) -> str:
+    names = [p["name"] for p in manifest["partitions"]] if manifest else []
+    return f"part-{max((int(n.split('-')[1]) for n in names), default=0) + 1:06d}"
+
+
+def load_partition(directory: Path, name: str) -> Dict[str, Dict[str, np.ndarray]]:
+    return {
+        table: {path.stem: np.load(path, mmap_mode="r") for path in (directory / name / table).glob("*.npy")}
+        for table in ("orders", "items")
+    }
+
+
+def load_snapshot(directory: Path = SNAPSHOT_DIR) -> Optional[Snapshot]:
+    """The live rows of every partition, or None before the first run."""
+    manifest = read_manifest(directory)
+    if manifest is None:
+        return None
+    watermark = datetime.fromisoformat(manifest["watermark"]) if manifest["watermark"] else None
+    partitions = [load_partition(directory, p["name"]) for p in manifest["partitions"]]
+    if len(partitions) == 1:
+        # A single partition holds each order once; the memory maps are used as they are
+        return Snapshot(partitions[0]["orders"], partitions[0]["items"], manifest["generation"], watermark)
+
+    order_offsets = np.cumsum([0] + [len(p["orders"]["id"]) for p in partitions])
+    orders = {name: np.concatenate([p["orders"][name] for p in partitions]) for name in partitions[0]["orders"]}
+    items = {name: np.concatenate([p["items"][name] for p in partitions]) for name in partitions[0]["items"]}
+    items["order"] = items["order"] + np.repeat(order_offsets[:-1], [len(p["items"]["order"]) for p in partitions])
+
+    # Newest row of each order: the first occurrence when scanning from the end
+    count = len(orders["id"])
+    _, from_end = np.unique(orders["id"][::-1], return_index=True)
+    live = np.zeros(count, dtype=bool)
+    live[count - 1 - from_end] = True
+    new_row = np.cumsum(live) - 1
+    item_live = live[items["order"]]
+    items = {name: column[item_live] for name, column in items.items()}
+    items["order"] = new_row[items["order"]]
+    return Snapshot({name: column[live] for name, column in orders.items()}, items, manifest["generation"], watermark)
+
+
+_cached: Optional[Snapshot] = None
+
+
+def current_snapshot(directory: Path = SNAPSHOT_DIR) -> Optional[Snapshot]:
+    """load_snapshot(), reused until the manifest's generation changes."""
+    global _cached
+    manifest = read_manifest(directory)
+    if manifest is None:
+        return None
+    if _cached is None or _cached.generation != manifest["generation"]:
+        _cached = load_snapshot(directory)
+    return _cached
+
+
+def compact(directory: Path, manifest: dict) -> dict:
+    snapshot = load_snapshot(directory)
+    partition = write_partition(directory, next_partition_name(manifest), {"orders": snapshot.orders, "items": snapshot.items})
+    return {**manifest, "generation": manifest["generation"] + 1, "partitions": [partition]}
+
+
+async def refresh_snapshot(db, full: bool = False, directory: Path = SNAPSHOT_DIR) -> Optional[dict]:
+    """Add the orders changed since the last run (or rewrite everything); returns the new manifest, or None if another run holds the lock."""
+    directory.mkdir(parents=True, exist_ok=True)
+    with open(directory / ".lock", "w") as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return None
+
+        previous = read_manifest(directory)
+        manifest = None if full else previous
+        started = datetime.now(timezone.utc)
+        query = {"updated_at": {"$gte": datetime.fromisoformat(manifest["watermark"])}} if manifest else {}
+        # Reports never need the primary
+        orders = db.orders.with_options(read_preference=ReadPreference.SECONDARY_PREFERRED)
+        partitions: List[dict] = list(manifest["partitions"]) if manifest else []
+        # New partitions never reuse a name a reader may still have mapped
+        name = next_partition_name(previous)
+        batch: List[dict] = []
+
+        async def flush():
+            nonlocal name
+            partitions.append(await asyncio.to_thread(lambda: write_partition(directory, name, flatten(batch))))
+            name = f"part-{int(name.split('-')[1]) + 1:06d}"
+            batch.clear()
+
+        async for order in orders.find(query, SNAPSHOT_PROJECTION, batch_size=READ_BATCH_SIZE):
+            batch.append(order)
+            if len(batch) >= PARTITION_ORDERS:
+                await flush()
+        if batch or not partitions:
+            await flush()
+
+        changed = manifest is None or len(partitions) > len(manifest["partitions"])
+        manifest = {
+            # Readers reload when the generation changes
+            "generation": (previous["generation"] if previous else 0) + int(changed),
+            "watermark": (started - timedelta(seconds=SNAPSHOT_OVERLAP_SECONDS)).isoformat(),
+            "partitions": partitions,
+            "updated_at": started.isoformat(),
+        }
+        if len(partitions) > SNAPSHOT_MAX_PARTITIONS:
+            await asyncio.to_thread(write_manifest, directory, manifest)
+            manifest = await asyncio.to_thread(compact, directory, manifest)
+        await asyncio.to_thread(write_manifest, directory, manifest)
+        return manifest
+
+
+async def refresh_periodically(db, interval: float = ORDER_SNAPSHOT_INTERVAL_SECONDS) -> None:
+    """Background job for the app lifespan."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await refresh_snapshot(db)
+        except Exception:
+            logger.exception("Order snapshot refresh failed")
+
+
+async def main(full: bool) -> None:
+    from database import client, db
+
+    print(f"📦 {'Rebuilding' if full else 'Updating'} the order snapshot in {SNAPSHOT_DIR}...")
+    manifest = await refresh_snapshot(db, full)
+    if manifest is None:
+        print("⏭️  Another snapshot run is in progress")
+    else:
+        orders = sum(p["orders"] for p in manifest["partitions"])
+        items = sum(p["items"] for p in manifest["partitions"])
+        print(f"✅ Generation {manifest['generation']}: {len(manifest['partitions'])} partitions, {orders:,} order rows, {items:,} item rows")
+    client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write the columnar order snapshot used by the admin reports")
+    parser.add_argument("--full", action="store_true", help="rewrite the snapshot from every order instead of adding recent changes")
+    args = parser.parse_args()
+    asyncio.run(main(args.full))
@@ -0,0 +1,68 @@
+"""
+Keyset (cursor) pagination.
+
+A cursor is an opaque token encoding the sort-key values of the last row of a
+page. The next page is fetched with a range condition on those values instead
+of skip(), so every page costs the same index range scan as the first one and
+rows inserted meanwhile can't shift the page boundaries.
+"""
+from fastapi import HTTPException
+from bson import json_util
+from datetime import datetime
+from typing import List, MutableMapping, Optional, Tuple
+import base64
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+# Sort keys must end with a unique field so that the order is total
+ORDER_SORT = [("created_at", -1), ("id", -1)]
+PRODUCT_SORT = [("created_at", 1), ("id", 1)]
+
+# Cursor values go straight into the query, so anything else (a dict holding
+# operators, a regex, ...) is rejected
+CURSOR_VALUE_TYPES = (str, int, float, datetime, type(None))
+
+
+def encode_cursor(doc: dict, sort: List[Tuple[str, int]]) -> str:
+    values = [doc.get(field) for field, _ in sort]
+    return base64.urlsafe_b64encode(json_util.dumps(values).encode()).decode()
+
+
+def decode_cursor(cursor: str, sort: List[Tuple[str, int]]) -> list:
+    try:
+        values = json_util.loads(base64.urlsafe_b64decode(cursor.encode()))
+    # json_util raises assorted errors on malformed extended JSON ($date, $oid, ...)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(values, list) or len(values) != len(sort) or not all(isinstance(v, CURSOR_VALUE_TYPES) for v in values):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values
+
+
+def keyset_filter(sort: List[Tuple[str, int]], values: list) -> dict:
+    """Match rows strictly after `values` in `sort` order.
+
+    For a sort on (a desc, b desc) this builds
+    {"$or": [{"a": {"$lt": va}}, {"a": va, "b": {"$lt": vb}}]}.
+    """
+    clauses = []
+    for i, (field, direction) in enumerate(sort):
+        clause = {f: v for (f, _), v in zip(sort[:i], values[:i])}
+        clause[field] = {"$gt" if direction == 1 else "$lt": values[i]}
+        clauses.append(clause)
+    return {"$or": clauses}
+
+
+def apply_cursor(query: dict, cursor: Optional[str], skip: int, sort: List[Tuple[str, int]]) -> dict:
+    if cursor is None:
+        return query
+    if skip:
+        raise HTTPException(status_code=400, detail="Use either cursor or skip, not both")
+    keyset = keyset_filter(sort, decode_cursor(cursor, sort))
+    return {"$and": [query, keyset]} if query else keyset
+
+
+def set_next_cursor(headers: MutableMapping[str, str], docs: List[dict], limit: int, sort: List[Tuple[str, int]]) -> None:
+    """Expose the cursor of the next page, if the current page was full."""
+    if docs and len(docs) == limit:
+        headers[NEXT_CURSOR_HEADER] = encode_cursor(docs[-1], sort)
@@ -0,0 +1,142 @@
+"""
+Sampled per-request profiling.
+
+ProfilingMiddleware profiles a request when an admin sends `X-Profile: 1`
+with their bearer token, or when it falls in the PROFILE_SAMPLE_RATE sample
+(default 0). Everything else passes straight through after one header scan,
+so the middleware can stay installed in production.
+
+A profiled request gets a pyinstrument sampling profile (stored as text and
+as speedscope JSON for a flame graph) plus wall-clock phases: Mongo time from
+the CommandMonitor, validation and serialization from serialization.encode,
+and handler time as the remainder. Routes that return plain dicts are
+validated by FastAPI itself, so for them that work counts as handler time.
+Profiles go to the capped `request_profiles` collection; the response carries
+their id in X-Profile-Id, and /api/admin/profiles serves them. Without
+pyinstrument installed, only the phases are recorded.
+"""
+from datetime import datetime, timezone
+from typing import Optional, Set
+from auth import verify_token
+from database import db
+from indexes import ensure_capped_collection
+from metrics import request_context
+import asyncio
+import logging
+import os
+import random
+import time
+import uuid
+
+try:
+    from pyinstrument import Profiler
+    from pyinstrument.renderers import SpeedscopeRenderer
+except ImportError:
+    Profiler = None
+
+logger = logging.getLogger(__name__)
+
+PROFILE_SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_INTERVAL_SECONDS = float(os.environ.get("PROFILE_INTERVAL_SECONDS", "0.001"))
+# Profiling costs CPU; requests beyond this many in flight are not profiled
+PROFILE_MAX_CONCURRENT = int(os.environ.get("PROFILE_MAX_CONCURRENT", "2"))
+PROFILE_LOG_BYTES = int(os.environ.get("PROFILE_LOG_BYTES", str(64 * 1024 * 1024)))
+# Larger flame graphs are dropped; the text profile is always kept
+MAX_SPEEDSCOPE_BYTES = 2 * 1024 * 1024
+
+PROFILE_HEADER = b"x-profile"
+PROFILE_ID_HEADER = "X-Profile-Id"
+COLLECTION = "request_profiles"
+
+
+async def ensure_profile_collection(db) -> None:
+    await ensure_capped_collection(db, COLLECTION, PROFILE_LOG_BYTES)
+
+
+def requested_by_admin(scope: dict) -> bool:
+    requested = authorization = None
+    for name, value in scope["headers"]:
+        if name == PROFILE_HEADER:
+            requested = value
+        elif name == b"authorization":
+            authorization = value
+    if requested not in (b"1", b"true") or not authorization or not authorization.startswith(b"Bearer "):
+        return False
+    payload = verify_token(authorization[7:].decode("latin-1"))
+    return payload is not None and payload.get("role") == "admin"
+
+
+class ProfilingMiddleware:
+    def __init__(self, app):
+        self.app = app
+        self.active = 0
+        self._writes: Set[asyncio.Task] = set()
+
+    def trigger(self, scope: dict) -> Optional[str]:
+        if self.active >= PROFILE_MAX_CONCURRENT:
+            return None
+        if PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE:
+            return "sample"
+        if requested_by_admin(scope):
+            return "header"
+        return None
+
+    async def __call__(self, scope, receive, send):
+        trigger = self.trigger(scope) if scope["type"] == "http" else None
+        context = request_context.get()
+        if trigger is None or context is None:
+            return await self.app(scope, receive, send)
+
+        profile_id = uuid.uuid4().hex
+        status = 500
+
+        async def send_with_id(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message = {**message, "headers": [*message.get("headers", []), (PROFILE_ID_HEADER.lower().encode(), profile_id.encode())]}
+            await send(message)
+
+        self.active += 1
+        context.phases = {}
+        mongo_before = context.mongo_seconds
+        profiler = Profiler(interval=PROFILE_INTERVAL_SECONDS, async_mode="enabled") if Profiler else None
+        started = time.perf_counter()
+        if profiler:
+            profiler.start()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            elapsed = time.perf_counter() - started
+            if profiler:
+                profiler.stop()
+            self.active -= 1
+            phases = {name: round(seconds * 1000, 3) for name, seconds in context.phases.items()}
+            phases["mongo"] = round((context.mongo_seconds - mongo_before) * 1000, 3)
+            phases["handler"] = round(max(elapsed * 1000 - sum(phases.values()), 0.0), 3)
+            context.phases = None
+            doc = {
+                "id": profile_id,
+                "method": scope["method"],
+                "path": scope["path"],
+                "route": context.route,
+                "status": status,
+                "trigger": trigger,
+                "total_ms": round(elapsed * 1000, 3),
+                "phases_ms": phases,
+                "at": datetime.now(timezone.utc),
+            }
+            # Rendering and the insert happen after the response is sent
+            task = asyncio.create_task(self.store(doc, profiler))
+            self._writes.add(task)
+            task.add_done_callback(self._writes.discard)
+
+    async def store(self, doc: dict, profiler) -> None:
+        try:
+            if profiler:
+                doc["text"] = profiler.output_text(unicode=False, color=False)
+                speedscope = profiler.output(SpeedscopeRenderer())
+                doc["speedscope"] = speedscope if len(speedscope) <= MAX_SPEEDSCOPE_BYTES else None
+            await db[COLLECTION].insert_one(doc)
+        except Exception:
+            logger.exception("Storing request profile %s failed", doc["id"])
@@ -0,0 +1,95 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from database import db
+from auth import require_admin
+from slow_queries import slow_query_report
+from profiling import COLLECTION as PROFILES
+from order_snapshot import current_snapshot, refresh_snapshot
+from order_reports import aov_report, basket_size_report, cohort_report, top_skus_report
+from typing import Literal, Optional
+from datetime import date, datetime, timedelta, timezone
+import asyncio
+
+router = APIRouter(prefix="/admin", tags=["Admin"], dependencies=[Depends(require_admin)])
+
+@router.get("/slow-queries")
+async def get_slow_queries(
+    minutes: int = Query(default=24 * 60, ge=1, le=30 * 24 * 60),
+    limit: int = Query(default=50, ge=1, le=500)
+):
+    """Slow Mongo commands from the last `minutes`, grouped by query shape, most total time first."""
+    since = datetime.now(timezone.utc) - timedelta(minutes=minutes)
+    return {"since": since, "shapes": await slow_query_report(db, since, limit)}
+
+@router.get("/profiles")
+async def list_profiles(
+    route: Optional[str] = None,
+    limit: int = Query(default=50, ge=1, le=500)
+):
+    """Most recent request profiles, without their call trees."""
+    query = {"route": route} if route else {}
+    return await db[PROFILES].find(query, {"_id": 0, "text": 0, "speedscope": 0}).sort("at", -1).to_list(limit)
+
+@router.get("/profiles/{profile_id}")
+async def get_profile(profile_id: str, format: Literal["json", "text", "speedscope"] = "json"):
+    """A stored profile; `text` is the call tree, `speedscope` loads into https://www.speedscope.app."""
+    profile = await db[PROFILES].find_one({"id": profile_id}, {"_id": 0})
+    if not profile:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    if format == "json":
+        return profile
+    body = profile.get(format)
+    if body is None:
+        raise HTTPException(status_code=404, detail=f"No {format} output stored for this profile")
+    media_type = "text/plain" if format == "text" else "application/json"
+    return Response(content=body, media_type=media_type)
+
+async def run_report(report, start: Optional[date], end: Optional[date], **params) -> dict:
+    if start and end and start > end:
+        raise HTTPException(status_code=400, detail="start must not be after end")
+    # Loading and the vectorized work run off the event loop
+    snapshot = await asyncio.to_thread(current_snapshot)
+    if snapshot is None:
+        raise HTTPException(status_code=404, detail="No order snapshot yet; run python order_snapshot.py")
+    result = await asyncio.to_thread(report, snapshot, start, end, **params)
+    return {"snapshot": {"generation": snapshot.generation, "watermark": snapshot.watermark}, "start": start, "end": end, **result}
+
+@router.post("/reports/snapshot")
+async def update_order_snapshot(full: bool = False):
+    """Add recent order changes to the reporting snapshot, or rewrite it with `full`."""
+    manifest = await refresh_snapshot(db, full)
+    if manifest is None:
+        raise HTTPException(status_code=409, detail="A snapshot run is already in progress")
+    return manifest
+
+@router.get("/reports/aov")
+async def get_aov_report(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    period: Literal["day", "week", "month"] = "month"
+):
+    """Orders, revenue and average order value per period, from the order snapshot."""
+    return await run_report(aov_report, start, end, period=period)
+
+@router.get("/reports/basket-size")
+async def get_basket_size_report(start: Optional[date] = None, end: Optional[date] = None):
+    """Units and lines per order, from the order snapshot."""
+    return await run_report(basket_size_report, start, end)
+
+@router.get("/reports/top-skus")
+async def get_top_skus_report(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    sort: Literal["revenue", "units", "orders"] = "revenue",
+    limit: int = Query(default=20, ge=1, le=500)
+):
+    """Best-selling products, from the order snapshot."""
+    return await run_report(top_skus_report, start, end, sort=sort, limit=limit)
+
+@router.get("/reports/cohorts")
+async def get_cohort_report(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    months: int = Query(default=12, ge=1, le=36)
+):
+    """Monthly first-order cohorts and their repeat purchases, from the order snapshot."""
+    return await run_report(cohort_report, start, end, months=months)
@@ -1,7 +1,9 @@
 from fastapi import APIRouter, HTTPException, status, Depends
+from fastapi.security import HTTPAuthorizationCredentials
 from models import UserLogin, UserResponse, Token
-from auth import verify_password, create_access_token, get_current_user
+from auth import check_password, create_access_token, get_current_user, revoke_token, security
 from database import db
+from cache import user_cache
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
 
@@ -19,7 +21,7 @@ async def login(credentials: UserLogin):
         )
     
     # Verify password
-    if not verify_password(credentials.password, user_doc['hashed_password']):
+    if not await check_password(credentials.password, user_doc['hashed_password']):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid email or password"
@@ -40,9 +42,21 @@ async def login(credentials: UserLogin):
         )
     )
 
+@router.post("/logout")
+async def logout(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    current_user: dict = Depends(get_current_user)
+):
+    await revoke_token(credentials.credentials, current_user)
+    return {"message": "Logged out successfully"}
+
 @router.get("/me", response_model=UserResponse)
 async def get_me(current_user: dict = Depends(get_current_user)):
-    user_doc = await db.users.find_one({"id": current_user['user_id']})
+    user_id = current_user['user_id']
+    user_doc = await user_cache.get_or_load(
+        user_id,
+        lambda: db.users.find_one({"id": user_id}, {"_id": 0, "hashed_password": 0})
+    )
     if not user_doc:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -1,15 +1,20 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
 from models import Category, CategoryCreate
 from database import db
+from cache import response_cache
+from category_counts import reconcile_category_counts
 import uuid
 from typing import List
 
 router = APIRouter(prefix="/categories", tags=["Categories"])
 
 @router.get("", response_model=List[Category])
-async def get_categories():
-    categories = await db.categories.find({}, {"_id": 0}).to_list(100)
-    return categories
+async def get_categories(request: Request):
+    """Counts are the stored ones, kept in step by product writes and reconciliation."""
+    async def load(headers: dict):
+        return await db.categories.find({}, {"_id": 0}).to_list(100)
+    
+    return await response_cache.respond(request, List[Category], load, lambda categories: ["categories"])
 
 @router.post("", response_model=Category)
 async def create_category(category_data: CategoryCreate):
@@ -22,12 +27,18 @@ async def create_category(category_data: CategoryCreate):
         name=category_data.name,
         slug=category_data.slug,
         image=category_data.image,
-        count=0
+        count=await db.products.count_documents({"category": category_data.slug})
     )
     
     await db.categories.insert_one(category.model_dump())
+    response_cache.invalidate("categories")
     return category
 
+@router.post("/reconcile")
+async def reconcile_counts():
+    """Recompute every category's product count now; returns the corrections made."""
+    return {"corrections": await reconcile_category_counts(db)}
+
 @router.delete("/{category_id}")
 async def delete_category(category_id: str):
     existing = await db.categories.find_one({"id": category_id})
@@ -35,4 +46,5 @@ async def delete_category(category_id: str):
         raise HTTPException(status_code=404, detail="Category not found")
     
     await db.categories.delete_one({"id": category_id})
+    response_cache.invalidate("categories")
     return {"message": "Category deleted successfully"}
@@ -1,63 +1,203 @@
-from fastapi import APIRouter
-from models import DashboardStats, Order
+from fastapi import APIRouter, HTTPException, Query, Response
+from models import DashboardStats, Order, REVENUE_STATUSES
 from database import db
-from datetime import datetime
+from cache import dashboard_cache
+from pagination import NEXT_CURSOR_HEADER, apply_cursor, encode_cursor
+from sales_rollups import METRICS as SALES_METRICS, sales_breakdown, sales_series
+from datetime import date, datetime, timedelta, timezone
+from typing import List, Literal, Optional, Tuple
+import asyncio
+import os
 
 router = APIRouter(prefix="/dashboard", tags=["Dashboard"])
 
-def deserialize_order(order: dict) -> dict:
-    if 'created_at' in order and isinstance(order['created_at'], str):
-        order['created_at'] = datetime.fromisoformat(order['created_at'])
-    if 'updated_at' in order and isinstance(order['updated_at'], str):
-        order['updated_at'] = datetime.fromisoformat(order['updated_at'])
-    return order
+# Products below this many units count as low stock
+LOW_STOCK_THRESHOLD = int(os.environ.get("LOW_STOCK_THRESHOLD", "10"))
+INVENTORY_BUCKETS = ("out_of_stock", "low_stock", "in_stock")
 
-@router.get("/stats", response_model=DashboardStats)
-async def get_dashboard_stats():
-    total_products = await db.products.count_documents({})
-    total_orders = await db.orders.count_documents({})
-    
-    revenue_pipeline = [
-        {"$match": {"status": {"$in": ["Delivered", "Shipped", "Processing"]}}},
-        {"$group": {"_id": None, "total": {"$sum": "$total"}}}
-    ]
-    revenue_result = await db.orders.aggregate(revenue_pipeline).to_list(1)
-    total_revenue = revenue_result[0]['total'] if revenue_result else 0
-    
-    pending_orders = await db.orders.count_documents({"status": "Pending"})
-    low_stock_products = await db.products.count_documents({"stock_quantity": {"$lt": 10}})
+ORDER_STATS_PIPELINE = [
+    {"$facet": {
+        "total_orders": [{"$count": "n"}],
+        "total_revenue": [
+            {"$match": {"status": {"$in": REVENUE_STATUSES}}},
+            {"$group": {"_id": None, "total": {"$sum": "$total"}}}
+        ],
+        "pending_orders": [{"$match": {"status": "Pending"}}, {"$count": "n"}],
+        "recent_orders": [
+            {"$sort": {"created_at": -1, "id": -1}},
+            {"$limit": 5},
+            {"$project": {"_id": 0}}
+        ]
+    }}
+]
+
+PRODUCT_STATS_PIPELINE = [
+    {"$facet": {
+        "total_products": [{"$count": "n"}],
+        "low_stock_products": [{"$match": {"stock_quantity": {"$lt": LOW_STOCK_THRESHOLD}}}, {"$count": "n"}]
+    }}
+]
+
+def facet_count(facet: dict, name: str) -> int:
+    return facet[name][0]['n'] if facet[name] else 0
+
+async def load_dashboard_stats() -> DashboardStats:
+    order_facet, product_facet = await asyncio.gather(
+        db.orders.aggregate(ORDER_STATS_PIPELINE).to_list(1),
+        db.products.aggregate(PRODUCT_STATS_PIPELINE).to_list(1)
+    )
+    order_facet, product_facet = order_facet[0], product_facet[0]
     
-    recent_orders_docs = await db.orders.find({}, {"_id": 0}).sort("created_at", -1).limit(5).to_list(5)
-    recent_orders = [deserialize_order(o) for o in recent_orders_docs]
+    revenue = order_facet['total_revenue']
     
     return DashboardStats(
-        total_products=total_products,
-        total_orders=total_orders,
-        total_revenue=total_revenue,
-        pending_orders=pending_orders,
-        low_stock_products=low_stock_products,
-        recent_orders=recent_orders
+        total_products=facet_count(product_facet, 'total_products'),
+        total_orders=facet_count(order_facet, 'total_orders'),
+        total_revenue=revenue[0]['total'] if revenue else 0,
+        pending_orders=facet_count(order_facet, 'pending_orders'),
+        low_stock_products=facet_count(product_facet, 'low_stock_products'),
+        recent_orders=order_facet['recent_orders']
     )
 
+@router.get("/stats", response_model=DashboardStats)
+async def get_dashboard_stats():
+    return await dashboard_cache.get_or_load("stats", load_dashboard_stats)
+
+INVENTORY_PROJECTION = {"_id": 0, "id": 1, "name": 1, "slug": 1, "category": 1, "stock_quantity": 1, "in_stock": 1, "image": 1, "price": 1}
+INVENTORY_SORT = [("stock_quantity", 1), ("id", 1)]
+InventoryBucket = Literal["out_of_stock", "low_stock", "in_stock"]
+
+def inventory_bucket_filter(bucket: str) -> dict:
+    if bucket == "out_of_stock":
+        return {"stock_quantity": {"$lte": 0}}
+    if bucket == "low_stock":
+        return {"stock_quantity": {"$gt": 0, "$lt": LOW_STOCK_THRESHOLD}}
+    return {"stock_quantity": {"$gte": LOW_STOCK_THRESHOLD}}
+
+async def backfill_stock_quantities(db) -> int:
+    """Give products stored without a stock_quantity a stock of 0, so they list as out of stock."""
+    result = await db.products.update_many({"stock_quantity": None}, {"$set": {"stock_quantity": 0}})
+    return result.modified_count
+
+async def inventory_page(bucket: str, limit: int, cursor: Optional[str] = None) -> Tuple[List[dict], Optional[str]]:
+    query = apply_cursor(inventory_bucket_filter(bucket), cursor, 0, INVENTORY_SORT)
+    products = await db.products.find(query, INVENTORY_PROJECTION).sort(INVENTORY_SORT).limit(limit).to_list(limit)
+    next_cursor = encode_cursor(products[-1], INVENTORY_SORT) if len(products) == limit else None
+    return products, next_cursor
+
 @router.get("/inventory")
-async def get_inventory_status():
-    products = await db.products.find(
-        {},
-        {"_id": 0, "id": 1, "name": 1, "slug": 1, "category": 1, "stock_quantity": 1, "in_stock": 1, "image": 1, "price": 1}
-    ).sort("stock_quantity", 1).to_list(500)
-    
-    out_of_stock = [p for p in products if p.get('stock_quantity', 0) == 0]
-    low_stock = [p for p in products if 0 < p.get('stock_quantity', 0) < 10]
-    in_stock = [p for p in products if p.get('stock_quantity', 0) >= 10]
+async def get_inventory_status(limit: int = Query(default=50, ge=1, le=500)):
+    """Bucket counts plus the first page of each bucket.
+
+    Further pages come from /inventory/{bucket} with the bucket's next cursor.
+    """
+    counts = await asyncio.gather(*[
+        db.products.count_documents(inventory_bucket_filter(bucket)) for bucket in INVENTORY_BUCKETS
+    ])
+    pages = await asyncio.gather(*[inventory_page(bucket, limit) for bucket in INVENTORY_BUCKETS])
+    out_of_stock_count, low_stock_count, in_stock_count = counts
     
-    return {
-        "out_of_stock": out_of_stock,
-        "low_stock": low_stock,
-        "in_stock": in_stock,
-        "summary": {
-            "total": len(products),
-            "out_of_stock_count": len(out_of_stock),
-            "low_stock_count": len(low_stock),
-            "in_stock_count": len(in_stock)
-        }
+    result = {bucket: products for bucket, (products, _) in zip(INVENTORY_BUCKETS, pages)}
+    result["next_cursors"] = {bucket: next_cursor for bucket, (_, next_cursor) in zip(INVENTORY_BUCKETS, pages)}
+    result["summary"] = {
+        "total": sum(counts),
+        "out_of_stock_count": out_of_stock_count,
+        "low_stock_count": low_stock_count,
+        "in_stock_count": in_stock_count,
+        "low_stock_threshold": LOW_STOCK_THRESHOLD
     }
+    return result
+
+@router.get("/inventory/{bucket}")
+async def get_inventory_bucket(
+    bucket: InventoryBucket,
+    response: Response,
+    limit: int = Query(default=50, ge=1, le=500),
+    cursor: Optional[str] = None
+):
+    products, next_cursor = await inventory_page(bucket, limit, cursor)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return products
+
+# Longest range one sales request may cover, per granularity
+MAX_SALES_DAYS = {"hour": 93, "day": 3 * 366}
+SalesGranularity = Literal["hour", "day"]
+SalesMetric = Literal["placed", "orders", "units", "revenue"]
+
+def sales_range(start: Optional[date], end: Optional[date], granularity: str = "day") -> Tuple[date, date]:
+    """Defaults to the 30 days ending today (UTC); both ends are inclusive."""
+    end = end or datetime.now(timezone.utc).date()
+    start = start or end - timedelta(days=29)
+    if start > end:
+        raise HTTPException(status_code=400, detail="start must not be after end")
+    if (end - start).days + 1 > MAX_SALES_DAYS[granularity]:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_SALES_DAYS[granularity]} days per request at {granularity} granularity")
+    return start, end
+
+@router.get("/sales")
+async def get_sales(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    granularity: SalesGranularity = "day"
+):
+    """Store-wide placed orders, and orders, units and revenue in revenue statuses, per UTC hour or day.
+
+    Read from the sales rollups; buckets without orders are returned as zeros.
+    """
+    start, end = sales_range(start, end, granularity)
+    series = await sales_series(db, granularity, "total", "", start, end)
+    totals = {metric: sum(point[metric] for point in series) for metric in SALES_METRICS}
+    totals["revenue"] = round(totals["revenue"], 2)
+    return {"start": start, "end": end, "granularity": granularity, "totals": totals, "series": series}
+
+@router.get("/sales/categories")
+async def get_sales_by_category(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    sort: SalesMetric = "revenue",
+    limit: int = Query(default=50, ge=1, le=500)
+):
+    """Sales per category over the range, largest `sort` first."""
+    start, end = sales_range(start, end)
+    return {"start": start, "end": end, "categories": await sales_breakdown(db, "category", start, end, sort, limit)}
+
+@router.get("/sales/categories/{slug}")
+async def get_category_sales(
+    slug: str,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    granularity: SalesGranularity = "day"
+):
+    start, end = sales_range(start, end, granularity)
+    return {"category": slug, "start": start, "end": end, "granularity": granularity,
+            "series": await sales_series(db, granularity, "category", slug, start, end)}
+
+@router.get("/sales/products")
+async def get_sales_by_product(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    sort: SalesMetric = "revenue",
+    limit: int = Query(default=50, ge=1, le=500)
+):
+    """Top products over the range by `sort`."""
+    start, end = sales_range(start, end)
+    rows = await sales_breakdown(db, "product", start, end, sort, limit)
+    names = {
+        p['id']: p async for p in db.products.find({"id": {"$in": [row['key'] for row in rows]}}, {"_id": 0, "id": 1, "name": 1, "slug": 1})
+    }
+    for row in rows:
+        product = names.get(row['key'], {})
+        row['name'], row['slug'] = product.get('name'), product.get('slug')
+    return {"start": start, "end": end, "products": rows}
+
+@router.get("/sales/products/{product_id}")
+async def get_product_sales(
+    product_id: str,
+    start: Optional[date] = None,
+    end: Optional[date] = None
+):
+    """Daily sales of one product; products have no hourly rollups."""
+    start, end = sales_range(start, end)
+    return {"product_id": product_id, "start": start, "end": end, "granularity": "day",
+            "series": await sales_series(db, "day", "product", product_id, start, end)}
@@ -1,88 +1,301 @@
-from fastapi import APIRouter, HTTPException, Query
-from models import Order, OrderCreate, OrderUpdate
-from database import db
+from fastapi import APIRouter, HTTPException, Query, Response, status
+from pymongo import ReturnDocument, UpdateOne
+from models import Order, OrderCreate, OrderUpdate, BulkOrderUpdate, BulkOrderResult, BulkOrderUpdateResponse, ORDER_STATUS_TRANSITIONS
+from database import db, client, run_transaction, supports_transactions
+from cache import dashboard_cache, response_cache
 from datetime import datetime, timezone
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple
+import asyncio
+import os
+import uuid
+from pagination import ORDER_SORT, apply_cursor, set_next_cursor
+from serialization import FAST_JSON_RESPONSES, json_response
+from fieldsets import ORDER_PRESETS, fields_description, parse_fields, sparse_projection, sparse_list_model, strip_unselected
+from sales_rollups import ROLLUP_PROJECTION, UNCATEGORIZED, affects_sales, apply_sales_deltas, merge_deltas, order_sales_deltas, product_categories, sales_deltas
 
 router = APIRouter(prefix="/orders", tags=["Orders"])
 
-def serialize_order(order: dict) -> dict:
-    if 'created_at' in order and isinstance(order['created_at'], datetime):
-        order['created_at'] = order['created_at'].isoformat()
-    if 'updated_at' in order and isinstance(order['updated_at'], datetime):
-        order['updated_at'] = order['updated_at'].isoformat()
-    return order
-
-def deserialize_order(order: dict) -> dict:
-    if 'created_at' in order and isinstance(order['created_at'], str):
-        order['created_at'] = datetime.fromisoformat(order['created_at'])
-    if 'updated_at' in order and isinstance(order['updated_at'], str):
-        order['updated_at'] = datetime.fromisoformat(order['updated_at'])
-    return order
+MAX_BULK_ORDER_UPDATES = int(os.environ.get("MAX_BULK_ORDER_UPDATES", "1000"))
 
 @router.get("", response_model=List[Order])
 async def get_orders(
+    response: Response,
     status_filter: Optional[str] = Query(None, alias="status"),
     limit: int = Query(default=100, le=500),
-    skip: int = 0
+    skip: int = 0,
+    cursor: Optional[str] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    fields: Optional[str] = Query(default=None, description=fields_description(ORDER_PRESETS))
 ):
+    selected = parse_fields(fields, Order, ORDER_PRESETS)
+    projection = {"_id": 0} if selected is None else sparse_projection(selected, tuple(f for f, _ in ORDER_SORT))
+    
     query = {}
     if status_filter:
         query["status"] = status_filter
+    if created_from or created_to:
+        query["created_at"] = {}
+        if created_from:
+            query["created_at"]["$gte"] = created_from
+        if created_to:
+            query["created_at"]["$lt"] = created_to
+    query = apply_cursor(query, cursor, skip, ORDER_SORT)
     
-    orders = await db.orders.find(query, {"_id": 0}).sort("created_at", -1).skip(skip).limit(limit).to_list(limit)
-    return [deserialize_order(o) for o in orders]
+    orders = await db.orders.find(query, projection).sort(ORDER_SORT).skip(skip).limit(limit).to_list(limit)
+    headers = {}
+    set_next_cursor(headers, orders, limit, ORDER_SORT)
+    if selected is not None:
+        return json_response(strip_unselected(orders, selected), sparse_list_model(Order, selected), headers)
+    if FAST_JSON_RESPONSES:
+        return json_response(orders, List[Order], headers)
+    response.headers.update(headers)
+    return orders
 
 @router.get("/{order_id}", response_model=Order)
 async def get_order(order_id: str):
     order = await db.orders.find_one({"id": order_id}, {"_id": 0})
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
-    return deserialize_order(order)
+    return order
+
+class InsufficientStock(Exception):
+    pass
+
+def stock_decrement(product_id: str, quantity: int) -> Tuple[dict, list]:
+    # Only matches while enough stock is left, and recomputes in_stock in the same write
+    return (
+        {"id": product_id, "stock_quantity": {"$gte": quantity}},
+        [
+            {"$set": {"stock_quantity": {"$subtract": ["$stock_quantity", quantity]}}},
+            {"$set": {"in_stock": {"$gt": ["$stock_quantity", 0]}}}
+        ]
+    )
+
+def stock_increment(product_id: str, quantity: int) -> Tuple[dict, list]:
+    return (
+        {"id": product_id},
+        [
+            {"$set": {"stock_quantity": {"$add": ["$stock_quantity", quantity]}}},
+            {"$set": {"in_stock": {"$gt": ["$stock_quantity", 0]}}}
+        ]
+    )
+
+async def place_order_in_transaction(order_dict: dict, quantities: Dict[str, int], sales: dict) -> None:
+    async def callback(session):
+        result = await db.products.bulk_write(
+            [UpdateOne(*stock_decrement(pid, qty)) for pid, qty in quantities.items()],
+            ordered=False,
+            session=session
+        )
+        if result.matched_count < len(quantities):
+            raise InsufficientStock()
+        await db.orders.insert_one(order_dict, session=session)
+        await apply_sales_deltas(db, sales, session)
+    
+    async with await client.start_session() as session:
+        await session.with_transaction(callback)
+
+async def place_order_without_transaction(order_dict: dict, quantities: Dict[str, int], sales: dict) -> None:
+    # Without transactions the conditional decrements are sent concurrently so
+    # that each one reports whether it applied and can be rolled back exactly
+    results = await asyncio.gather(*[
+        db.products.update_one(*stock_decrement(pid, qty)) for pid, qty in quantities.items()
+    ])
+    applied = {pid: qty for (pid, qty), result in zip(quantities.items(), results) if result.matched_count}
+    try:
+        if len(applied) < len(quantities):
+            raise InsufficientStock()
+        await db.orders.insert_one(order_dict)
+    except BaseException:
+        if applied:
+            await db.products.bulk_write(
+                [UpdateOne(*stock_increment(pid, qty)) for pid, qty in applied.items()],
+                ordered=False
+            )
+        raise
+    await apply_sales_deltas(db, sales)
+
+async def unavailable_items(quantities: Dict[str, int]) -> List[dict]:
+    available = {
+        p['id']: p.get('stock_quantity', 0)
+        async for p in db.products.find({"id": {"$in": list(quantities)}}, {"_id": 0, "id": 1, "stock_quantity": 1})
+    }
+    return [
+        {"product_id": pid, "requested": qty, "available": max(available.get(pid, 0), 0)}
+        for pid, qty in quantities.items()
+        if available.get(pid, 0) < qty
+    ]
 
 @router.post("", response_model=Order)
 async def create_order(order_data: OrderCreate):
     order = Order(**order_data.model_dump())
-    order_dict = serialize_order(order.model_dump())
-    
-    await db.orders.insert_one(order_dict)
+    # Lines keep the category their product has now; the rollups count them there
+    categories = await product_categories(db, [{"items": [{"product_id": item.product_id} for item in order.items]}])
+    for item in order.items:
+        item.category = categories.get(item.product_id, UNCATEGORIZED)
+    order_dict = order.model_dump()
     
+    # The same product can appear on several lines (different size/color)
+    quantities: Dict[str, int] = {}
     for item in order_data.items:
-        await db.products.update_one(
-            {"id": item.product_id},
-            {"$inc": {"stock_quantity": -item.quantity}}
+        quantities[item.product_id] = quantities.get(item.product_id, 0) + item.quantity
+    
+    sales = sales_deltas(None, order_dict, {})
+    try:
+        if await supports_transactions():
+            await place_order_in_transaction(order_dict, quantities, sales)
+        else:
+            await place_order_without_transaction(order_dict, quantities, sales)
+    except InsufficientStock:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail={"message": "Insufficient stock", "items": await unavailable_items(quantities)}
         )
-        product = await db.products.find_one({"id": item.product_id})
-        if product and product.get('stock_quantity', 0) <= 0:
-            await db.products.update_one(
-                {"id": item.product_id},
-                {"$set": {"in_stock": False}}
-            )
+    dashboard_cache.invalidate()
+    response_cache.invalidate("products", *[f"product:{pid}" for pid in quantities])
     
     return order
 
+def bulk_order_updates(updates: List[BulkOrderUpdate], orders: List[dict], now: datetime, batch_id: str) -> Tuple[List[BulkOrderResult], Dict[int, UpdateOne]]:
+    """Check each requested change against the order's current status.
+
+    Returns one result per entry and the write for every accepted entry, keyed
+    by its position. Writes are conditional on the status that was read, so an
+    order changed concurrently is reported as a conflict instead of being
+    overwritten. Every write stamps `bulk_batch_id` so the batch can find the
+    orders it actually changed.
+    """
+    by_id = {order['id']: order for order in orders}
+    by_number = {order['order_number']: order for order in orders}
+    results: List[BulkOrderResult] = []
+    writes: Dict[int, UpdateOne] = {}
+    seen = set()
+    for index, update in enumerate(updates):
+        order = by_id.get(update.order_id) if update.order_id is not None else by_number.get(update.order_number)
+        if order is None:
+            results.append(BulkOrderResult(order_id=update.order_id, order_number=update.order_number, outcome="not_found", detail="Order not found"))
+            continue
+        result = BulkOrderResult(order_id=order['id'], order_number=order['order_number'], previous_status=order['status'], status=update.status, outcome="updated")
+        results.append(result)
+        if order['id'] in seen:
+            result.outcome, result.detail = "duplicate", "Order appears more than once in this batch"
+            continue
+        seen.add(order['id'])
+        if update.status not in ORDER_STATUS_TRANSITIONS:
+            result.outcome, result.detail = "invalid_transition", f"Unknown status: {update.status}"
+            continue
+        if update.status != order['status'] and update.status not in ORDER_STATUS_TRANSITIONS.get(order['status'], []):
+            result.outcome, result.detail = "invalid_transition", f"Cannot change status from {order['status']} to {update.status}"
+            continue
+        changes = {"status": update.status, "updated_at": now, "bulk_batch_id": batch_id}
+        if update.tracking_number is not None:
+            changes['tracking_number'] = update.tracking_number
+        writes[index] = UpdateOne({"id": order['id'], "status": order['status']}, {"$set": changes})
+    return results, writes
+
+@router.patch("/bulk", response_model=BulkOrderUpdateResponse)
+async def bulk_update_orders(updates: List[BulkOrderUpdate]):
+    """Apply status/tracking updates to many orders with one read and one bulk write."""
+    if len(updates) > MAX_BULK_ORDER_UPDATES:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BULK_ORDER_UPDATES} updates per request")
+    
+    order_ids = [u.order_id for u in updates if u.order_id is not None]
+    order_numbers = [u.order_number for u in updates if u.order_number is not None]
+    
+    # The read, the conditional writes and the rollup deltas commit together
+    async def apply_updates(session) -> Tuple[List[BulkOrderResult], bool]:
+        orders = await db.orders.find(
+            {"$or": [{"id": {"$in": order_ids}}, {"order_number": {"$in": order_numbers}}]},
+            {**ROLLUP_PROJECTION, "id": 1, "order_number": 1},
+            session=session
+        ).to_list(None)
+        batch_id = str(uuid.uuid4())
+        results, writes = bulk_order_updates(updates, orders, datetime.now(timezone.utc), batch_id)
+        if not writes:
+            return results, False
+        by_id = {order['id']: order for order in orders}
+        changes = {i: (by_id[results[i].order_id], {**by_id[results[i].order_id], "status": results[i].status}) for i in writes}
+        changes = {i: pair for i, pair in changes.items() if affects_sales(*pair)}
+        categories = await product_categories(db, [doc for pair in changes.values() for doc in pair], session)
+        # Computed before the write so that a failure leaves the orders and the rollups as they were
+        deltas = {i: sales_deltas(*pair, categories) for i, pair in changes.items()}
+        
+        outcome = await db.orders.bulk_write(list(writes.values()), ordered=False, session=session)
+        written = {results[i].order_id for i in writes}
+        if outcome.matched_count < len(writes):
+            # Some orders changed status between the read and the write
+            written = {
+                order['id'] for order in await db.orders.find(
+                    {"id": {"$in": list(written)}, "bulk_batch_id": batch_id},
+                    {"_id": 0, "id": 1},
+                    session=session
+                ).to_list(None)
+            }
+            for index in writes:
+                if results[index].order_id not in written:
+                    results[index].outcome, results[index].detail = "conflict", "Order status changed concurrently"
+        await apply_sales_deltas(db, merge_deltas(part for i, part in deltas.items() if results[i].order_id in written), session)
+        return results, True
+    
+    results, changed = await run_transaction(apply_updates)
+    if changed:
+        dashboard_cache.invalidate()
+    
+    updated = sum(1 for r in results if r.outcome == "updated")
+    return BulkOrderUpdateResponse(updated=updated, failed=len(results) - updated, results=results)
+
 @router.put("/{order_id}", response_model=Order)
 async def update_order(order_id: str, order_data: OrderUpdate):
-    existing = await db.orders.find_one({"id": order_id})
-    if not existing:
-        raise HTTPException(status_code=404, detail="Order not found")
-    
     update_data = {k: v for k, v in order_data.model_dump().items() if v is not None}
-    update_data['updated_at'] = datetime.now(timezone.utc).isoformat()
+    update_data['updated_at'] = datetime.now(timezone.utc)
     
-    await db.orders.update_one(
-        {"id": order_id},
-        {"$set": update_data}
-    )
+    if 'status' in update_data:
+        updated = await run_transaction(lambda session: change_order_status(order_id, update_data, session))
+    else:
+        updated = await db.orders.find_one_and_update(
+            {"id": order_id},
+            {"$set": update_data},
+            projection={"_id": 0},
+            return_document=ReturnDocument.AFTER
+        )
+    if not updated:
+        raise HTTPException(status_code=404, detail="Order not found")
+    dashboard_cache.invalidate()
     
-    updated = await db.orders.find_one({"id": order_id}, {"_id": 0})
-    return deserialize_order(updated)
+    return updated
+
+async def change_order_status(order_id: str, update_data: dict, session) -> Optional[dict]:
+    """Apply an update that sets `status`, moving the sales rollups with it."""
+    while True:
+        previous = await db.orders.find_one({"id": order_id}, {"_id": 0}, session=session)
+        if not previous:
+            return None
+        updated = {**previous, **update_data}
+        # Computed before the write so that a failure leaves the order and the rollups as they were
+        deltas = await order_sales_deltas(db, [(previous, updated)], session)
+        # Matches nothing if the status changed since the read; the deltas are then computed again
+        written = await db.orders.update_one({"id": order_id, "status": previous["status"]}, {"$set": update_data}, session=session)
+        if written.matched_count:
+            break
+    await apply_sales_deltas(db, deltas, session)
+    return updated
 
 @router.delete("/{order_id}")
 async def delete_order(order_id: str):
-    existing = await db.orders.find_one({"id": order_id})
-    if not existing:
-        raise HTTPException(status_code=404, detail="Order not found")
+    async def delete(session):
+        while True:
+            order = await db.orders.find_one({"id": order_id}, {**ROLLUP_PROJECTION, "_id": 1}, session=session)
+            if not order:
+                return None
+            deltas = await order_sales_deltas(db, [(order, None)], session)
+            deleted = await db.orders.delete_one({"_id": order["_id"], "status": order["status"]}, session=session)
+            if deleted.deleted_count:
+                break
+        await apply_sales_deltas(db, deltas, session)
+        return order
     
-    await db.orders.delete_one({"id": order_id})
+    if not await run_transaction(delete):
+        raise HTTPException(status_code=404, detail="Order not found")
+    dashboard_cache.invalidate()
     return {"message": "Order deleted successfully"}
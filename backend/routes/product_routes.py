@@ -1,57 +1,104 @@
-from fastapi import APIRouter, HTTPException, status, Query
+from fastapi import APIRouter, HTTPException, status, Query, Request
+from fastapi.responses import StreamingResponse
+from pymongo import ReturnDocument
 from models import Product, ProductCreate, ProductUpdate
-from database import db
+from database import db, run_transaction
+from cache import dashboard_cache, response_cache
 from datetime import datetime, timezone
-from typing import List, Optional
+from typing import List, Literal, Optional
+from pagination import PRODUCT_SORT, apply_cursor, set_next_cursor
+from fieldsets import PRODUCT_PRESETS, fields_description, parse_fields, sparse_projection, sparse_list_model, strip_unselected
+from catalog_io import FORMATS, import_products, iter_csv_rows, iter_ndjson_rows, export_csv, export_ndjson
+from search import search_products, with_search_fields, build_search_prefixes, PREFIX_FIELDS
+from category_counts import apply_category_deltas, category_deltas
+from images import with_image_variants
 
 router = APIRouter(prefix="/products", tags=["Products"])
 
-def serialize_product(product: dict) -> dict:
-    if 'created_at' in product and isinstance(product['created_at'], datetime):
-        product['created_at'] = product['created_at'].isoformat()
-    if 'updated_at' in product and isinstance(product['updated_at'], datetime):
-        product['updated_at'] = product['updated_at'].isoformat()
-    return product
-
-def deserialize_product(product: dict) -> dict:
-    if 'created_at' in product and isinstance(product['created_at'], str):
-        product['created_at'] = datetime.fromisoformat(product['created_at'])
-    if 'updated_at' in product and isinstance(product['updated_at'], str):
-        product['updated_at'] = datetime.fromisoformat(product['updated_at'])
-    return product
+# search_prefixes is internal to search and never returned
+PRODUCT_PROJECTION = {"_id": 0, "search_prefixes": 0}
 
 @router.get("", response_model=List[Product])
 async def get_products(
+    request: Request,
     category: Optional[str] = None,
     search: Optional[str] = None,
     limit: int = Query(default=100, le=500),
-    skip: int = 0
+    skip: int = 0,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = Query(default=None, description=fields_description(PRODUCT_PRESETS))
 ):
+    selected = parse_fields(fields, Product, PRODUCT_PRESETS)
+    projection = PRODUCT_PROJECTION if selected is None else sparse_projection(selected, tuple(f for f, _ in PRODUCT_SORT))
+    
     query = {}
     if category:
         query["category"] = category
-    if search:
-        query["$or"] = [
-            {"name": {"$regex": search, "$options": "i"}},
-            {"description": {"$regex": search, "$options": "i"}}
-        ]
+    if search and search.strip():
+        if cursor is not None:
+            raise HTTPException(status_code=400, detail="Cursor pagination is not supported with search")
+    else:
+        search = None
+        query = apply_cursor(query, cursor, skip, PRODUCT_SORT)
+    
+    async def load(headers: dict):
+        if search:
+            products = await search_products(db.products, search, query, projection, skip, limit)
+        else:
+            products = await db.products.find(query, projection).sort(PRODUCT_SORT).skip(skip).limit(limit).to_list(limit)
+            set_next_cursor(headers, products, limit, PRODUCT_SORT)
+        return products if selected is None else strip_unselected(products, selected)
+    
+    return await response_cache.respond(request, sparse_list_model(Product, selected), load, lambda products: ["products"])
+
+@router.post("/import")
+async def import_products_stream(
+    request: Request,
+    file_format: Optional[Literal["ndjson", "csv"]] = Query(default=None, alias="format")
+):
+    """Upsert products by slug from an NDJSON or CSV request body.
+
+    The format defaults to the request's Content-Type. Returns counts and a
+    per-row error report.
+    """
+    if file_format is None:
+        file_format = "csv" if "csv" in request.headers.get("content-type", "") else "ndjson"
+    parse_rows = iter_csv_rows if file_format == "csv" else iter_ndjson_rows
     
-    products = await db.products.find(query, {"_id": 0}).skip(skip).limit(limit).to_list(limit)
-    return [deserialize_product(p) for p in products]
+    report = await import_products(db, parse_rows(request.stream()))
+    dashboard_cache.invalidate()
+    response_cache.clear()
+    return report
+
+@router.get("/export")
+async def export_products(
+    file_format: Literal["ndjson", "csv"] = Query(default="ndjson", alias="format"),
+    category: Optional[str] = None
+):
+    query = {"category": category} if category else {}
+    body = export_csv(db, query) if file_format == "csv" else export_ndjson(db, query)
+    return StreamingResponse(
+        body,
+        media_type=FORMATS[file_format],
+        headers={"Content-Disposition": f'attachment; filename="products.{file_format}"'}
+    )
+
+async def get_cached_product(request: Request, query: dict):
+    async def load(headers: dict):
+        product = await db.products.find_one(query, PRODUCT_PROJECTION)
+        if not product:
+            raise HTTPException(status_code=404, detail="Product not found")
+        return product
+    
+    return await response_cache.respond(request, Product, load, lambda product: [f"product:{product['id']}"])
 
 @router.get("/{product_id}", response_model=Product)
-async def get_product(product_id: str):
-    product = await db.products.find_one({"id": product_id}, {"_id": 0})
-    if not product:
-        raise HTTPException(status_code=404, detail="Product not found")
-    return deserialize_product(product)
+async def get_product(product_id: str, request: Request):
+    return await get_cached_product(request, {"id": product_id})
 
 @router.get("/slug/{slug}", response_model=Product)
-async def get_product_by_slug(slug: str):
-    product = await db.products.find_one({"slug": slug}, {"_id": 0})
-    if not product:
-        raise HTTPException(status_code=404, detail="Product not found")
-    return deserialize_product(product)
+async def get_product_by_slug(slug: str, request: Request):
+    return await get_cached_product(request, {"slug": slug})
 
 @router.post("", response_model=Product)
 async def create_product(product_data: ProductCreate):
@@ -62,63 +109,94 @@ async def create_product(product_data: ProductCreate):
             detail="Product with this slug already exists"
         )
     
-    product = Product(**product_data.model_dump())
-    product_dict = serialize_product(product.model_dump())
+    product = Product(**with_image_variants(product_data.model_dump()))
+    product_dict = with_search_fields(product.model_dump())
     
-    await db.products.insert_one(product_dict)
+    async def insert(session):
+        await db.products.insert_one(product_dict, session=session)
+        await apply_category_deltas(db, category_deltas([(None, product.category)]), session)
     
-    await db.categories.update_one(
-        {"slug": product.category},
-        {"$inc": {"count": 1}}
-    )
+    await run_transaction(insert)
+    dashboard_cache.invalidate()
+    response_cache.invalidate("products", "categories")
     
     return product
 
+async def move_product(product_id: str, update_data: dict, session) -> Optional[dict]:
+    """Apply an update that sets `category`, moving the category counts with it."""
+    previous = await db.products.find_one_and_update(
+        {"id": product_id},
+        {"$set": update_data},
+        projection=PRODUCT_PROJECTION,
+        return_document=ReturnDocument.BEFORE,
+        session=session
+    )
+    if not previous:
+        return None
+    await apply_category_deltas(db, category_deltas([(previous['category'], update_data['category'])]), session)
+    return {**previous, **update_data}
+
 @router.put("/{product_id}", response_model=Product)
 async def update_product(product_id: str, product_data: ProductUpdate):
-    existing = await db.products.find_one({"id": product_id})
-    if not existing:
-        raise HTTPException(status_code=404, detail="Product not found")
+    update_data = with_image_variants({k: v for k, v in product_data.model_dump().items() if v is not None})
+    update_data['updated_at'] = datetime.now(timezone.utc)
     
-    update_data = {k: v for k, v in product_data.model_dump().items() if v is not None}
-    update_data['updated_at'] = datetime.now(timezone.utc).isoformat()
+    if 'category' in update_data:
+        updated = await run_transaction(lambda session: move_product(product_id, update_data, session))
+    else:
+        updated = await db.products.find_one_and_update(
+            {"id": product_id},
+            {"$set": update_data},
+            projection=PRODUCT_PROJECTION,
+            return_document=ReturnDocument.AFTER
+        )
+    if not updated:
+        raise HTTPException(status_code=404, detail="Product not found")
     
-    await db.products.update_one(
-        {"id": product_id},
-        {"$set": update_data}
-    )
+    if any(field in update_data for field in PREFIX_FIELDS):
+        # Prefixes depend on all searchable fields; the filter skips the write if a concurrent update changed them
+        await db.products.update_one(
+            {"id": product_id, **{field: updated.get(field) for field in PREFIX_FIELDS}},
+            {"$set": {"search_prefixes": build_search_prefixes(updated)}}
+        )
+    dashboard_cache.invalidate()
+    response_cache.invalidate("products", f"product:{product_id}", *(["categories"] if 'category' in update_data else []))
     
-    updated = await db.products.find_one({"id": product_id}, {"_id": 0})
-    return deserialize_product(updated)
+    return updated
 
 @router.delete("/{product_id}")
 async def delete_product(product_id: str):
-    existing = await db.products.find_one({"id": product_id})
-    if not existing:
-        raise HTTPException(status_code=404, detail="Product not found")
-    
-    await db.categories.update_one(
-        {"slug": existing['category']},
-        {"$inc": {"count": -1}}
-    )
+    async def delete(session):
+        deleted = await db.products.find_one_and_delete(
+            {"id": product_id},
+            projection={"_id": 0, "category": 1},
+            session=session
+        )
+        if deleted:
+            await apply_category_deltas(db, category_deltas([(deleted['category'], None)]), session)
+        return deleted
     
-    await db.products.delete_one({"id": product_id})
+    if not await run_transaction(delete):
+        raise HTTPException(status_code=404, detail="Product not found")
+    dashboard_cache.invalidate()
+    response_cache.invalidate("products", f"product:{product_id}", "categories")
     return {"message": "Product deleted successfully"}
 
 @router.patch("/{product_id}/stock")
 async def update_stock(product_id: str, stock_quantity: int):
-    existing = await db.products.find_one({"id": product_id})
-    if not existing:
-        raise HTTPException(status_code=404, detail="Product not found")
-    
     in_stock = stock_quantity > 0
-    await db.products.update_one(
+    updated = await db.products.find_one_and_update(
         {"id": product_id},
         {"$set": {
             "stock_quantity": stock_quantity,
             "in_stock": in_stock,
-            "updated_at": datetime.now(timezone.utc).isoformat()
-        }}
+            "updated_at": datetime.now(timezone.utc)
+        }},
+        projection={"_id": 0, "id": 1}
     )
+    if not updated:
+        raise HTTPException(status_code=404, detail="Product not found")
+    dashboard_cache.invalidate()
+    response_cache.invalidate("products", f"product:{product_id}")
     
     return {"message": "Stock updated successfully", "stock_quantity": stock_quantity, "in_stock": in_stock}
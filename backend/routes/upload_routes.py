@@ -0,0 +1,16 @@
+from fastapi import APIRouter, Depends, Request
+from database import db
+from auth import require_admin
+from images import store_image
+
+router = APIRouter(prefix="/uploads", tags=["Uploads"], dependencies=[Depends(require_admin)])
+
+@router.post("/images")
+async def upload_image(request: Request):
+    """Upload a JPEG, PNG or WebP image as the raw request body.
+
+    Returns the stored image's variant URLs; uploading the same file again
+    returns the existing record. Use any of its URLs as a product's `image`
+    or `images`: they are stored as the card and detail variants.
+    """
+    return await store_image(db, request.stream())
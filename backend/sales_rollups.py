@@ -0,0 +1,254 @@
+"""
+Incremental sales rollups
+Backfill: python sales_rollups.py [--since YYYY-MM-DD]
+
+`sales_rollups` holds one document per (granularity, bucket, dimension,
+key) with the placed order count and the orders, units and revenue of
+orders in a revenue status (the dashboard's REVENUE_STATUSES); an order
+counts in the UTC hour and day it was created. Hourly documents exist for
+the store total and per category, daily ones also per product. Order writes
+compute the order's contribution before and after the change and $inc the
+difference in one bulk write, in the same transaction where the deployment
+supports them, so a date-range query reads one small document per bucket no
+matter how many orders there are. Each order line carries the category its
+product had when the order was placed, and both the + and the later - of a
+line use it, so moving or deleting a product never shifts revenue between
+categories. `python sales_rollups.py` first runs backfill_order_categories(),
+which stamps lines written before that with their product's current
+category.
+
+rebuild_sales_rollups() recomputes the rollups from the orders (all of them,
+or those created since a date). It replaces documents under concurrent order
+writes, so run it when the store is quiet; generate_data.py runs it after
+loading a dataset.
+"""
+from pymongo import UpdateOne
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+from models import REVENUE_STATUSES, parse_timestamp
+import argparse
+import asyncio
+
+COLLECTION = "sales_rollups"
+GRANULARITIES = ("hour", "day")
+METRICS = ("placed", "orders", "units", "revenue")
+# Dimensions kept at each granularity; per-product hours would be mostly empty documents
+DIMENSIONS = {"hour": ("total", "category"), "day": ("total", "category", "product")}
+# Order fields a contribution is computed from
+ROLLUP_PROJECTION = {"_id": 0, "status": 1, "created_at": 1, "total": 1, "items.product_id": 1, "items.category": 1, "items.quantity": 1, "items.price": 1}
+# Lines whose product no longer exists when their category is first needed
+UNCATEGORIZED = "uncategorized"
+WRITE_BATCH_SIZE = 1000
+
+# (granularity, bucket start, dimension, key) -> metric -> amount
+Deltas = Dict[Tuple[str, datetime, str, str], Dict[str, float]]
+
+
+def bucket_start(moment: Union[datetime, str], granularity: str) -> datetime:
+    moment = parse_timestamp(moment).astimezone(timezone.utc).replace(minute=0, second=0, microsecond=0)
+    return moment.replace(hour=0) if granularity == "day" else moment
+
+
+def rollup_id(granularity: str, bucket: datetime, dimension: str, key: str) -> str:
+    return f"{granularity}|{bucket:%Y-%m-%dT%H}|{dimension}|{key}"
+
+
+def add_contribution(deltas: Deltas, order: dict, categories: Dict[str, str], sign: int) -> None:
+    counted = order["status"] in REVENUE_STATUSES
+    per_key: Dict[Tuple[str, str], Dict[str, float]] = {
+        ("total", ""): {"placed": 1, "orders": int(counted),
+                        "units": 0, "revenue": order["total"] if counted else 0},
+    }
+    if counted:
+        for item in order["items"]:
+            revenue = item["price"] * item["quantity"]
+            per_key[("total", "")]["units"] += item["quantity"]
+            category = item.get("category") or categories.get(item["product_id"], UNCATEGORIZED)
+            for dimension, key in (("category", category), ("product", item["product_id"])):
+                metrics = per_key.setdefault((dimension, key), {"placed": 0, "orders": 0, "units": 0, "revenue": 0})
+                metrics["units"] += item["quantity"]
+                metrics["revenue"] += revenue
+        for (dimension, key), metrics in per_key.items():
+            if dimension != "total":
+                # An order with several lines of the same category or product still counts once
+                metrics["orders"] = 1
+    for granularity in GRANULARITIES:
+        bucket = bucket_start(order["created_at"], granularity)
+        for (dimension, key), metrics in per_key.items():
+            if dimension not in DIMENSIONS[granularity]:
+                continue
+            totals = deltas[(granularity, bucket, dimension, key)]
+            for metric, amount in metrics.items():
+                totals[metric] = totals.get(metric, 0) + sign * amount
+
+
+def sales_deltas(before: Optional[dict], after: Optional[dict], categories: Dict[str, str]) -> Deltas:
+    """Rollup changes for an order going from `before` to `after`; None means created or deleted."""
+    deltas: Deltas = defaultdict(dict)
+    if before is not None:
+        add_contribution(deltas, before, categories, -1)
+    if after is not None:
+        add_contribution(deltas, after, categories, 1)
+    return {key: changes for key, changes in deltas.items() if any(round(v, 6) for v in changes.values())}
+
+
+async def product_categories(db, orders: Iterable[dict], session=None) -> Dict[str, str]:
+    """Current categories of the products on order lines that don't carry one."""
+    product_ids = list({item["product_id"] for order in orders if order for item in order["items"] if not item.get("category")})
+    if not product_ids:
+        return {}
+    return {
+        product["id"]: product["category"]
+        async for product in db.products.find({"id": {"$in": product_ids}}, {"_id": 0, "id": 1, "category": 1}, session=session)
+    }
+
+
+def affects_sales(before: Optional[dict], after: Optional[dict]) -> bool:
+    # Moving between two revenue statuses, or two other statuses, changes no rollup
+    return before is None or after is None or (before["status"] in REVENUE_STATUSES) != (after["status"] in REVENUE_STATUSES)
+
+
+async def order_sales_deltas(db, changes: List[Tuple[Optional[dict], Optional[dict]]], session=None) -> Deltas:
+    """Combined deltas for (before, after) pairs of order documents."""
+    changes = [(before, after) for before, after in changes if affects_sales(before, after)]
+    if not changes:
+        return {}
+    categories = await product_categories(db, [doc for pair in changes for doc in pair], session)
+    return merge_deltas(sales_deltas(before, after, categories) for before, after in changes)
+
+
+def merge_deltas(parts: Iterable[Deltas]) -> Deltas:
+    deltas: Deltas = defaultdict(dict)
+    for part in parts:
+        for key, changes_for_key in part.items():
+            for metric, amount in changes_for_key.items():
+                deltas[key][metric] = deltas[key].get(metric, 0) + amount
+    return deltas
+
+
+def rollup_write(key: tuple, metrics: Dict[str, float], inc: bool = True) -> UpdateOne:
+    granularity, bucket, dimension, item_key = key
+    fields = {"granularity": granularity, "bucket": bucket, "dimension": dimension, "key": item_key}
+    if inc:
+        return UpdateOne({"_id": rollup_id(*key)}, {"$inc": metrics, "$setOnInsert": fields}, upsert=True)
+    return UpdateOne({"_id": rollup_id(*key)}, {"$set": {**fields, **metrics}}, upsert=True)
+
+
+async def apply_sales_deltas(db, deltas: Deltas, session=None) -> bool:
+    """$inc the changed rollups in one bulk write; returns whether anything changed."""
+    if not deltas:
+        return False
+    await db[COLLECTION].bulk_write([rollup_write(key, metrics) for key, metrics in deltas.items()], ordered=False, session=session)
+    return True
+
+
+async def backfill_order_categories(db, batch_size: int = 500) -> int:
+    """Stamp the current product category on order lines written without one; returns orders updated."""
+    updated = 0
+    batch = []
+    cursor = db.orders.find({"items": {"$elemMatch": {"category": None}}}, {"_id": 1, "items.product_id": 1, "items.category": 1})
+    async for order in cursor:
+        batch.append(order)
+        if len(batch) >= batch_size:
+            updated += await stamp_categories(db, batch)
+            batch = []
+    if batch:
+        updated += await stamp_categories(db, batch)
+    return updated
+
+
+async def stamp_categories(db, orders: List[dict]) -> int:
+    categories = await product_categories(db, orders)
+    await db.orders.bulk_write([
+        UpdateOne({"_id": order["_id"]}, {"$set": {
+            f"items.{index}.category": categories.get(item["product_id"], UNCATEGORIZED)
+            for index, item in enumerate(order["items"]) if not item.get("category")
+        }})
+        for order in orders
+    ], ordered=False)
+    return len(orders)
+
+
+async def rebuild_sales_rollups(db, since: Optional[datetime] = None) -> int:
+    """Recompute the rollups of orders created since `since` (all orders when None); returns documents written."""
+    categories = {p["id"]: p["category"] async for p in db.products.find({}, {"_id": 0, "id": 1, "category": 1})}
+    query = {}
+    if since:
+        start = bucket_start(since, "day")
+        # Orders not yet migrated hold ISO strings, which compare in date order
+        query = {"$or": [{"created_at": {"$gte": start}}, {"created_at": {"$gte": start.isoformat()}}]}
+    totals: Deltas = defaultdict(dict)
+    async for order in db.orders.find(query, ROLLUP_PROJECTION, batch_size=WRITE_BATCH_SIZE):
+        add_contribution(totals, order, categories, 1)
+
+    await db[COLLECTION].delete_many({"bucket": {"$gte": bucket_start(since, "day")}} if since else {})
+    writes = [rollup_write(key, {m: metrics.get(m, 0) for m in METRICS}, inc=False) for key, metrics in totals.items()]
+    for start in range(0, len(writes), WRITE_BATCH_SIZE):
+        await db[COLLECTION].bulk_write(writes[start:start + WRITE_BATCH_SIZE], ordered=False)
+    return len(writes)
+
+
+def range_bounds(start: date, end: date) -> Tuple[datetime, datetime]:
+    """UTC datetimes covering the days start..end inclusive."""
+    return datetime.combine(start, time(), timezone.utc), datetime.combine(end + timedelta(days=1), time(), timezone.utc)
+
+
+def empty_metrics() -> Dict[str, float]:
+    return {metric: 0 for metric in METRICS}
+
+
+def rounded(metrics: dict) -> dict:
+    return {**{m: metrics.get(m, 0) for m in METRICS}, "revenue": round(metrics.get("revenue", 0), 2)}
+
+
+async def sales_series(db, granularity: str, dimension: str, key: str, start: date, end: date) -> List[dict]:
+    """One point per bucket between start and end (inclusive days), zeros where nothing was sold."""
+    lower, upper = range_bounds(start, end)
+    found = {
+        doc["bucket"].astimezone(timezone.utc): doc
+        async for doc in db[COLLECTION].find(
+            {"granularity": granularity, "dimension": dimension, "key": key, "bucket": {"$gte": lower, "$lt": upper}},
+            {"_id": 0, "bucket": 1, **{m: 1 for m in METRICS}},
+        )
+    }
+    step = timedelta(hours=1) if granularity == "hour" else timedelta(days=1)
+    series = []
+    bucket = lower
+    while bucket < upper:
+        series.append({"bucket": bucket, **rounded(found.get(bucket, empty_metrics()))})
+        bucket += step
+    return series
+
+
+async def sales_breakdown(db, dimension: str, start: date, end: date, sort: str, limit: int) -> List[dict]:
+    """Totals per category or product over start..end (inclusive days), largest `sort` metric first."""
+    lower, upper = range_bounds(start, end)
+    rows = await db[COLLECTION].aggregate([
+        {"$match": {"granularity": "day", "dimension": dimension, "bucket": {"$gte": lower, "$lt": upper}}},
+        {"$group": {"_id": "$key", **{m: {"$sum": f"${m}"} for m in METRICS}}},
+        {"$sort": {sort: -1, "_id": 1}},
+        {"$limit": limit},
+    ]).to_list(limit)
+    return [{"key": row["_id"], **rounded(row)} for row in rows]
+
+
+async def main(since: Optional[str]) -> None:
+    from database import client, db
+    from indexes import ensure_indexes
+
+    await ensure_indexes(db)
+    stamped = await backfill_order_categories(db)
+    if stamped:
+        print(f"🏷️  Stamped categories on {stamped:,} orders")
+    print("📈 Rebuilding sales rollups...")
+    written = await rebuild_sales_rollups(db, datetime.strptime(since, "%Y-%m-%d") if since else None)
+    print(f"✅ Wrote {written:,} rollup documents")
+    client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild the sales rollups from the orders")
+    parser.add_argument("--since", help="only rebuild days from this date (YYYY-MM-DD); default everything")
+    args = parser.parse_args()
+    asyncio.run(main(args.since))
@@ -0,0 +1,102 @@
+"""
+Product search.
+
+Whole-word queries are answered by the weighted `product_search` text index,
+which gives MongoDB's tokenization, English stemming and textScore relevance.
+Partial words typed into the storefront search box don't match a text index,
+so every product also carries `search_prefixes` (prefixes of the words in its
+name, features and colors), a multikey-indexed field used when the text index
+has no hits. search_prefixes is recomputed on every product write. Both
+indexes are declared in indexes.py.
+"""
+from pymongo import ASCENDING, DESCENDING, UpdateOne
+from typing import List, Optional
+import re
+
+MIN_PREFIX_LENGTH = 2
+MAX_PREFIX_LENGTH = 15
+
+PREFIX_FIELDS = ("name", "features", "colors")
+
+# Order of prefix matches, which carry no textScore
+PREFIX_SORT = [("is_best_seller", DESCENDING), ("reviews", DESCENDING), ("id", ASCENDING)]
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN_RE.findall(text.lower())
+
+
+def build_search_prefixes(product: dict) -> List[str]:
+    prefixes = set()
+    for field in PREFIX_FIELDS:
+        value = product.get(field) or []
+        if isinstance(value, str):
+            value = [value]
+        for token in tokenize(" ".join(value)):
+            for end in range(MIN_PREFIX_LENGTH, min(len(token), MAX_PREFIX_LENGTH) + 1):
+                prefixes.add(token[:end])
+    return sorted(prefixes)
+
+
+def with_search_fields(product: dict) -> dict:
+    product['search_prefixes'] = build_search_prefixes(product)
+    return product
+
+
+def text_filter(search: str) -> dict:
+    return {"$text": {"$search": search}}
+
+
+def prefix_filter(search: str) -> Optional[dict]:
+    tokens = [t[:MAX_PREFIX_LENGTH] for t in tokenize(search) if len(t) >= MIN_PREFIX_LENGTH]
+    if not tokens:
+        return None
+    return {"search_prefixes": {"$all": tokens}}
+
+
+async def search_products(collection, search: str, query: dict, projection: dict, skip: int, limit: int) -> List[dict]:
+    """Return one page of products matching `search`, most relevant first.
+
+    `query` holds any extra filters (e.g. category). Text matches are ranked by
+    textScore; when the query has no text match at all, prefix matches are
+    returned ranked by popularity instead.
+    """
+    text_query = {**query, **text_filter(search)}
+    products = await collection.find(
+        text_query,
+        {**projection, "score": {"$meta": "textScore"}}
+    ).sort([("score", {"$meta": "textScore"}), ("id", ASCENDING)]).skip(skip).limit(limit).to_list(limit)
+    if products:
+        for product in products:
+            product.pop('score', None)
+        return products
+
+    # An empty later page of a text search stays empty
+    if skip and await collection.find_one(text_query, {"_id": 1}):
+        return []
+
+    prefix_query = prefix_filter(search)
+    if prefix_query is None:
+        return []
+    return await collection.find(
+        {**query, **prefix_query},
+        projection
+    ).sort(PREFIX_SORT).skip(skip).limit(limit).to_list(limit)
+
+
+async def backfill_search_prefixes(db, batch_size: int = 500) -> int:
+    """Add search_prefixes to products written before search existed."""
+    updated = 0
+    batch = []
+    async for product in db.products.find({"search_prefixes": None}, {"_id": 1, "name": 1, "features": 1, "colors": 1}):
+        batch.append(UpdateOne({"_id": product['_id']}, {"$set": {"search_prefixes": build_search_prefixes(product)}}))
+        if len(batch) >= batch_size:
+            await db.products.bulk_write(batch, ordered=False)
+            updated += len(batch)
+            batch = []
+    if batch:
+        await db.products.bulk_write(batch, ordered=False)
+        updated += len(batch)
+    return updated
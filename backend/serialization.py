@@ -0,0 +1,91 @@
+"""
+Fast JSON encoding for documents read straight from MongoDB.
+
+The regular path validates every row into its Pydantic response_model and then
+serializes the model again. Documents this API wrote itself already have the
+model's shape, so when FAST_JSON_RESPONSES is enabled list endpoints encode
+them directly with orjson. Each row is reshaped to the model's fields, in
+nested models too: static defaults fill missing fields and stored fields the
+model doesn't declare (a text-search score, bookkeeping fields) are dropped,
+so both paths return the same keys. Values are not coerced. The routes keep
+their response_model declarations, so the OpenAPI schema is unchanged.
+"""
+from fastapi import Response
+from pydantic import BaseModel, TypeAdapter
+from typing import Any, Callable, Dict, Optional, Union, get_args, get_origin
+from metrics import PhaseTimer
+import orjson
+import os
+import types
+
+FAST_JSON_RESPONSES = os.environ.get("FAST_JSON_RESPONSES", "false").lower() in ("1", "true", "yes")
+
+_shapers: Dict[type, Callable[[dict], dict]] = {}
+_adapters: Dict[Any, TypeAdapter] = {}
+_MISSING = object()
+
+
+def value_shaper(annotation: Any) -> Optional[Callable[[Any], Any]]:
+    """Reshapes values of `annotation` that contain models; None when there is nothing to do."""
+    origin = get_origin(annotation)
+    if origin in (Union, types.UnionType):
+        args = [arg for arg in get_args(annotation) if arg is not type(None)]
+        return value_shaper(args[0]) if len(args) == 1 else None
+    if origin is list:
+        shape_item = value_shaper(get_args(annotation)[0])
+        return (lambda items: [shape_item(item) for item in items]) if shape_item else None
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return model_shaper(annotation)
+    return None
+
+
+def model_shaper(model: type) -> Callable[[dict], dict]:
+    """Maps a stored document to the model's fields, in their order; default factories are skipped."""
+    shaper = _shapers.get(model)
+    if shaper is None:
+        plan = [
+            (name, _MISSING if field.is_required() or field.default_factory is not None else field.default, value_shaper(field.annotation))
+            for name, field in model.model_fields.items()
+        ]
+
+        def shaper(doc: dict) -> dict:
+            shaped = {}
+            for name, default, shape in plan:
+                value = doc.get(name, _MISSING)
+                if value is _MISSING:
+                    if default is not _MISSING:
+                        shaped[name] = default
+                else:
+                    shaped[name] = shape(value) if shape and value is not None else value
+            return shaped
+
+        _shapers[model] = shaper
+    return shaper
+
+
+def fast_encode(data: Any, response_model: Any) -> bytes:
+    """Encode trusted documents shaped like `response_model` without validating them."""
+    shape = value_shaper(response_model)
+    return orjson.dumps(shape(data) if shape else data, option=orjson.OPT_UTC_Z)
+
+
+def validated_encode(data: Any, response_model: Any) -> bytes:
+    """Validate through `response_model` and serialize, like FastAPI does."""
+    adapter = _adapters.get(response_model)
+    if adapter is None:
+        adapter = _adapters[response_model] = TypeAdapter(response_model)
+    with PhaseTimer("validation"):
+        validated = adapter.validate_python(data)
+    with PhaseTimer("serialization"):
+        return adapter.dump_json(validated)
+
+
+def encode(data: Any, response_model: Any) -> bytes:
+    if FAST_JSON_RESPONSES:
+        with PhaseTimer("serialization"):
+            return fast_encode(data, response_model)
+    return validated_encode(data, response_model)
+
+
+def json_response(data: Any, response_model: Any, headers: Optional[Dict[str, str]] = None) -> Response:
+    return Response(content=encode(data, response_model), media_type="application/json", headers=headers)
@@ -1,10 +1,8 @@
-from fastapi import FastAPI, APIRouter
-from dotenv import load_dotenv
+from fastapi import FastAPI, APIRouter, HTTPException, Request, Response
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
-import os
+from contextlib import asynccontextmanager
+import asyncio
 import logging
-from pathlib import Path
 from pydantic import BaseModel, Field, ConfigDict
 from typing import List
 import uuid
@@ -16,17 +14,59 @@ from routes.order_routes import router as order_router
 from routes.dashboard_routes import router as dashboard_router
 from routes.category_routes import router as category_router
 from routes.settings_routes import router as settings_router
+from routes.auth_routes import router as auth_router
+from routes.admin_routes import router as admin_router
+from routes.upload_routes import router as upload_router
+from routes.dashboard_routes import backfill_stock_quantities
+from indexes import ensure_indexes, index_report, log_index_report
+from search import backfill_search_prefixes
+from category_counts import CATEGORY_RECONCILE_INTERVAL_SECONDS, reconcile_periodically
+from order_snapshot import ORDER_SNAPSHOT_INTERVAL_SECONDS, refresh_periodically as refresh_order_snapshot_periodically
+from images import remove_stale_temp_files
+from auth import load_revoked_tokens, refresh_revoked_tokens_periodically
+from slow_queries import ensure_slow_query_collection, slow_query_log
+from profiling import PROFILE_ID_HEADER, ProfilingMiddleware, ensure_profile_collection
+from metrics import METRICS_BEARER_TOKEN, MetricsMiddleware, monitor_loop_lag, render as render_metrics
+from pagination import NEXT_CURSOR_HEADER
+from database import client, db, warm_pool, pool_stats
 
-ROOT_DIR = Path(__file__).parent
-load_dotenv(ROOT_DIR / '.env')
+async def bootstrap_database():
+    await ensure_slow_query_collection(db)
+    await ensure_profile_collection(db)
+    created = await ensure_indexes(db)
+    for collection_name, names in created.items():
+        logger.info("Created indexes on %s: %s", collection_name, ", ".join(names))
+    log_index_report(await index_report(db))
+    backfilled = await backfill_search_prefixes(db)
+    if backfilled:
+        logger.info("Added search prefixes to %d products", backfilled)
+    stocked = await backfill_stock_quantities(db)
+    if stocked:
+        logger.info("Set a stock quantity of 0 on %d products that had none", stocked)
 
-# MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await warm_pool()
+    await bootstrap_database()
+    await load_revoked_tokens()
+    removed = await asyncio.to_thread(remove_stale_temp_files)
+    if removed:
+        logger.info("Removed %d stale upload temp files", removed)
+    background = [asyncio.create_task(refresh_revoked_tokens_periodically()), asyncio.create_task(monitor_loop_lag())]
+    if slow_query_log.threshold_ms > 0:
+        background.append(asyncio.create_task(slow_query_log.run(db)))
+    if CATEGORY_RECONCILE_INTERVAL_SECONDS > 0:
+        background.append(asyncio.create_task(reconcile_periodically(db)))
+    if ORDER_SNAPSHOT_INTERVAL_SECONDS > 0:
+        background.append(asyncio.create_task(refresh_order_snapshot_periodically(db)))
+    yield
+    for task in background:
+        task.cancel()
+    await asyncio.gather(*background, return_exceptions=True)
+    client.close()
 
 # Create the main app without a prefix
-app = FastAPI(title="SLAYK Admin API", version="1.0.0")
+app = FastAPI(title="SLAYK Admin API", version="1.0.0", lifespan=lifespan)
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
@@ -47,25 +87,29 @@ class StatusCheckCreate(BaseModel):
 async def root():
     return {"message": "SLAYK API v1.0.0"}
 
+@api_router.get("/health")
+async def health():
+    await db.command("ping")
+    return {"status": "ok", "mongo_pool": pool_stats()}
+
+@api_router.get("/metrics", include_in_schema=False)
+async def metrics(request: Request):
+    """Prometheus text exposition for this worker."""
+    if METRICS_BEARER_TOKEN and request.headers.get("authorization") != f"Bearer {METRICS_BEARER_TOKEN}":
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+    return Response(content=render_metrics(pool_stats()), media_type="text/plain; version=0.0.4")
+
 @api_router.post("/status", response_model=StatusCheck)
 async def create_status_check(input: StatusCheckCreate):
     status_dict = input.model_dump()
     status_obj = StatusCheck(**status_dict)
     
-    doc = status_obj.model_dump()
-    doc['timestamp'] = doc['timestamp'].isoformat()
-    
-    _ = await db.status_checks.insert_one(doc)
+    _ = await db.status_checks.insert_one(status_obj.model_dump())
     return status_obj
 
 @api_router.get("/status", response_model=List[StatusCheck])
 async def get_status_checks():
     status_checks = await db.status_checks.find({}, {"_id": 0}).to_list(1000)
-    
-    for check in status_checks:
-        if isinstance(check['timestamp'], str):
-            check['timestamp'] = datetime.fromisoformat(check['timestamp'])
-    
     return status_checks
 
 # Include all routers
@@ -74,6 +118,9 @@ api_router.include_router(order_router)
 api_router.include_router(dashboard_router)
 api_router.include_router(category_router)
 api_router.include_router(settings_router)
+api_router.include_router(auth_router)
+api_router.include_router(admin_router)
+api_router.include_router(upload_router)
 
 # Include the main router in the app
 app.include_router(api_router)
@@ -84,7 +131,11 @@ app.add_middleware(
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, PROFILE_ID_HEADER],
 )
+# Runs inside MetricsMiddleware, whose request context it records phases into
+app.add_middleware(ProfilingMiddleware)
+app.add_middleware(MetricsMiddleware)
 
 # Configure logging
 logging.basicConfig(
@@ -92,7 +143,3 @@ logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 logger = logging.getLogger(__name__)
-
-@app.on_event("shutdown")
-async def shutdown_db_client():
-    client.close()
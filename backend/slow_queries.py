@@ -0,0 +1,209 @@
+"""
+Slow-query log.
+
+CommandMonitor hands every Mongo command slower than SLOW_QUERY_THRESHOLD_MS
+to slow_query_log, along with the route that issued it. Filters, sorts and
+pipelines are reduced to their shape (field names and operators, values
+replaced by "?") so entries group by query shape and never store customer
+data; shapes are stored as JSON strings since they contain operator keys.
+A lifespan task drains the queue off the listener threads, runs an
+`explain` in executionStats verbosity for the docs/keys examined and the
+winning plan (once per shape per SLOW_QUERY_EXPLAIN_INTERVAL_SECONDS; entries
+in between reuse it) and writes the entries to the capped `slow_queries`
+collection.
+"""
+from pymongo.errors import PyMongoError
+from indexes import ensure_capped_collection
+from datetime import datetime, timezone
+from typing import Any, Deque, Dict, List, Optional, Tuple
+from collections import deque
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+# 0 disables the log
+SLOW_QUERY_THRESHOLD_MS = float(os.environ.get("SLOW_QUERY_THRESHOLD_MS", "100"))
+SLOW_QUERY_EXPLAIN_INTERVAL_SECONDS = float(os.environ.get("SLOW_QUERY_EXPLAIN_INTERVAL_SECONDS", "300"))
+SLOW_QUERY_LOG_BYTES = int(os.environ.get("SLOW_QUERY_LOG_BYTES", str(16 * 1024 * 1024)))
+# Entries waiting to be written; beyond this the oldest are dropped
+SLOW_QUERY_QUEUE_SIZE = 1000
+
+COLLECTION = "slow_queries"
+EXPLAINABLE = {"find", "aggregate", "count", "distinct", "findAndModify", "update", "delete"}
+# Parts of a command that describe the query rather than its values
+SHAPE_FIELDS = ("filter", "sort", "projection", "pipeline", "query", "key", "updates", "deletes", "hint")
+# Session and transport fields that explain rejects
+NOT_EXPLAINABLE_FIELDS = {"lsid", "txnNumber", "autocommit", "startTransaction", "readConcern", "writeConcern", "cursor"}
+
+
+def redact(value: Any) -> Any:
+    """Keep field names and operators; replace every value with "?"."""
+    if isinstance(value, dict):
+        return {key: redact(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        # Arrays of documents (pipelines, $or branches) keep their structure; value lists collapse
+        if value and all(isinstance(item, dict) for item in value):
+            return [redact(item) for item in value]
+        return "?"
+    return "?"
+
+
+def query_shape(command_name: str, collection: str, command: dict) -> dict:
+    shape = {"command": command_name, "collection": collection}
+    for field in SHAPE_FIELDS:
+        if field in command:
+            shape[field] = redact(command[field])
+    return shape
+
+
+def shape_id(shape: str) -> str:
+    return hashlib.blake2b(shape.encode(), digest_size=8).hexdigest()
+
+
+def returned_count(command_name: str, reply: dict) -> Optional[int]:
+    cursor = reply.get("cursor")
+    if isinstance(cursor, dict):
+        return len(cursor.get("firstBatch", cursor.get("nextBatch", [])))
+    if command_name in ("count", "update", "delete"):
+        return reply.get("n")
+    return None
+
+
+def plan_stages(plan: dict) -> str:
+    """Compact winning plan, e.g. "LIMIT <- FETCH <- IXSCAN created_at_id"."""
+    stages = []
+    while plan:
+        stage = plan.get("stage", "?")
+        if plan.get("indexName"):
+            stage += f" {plan['indexName']}"
+        stages.append(stage)
+        plan = plan.get("inputStage") or (plan.get("inputStages") or [None])[0]
+    return " <- ".join(stages)
+
+
+def summarize_explain(explain: dict) -> dict:
+    # Aggregations nest the find-layer explain inside their first stage
+    if "queryPlanner" not in explain and explain.get("stages"):
+        explain = explain["stages"][0].get("$cursor", explain)
+    planner = explain.get("queryPlanner", {})
+    winning = planner.get("winningPlan", {})
+    winning = winning.get("queryPlan", winning)
+    stats = explain.get("executionStats", {})
+    return {
+        # Only the stage/index outline; the full plan embeds filter values
+        "plan": plan_stages(winning),
+        "docs_examined": stats.get("totalDocsExamined"),
+        "keys_examined": stats.get("totalKeysExamined"),
+        "n_returned": stats.get("nReturned"),
+        "explain_ms": stats.get("executionTimeMillis"),
+    }
+
+
+class SlowQueryLog:
+    def __init__(self, threshold_ms: float = SLOW_QUERY_THRESHOLD_MS):
+        self.threshold_ms = threshold_ms
+        self._queue: Deque[dict] = deque(maxlen=SLOW_QUERY_QUEUE_SIZE)
+        # shape_id -> (when it was explained, explain summary)
+        self._explained: Dict[str, Tuple[float, dict]] = {}
+
+    def is_slow(self, duration_ms: float) -> bool:
+        return 0 < self.threshold_ms <= duration_ms
+
+    def record(self, command_name: str, collection: str, database: str, command: dict, reply: dict,
+               duration_ms: float, route: Optional[str]) -> None:
+        """Called from the driver's listener threads; only queues the entry."""
+        if command_name == "explain" or collection == COLLECTION:
+            return
+        shape = json.dumps(query_shape(command_name, collection, command), sort_keys=True, default=str)
+        self._queue.append({
+            "shape_id": shape_id(shape),
+            "shape": shape,
+            "command": command_name,
+            "collection": collection,
+            "database": database,
+            "route": route or "background",
+            "duration_ms": round(duration_ms, 3),
+            "returned": returned_count(command_name, reply),
+            "at": datetime.now(timezone.utc),
+            # Kept only until the entry is written, for explain
+            "_command": command if command_name in EXPLAINABLE else None,
+        })
+
+    async def explain(self, client, entry: dict) -> Optional[dict]:
+        """Explain summary for the entry's shape, reusing a recent one when there is one."""
+        command = entry["_command"]
+        if command is None:
+            return None
+        last = self._explained.get(entry["shape_id"])
+        if last is not None and time.monotonic() - last[0] < SLOW_QUERY_EXPLAIN_INTERVAL_SECONDS:
+            return last[1]
+        explained = {k: v for k, v in command.items() if not k.startswith("$") and k not in NOT_EXPLAINABLE_FIELDS}
+        try:
+            summary = summarize_explain(await client[entry["database"]].command(
+                {"explain": explained, "verbosity": "executionStats"}
+            ))
+        except PyMongoError as e:
+            summary = {"explain_error": str(e)}
+        summary["explained_at"] = datetime.now(timezone.utc)
+        self._explained[entry["shape_id"]] = (time.monotonic(), summary)
+        return summary
+
+    async def flush(self, db) -> int:
+        entries = []
+        while self._queue:
+            entry = self._queue.popleft()
+            entry.update(await self.explain(db.client, entry) or {})
+            entry.pop("_command", None)
+            entries.append(entry)
+        if entries:
+            await db[COLLECTION].insert_many(entries, ordered=False)
+        return len(entries)
+
+    async def run(self, db, interval: float = 1.0) -> None:
+        """Background job for the app lifespan."""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.flush(db)
+            except Exception:
+                logger.exception("Writing slow queries failed")
+
+
+async def ensure_slow_query_collection(db) -> None:
+    await ensure_capped_collection(db, COLLECTION, SLOW_QUERY_LOG_BYTES)
+
+
+async def slow_query_report(db, since: datetime, limit: int) -> List[dict]:
+    """Entries since `since` grouped by query shape, most total time first."""
+    return await db[COLLECTION].aggregate([
+        {"$match": {"at": {"$gte": since}}},
+        {"$sort": {"at": 1}},
+        {"$group": {
+            "_id": "$shape_id",
+            "count": {"$sum": 1},
+            "total_ms": {"$sum": "$duration_ms"},
+            "avg_ms": {"$avg": "$duration_ms"},
+            "max_ms": {"$max": "$duration_ms"},
+            "routes": {"$addToSet": "$route"},
+            "first_seen": {"$first": "$at"},
+            "last_seen": {"$last": "$at"},
+            "shape": {"$last": "$shape"},
+            "plan": {"$last": "$plan"},
+            "docs_examined": {"$max": "$docs_examined"},
+            "keys_examined": {"$max": "$keys_examined"},
+            "n_returned": {"$max": "$n_returned"},
+        }},
+        {"$sort": {"total_ms": -1}},
+        {"$limit": limit},
+        {"$project": {"_id": 0, "shape_id": "$_id", "count": 1, "total_ms": 1, "avg_ms": 1, "max_ms": 1, "routes": 1,
+                      "first_seen": 1, "last_seen": 1, "shape": 1, "plan": 1,
+                      "docs_examined": 1, "keys_examined": 1, "n_returned": 1}},
+    ]).to_list(limit)
+
+
+slow_query_log = SlowQueryLog()
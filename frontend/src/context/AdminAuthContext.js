@@ -52,6 +52,10 @@ export const AdminAuthProvider = ({ children }) => {
   };
 
   const logout = () => {
+    if (token) {
+      // Revoke the token server-side; the local session ends either way
+      axios.post(`${API}/auth/logout`, null, { headers: { Authorization: `Bearer ${token}` } }).catch(() => {});
+    }
     localStorage.removeItem('admin_token');
     delete axios.defaults.headers.common['Authorization'];
     setToken(null);
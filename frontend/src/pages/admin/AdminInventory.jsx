@@ -13,20 +13,42 @@ import {
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 const API = `${BACKEND_URL}/api`;
+const PAGE_SIZE = 50;
+const BUCKETS = ['out_of_stock', 'low_stock', 'in_stock'];
 
 const AdminInventory = () => {
   const [inventory, setInventory] = useState(null);
   const [loading, setLoading] = useState(true);
   const [searchTerm, setSearchTerm] = useState('');
   const [editingStock, setEditingStock] = useState({});
+  const [searchResults, setSearchResults] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(null);
 
   useEffect(() => {
     fetchInventory();
   }, []);
 
+  // Buckets are paged, so search asks the API instead of filtering the loaded rows
+  useEffect(() => {
+    const term = searchTerm.trim();
+    if (!term) {
+      setSearchResults(null);
+      return;
+    }
+    const timer = setTimeout(async () => {
+      try {
+        const response = await axios.get(`${API}/products`, { params: { search: term, limit: 100 } });
+        setSearchResults(response.data);
+      } catch (error) {
+        console.error('Failed to search products:', error);
+      }
+    }, 300);
+    return () => clearTimeout(timer);
+  }, [searchTerm]);
+
   const fetchInventory = async () => {
     try {
-      const response = await axios.get(`${API}/dashboard/inventory`);
+      const response = await axios.get(`${API}/dashboard/inventory`, { params: { limit: PAGE_SIZE } });
       setInventory(response.data);
     } catch (error) {
       console.error('Failed to fetch inventory:', error);
@@ -35,6 +57,24 @@ const AdminInventory = () => {
     }
   };
 
+  const loadMore = async (bucket) => {
+    setLoadingMore(bucket);
+    try {
+      const response = await axios.get(`${API}/dashboard/inventory/${bucket}`, {
+        params: { limit: PAGE_SIZE, cursor: inventory.next_cursors[bucket] }
+      });
+      setInventory(prev => ({
+        ...prev,
+        [bucket]: [...prev[bucket], ...response.data],
+        next_cursors: { ...prev.next_cursors, [bucket]: response.headers['x-next-cursor'] || null }
+      }));
+    } catch (error) {
+      console.error('Failed to load more products:', error);
+    } finally {
+      setLoadingMore(null);
+    }
+  };
+
   const handleStockChange = (productId, value) => {
     setEditingStock(prev => ({ ...prev, [productId]: value }));
   };
@@ -53,6 +93,7 @@ const AdminInventory = () => {
         delete updated[productId];
         return updated;
       });
+      setSearchResults(prev => prev && prev.map(p => (p.id === productId ? { ...p, stock_quantity: newStock } : p)));
       fetchInventory();
     } catch (error) {
       alert('Failed to update stock');
@@ -67,14 +108,31 @@ const AdminInventory = () => {
     }).format(price);
   };
 
-  const allProducts = inventory ? [
-    ...inventory.out_of_stock,
-    ...inventory.low_stock,
-    ...inventory.in_stock
-  ] : [];
+  const threshold = inventory?.summary?.low_stock_threshold ?? 10;
+  const bucketOf = (product) => {
+    const stock = product.stock_quantity ?? 0;
+    if (stock <= 0) return 'out_of_stock';
+    return stock < threshold ? 'low_stock' : 'in_stock';
+  };
+
+  // While searching, the tables show the matching products in their buckets
+  const shown = searchResults
+    ? Object.fromEntries(BUCKETS.map(bucket => [bucket, searchResults.filter(p => bucketOf(p) === bucket)]))
+    : inventory;
 
-  const filteredProducts = allProducts.filter(p => 
-    p.name.toLowerCase().includes(searchTerm.toLowerCase())
+  const renderLoadMore = (bucket) => (
+    !searchResults && inventory?.next_cursors?.[bucket] && (
+      <div className="p-4 border-t border-gray-100 text-center">
+        <Button
+          variant="outline"
+          size="sm"
+          disabled={loadingMore === bucket}
+          onClick={() => loadMore(bucket)}
+        >
+          {loadingMore === bucket ? 'Loading...' : `Load more (${inventory[bucket].length} of ${inventory.summary[`${bucket}_count`]})`}
+        </Button>
+      </div>
+    )
   );
 
   if (loading) {
@@ -105,7 +163,7 @@ const AdminInventory = () => {
           <div className="bg-white rounded-xl p-6 shadow-sm border-l-4 border-orange-500">
             <div className="flex items-center justify-between">
               <div>
-                <p className="text-sm text-gray-500 mb-1">Low Stock (&lt;10)</p>
+                <p className="text-sm text-gray-500 mb-1">Low Stock (&lt;{threshold})</p>
                 <p className="text-3xl font-bold text-orange-600">{inventory?.summary?.low_stock_count || 0}</p>
               </div>
               <AlertTriangle className="text-orange-500" size={32} />
@@ -136,7 +194,7 @@ const AdminInventory = () => {
         </div>
 
         {/* Out of Stock */}
-        {inventory?.out_of_stock?.length > 0 && (
+        {shown?.out_of_stock?.length > 0 && (
           <div className="bg-white rounded-xl shadow-sm overflow-hidden">
             <div className="p-4 bg-red-50 border-b border-red-100">
               <h3 className="font-semibold text-red-700 flex items-center gap-2">
@@ -155,7 +213,7 @@ const AdminInventory = () => {
                   </tr>
                 </thead>
                 <tbody className="divide-y divide-gray-100">
-                  {inventory.out_of_stock.filter(p => p.name.toLowerCase().includes(searchTerm.toLowerCase())).map((product) => (
+                  {shown.out_of_stock.map((product) => (
                     <tr key={product.id} className="hover:bg-gray-50">
                       <td className="px-6 py-4">
                         <div className="flex items-center gap-3">
@@ -190,16 +248,17 @@ const AdminInventory = () => {
                 </tbody>
               </table>
             </div>
+            {renderLoadMore('out_of_stock')}
           </div>
         )}
 
         {/* Low Stock */}
-        {inventory?.low_stock?.length > 0 && (
+        {shown?.low_stock?.length > 0 && (
           <div className="bg-white rounded-xl shadow-sm overflow-hidden">
             <div className="p-4 bg-orange-50 border-b border-orange-100">
               <h3 className="font-semibold text-orange-700 flex items-center gap-2">
                 <AlertTriangle size={18} />
-                Low Stock Products (Less than 10)
+                Low Stock Products (Less than {threshold})
               </h3>
             </div>
             <div className="overflow-x-auto">
@@ -213,7 +272,7 @@ const AdminInventory = () => {
                   </tr>
                 </thead>
                 <tbody className="divide-y divide-gray-100">
-                  {inventory.low_stock.filter(p => p.name.toLowerCase().includes(searchTerm.toLowerCase())).map((product) => (
+                  {shown.low_stock.map((product) => (
                     <tr key={product.id} className="hover:bg-gray-50">
                       <td className="px-6 py-4">
                         <div className="flex items-center gap-3">
@@ -250,6 +309,7 @@ const AdminInventory = () => {
                 </tbody>
               </table>
             </div>
+            {renderLoadMore('low_stock')}
           </div>
         )}
 
@@ -272,7 +332,7 @@ const AdminInventory = () => {
                 </tr>
               </thead>
               <tbody className="divide-y divide-gray-100">
-                {inventory?.in_stock?.filter(p => p.name.toLowerCase().includes(searchTerm.toLowerCase())).map((product) => (
+                {shown?.in_stock?.map((product) => (
                   <tr key={product.id} className="hover:bg-gray-50">
                     <td className="px-6 py-4">
                       <div className="flex items-center gap-3">
@@ -309,6 +369,7 @@ const AdminInventory = () => {
               </tbody>
             </table>
           </div>
+          {renderLoadMore('in_stock')}
         </div>
       </div>
     </AdminLayout>
@@ -21,6 +21,7 @@ const AdminProducts = () => {
   const [loading, setLoading] = useState(true);
   const [searchTerm, setSearchTerm] = useState('');
   const [showModal, setShowModal] = useState(false);
+  const [uploading, setUploading] = useState(false);
   const [editingProduct, setEditingProduct] = useState(null);
   const [formData, setFormData] = useState({
     name: '',
@@ -173,6 +174,33 @@ const AdminProducts = () => {
     }
   };
 
+  const handleImageUpload = async (e) => {
+    const file = e.target.files[0];
+    e.target.value = '';
+    if (!file) return;
+
+    setUploading(true);
+    try {
+      // The file is sent as the raw body; the server stores it once per content hash
+      const response = await axios.post(`${API}/uploads/images`, file, {
+        headers: { 'Content-Type': file.type || 'application/octet-stream' }
+      });
+      const { variants } = response.data;
+      setFormData(prev => {
+        const images = prev.images.split(',').map(i => i.trim()).filter(i => i);
+        return {
+          ...prev,
+          image: variants.card.webp,
+          images: [...new Set([...images, variants.detail.webp])].join(', ')
+        };
+      });
+    } catch (error) {
+      alert(error.response?.data?.detail || 'Failed to upload image');
+    } finally {
+      setUploading(false);
+    }
+  };
+
   const handleDelete = async (productId) => {
     if (!window.confirm('Are you sure you want to delete this product?')) return;
     
@@ -392,15 +420,28 @@ const AdminProducts = () => {
 
                 <div>
                   <label className="block text-sm font-medium text-gray-700 mb-1">Image URL *</label>
-                  <input
-                    type="url"
-                    name="image"
-                    value={formData.image}
-                    onChange={handleInputChange}
-                    className="w-full px-3 py-2 border border-gray-200 rounded-lg focus:outline-none focus:border-[#C4704B]"
-                    placeholder="https://example.com/image.jpg"
-                    required
-                  />
+                  <div className="flex gap-2">
+                    <input
+                      type="text"
+                      name="image"
+                      value={formData.image}
+                      onChange={handleInputChange}
+                      className="w-full px-3 py-2 border border-gray-200 rounded-lg focus:outline-none focus:border-[#C4704B]"
+                      placeholder="https://example.com/image.jpg"
+                      required
+                    />
+                    <label className="flex items-center gap-1 px-3 py-2 border border-gray-200 rounded-lg text-sm text-gray-700 cursor-pointer hover:bg-gray-50 whitespace-nowrap">
+                      <Upload className="w-4 h-4" />
+                      {uploading ? 'Uploading...' : 'Upload'}
+                      <input
+                        type="file"
+                        accept="image/jpeg,image/png,image/webp"
+                        onChange={handleImageUpload}
+                        disabled={uploading}
+                        className="hidden"
+                      />
+                    </label>
+                  </div>
                 </div>
 
                 <div className="grid sm:grid-cols-2 gap-4">
@@ -0,0 +1,20 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+# The backend modules import each other as top-level modules
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+
+from mongomock_motor import AsyncMongoMockClient
+
+import database
+
+
+@pytest.fixture
+def db(monkeypatch):
+    """An in-memory database; run_transaction takes its standalone path."""
+    monkeypatch.setattr(database, "_supports_transactions", False)
+    return AsyncMongoMockClient(tz_aware=True)["slayk_test"]
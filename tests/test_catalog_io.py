@@ -0,0 +1,46 @@
+import asyncio
+
+from catalog_io import import_products
+
+
+async def rows(*products):
+    for number, product in enumerate(products, start=1):
+        yield number, product, None
+
+
+PRODUCT = {
+    "name": "Linen Shirt",
+    "slug": "linen-shirt",
+    "category": "men",
+    "price": 40,
+    "original_price": 50,
+    "description": "A shirt",
+    "features": ["Breathable"],
+    "image": "https://example.com/shirt.jpg",
+    "stock_quantity": 3,
+    "in_stock": False,
+}
+
+
+def test_partial_row_keeps_fields_it_omits(db):
+    asyncio.run(import_products(db, rows(PRODUCT)))
+    partial = {field: PRODUCT[field] for field in ("name", "slug", "category", "original_price", "description", "image")}
+    report = asyncio.run(import_products(db, rows({**partial, "price": 35})))
+
+    product = asyncio.run(db.products.find_one({"slug": "linen-shirt"}))
+    assert report["updated"] == 1
+    assert product["price"] == 35
+    assert product["stock_quantity"] == 3
+    assert product["in_stock"] is False
+    assert product["features"] == ["Breathable"]
+    assert "breathable" in product["search_prefixes"]
+
+
+def test_new_product_gets_model_defaults(db):
+    row = {field: value for field, value in PRODUCT.items() if field not in ("stock_quantity", "in_stock")}
+    asyncio.run(import_products(db, rows(row)))
+
+    product = asyncio.run(db.products.find_one({"slug": "linen-shirt"}))
+    assert product["stock_quantity"] == 100
+    assert product["in_stock"] is True
+    assert product["reviews"] == 0
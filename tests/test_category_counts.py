@@ -0,0 +1,44 @@
+import asyncio
+from types import SimpleNamespace
+
+from category_counts import reconcile_category_counts
+
+
+class RacingProducts:
+    """db.products whose aggregate lets a concurrent product write land first."""
+
+    def __init__(self, products, race):
+        self.products = products
+        self.race = race
+
+    async def aggregate(self, pipeline):
+        await self.race()
+        async for row in self.products.aggregate(pipeline):
+            yield row
+
+
+async def seed(db, count: int, products: int) -> None:
+    await db.categories.insert_one({"slug": "men", "name": "Men", "count": count})
+    await db.products.insert_many([{"slug": f"p{i}", "category": "men"} for i in range(products)])
+
+
+def test_reconcile_corrects_and_reports_drift(db):
+    asyncio.run(seed(db, count=5, products=2))
+
+    corrections = asyncio.run(reconcile_category_counts(db))
+
+    assert corrections == {"men": {"from": 5, "to": 2}}
+    assert asyncio.run(db.categories.find_one({"slug": "men"}))["count"] == 2
+
+
+def test_concurrent_write_reaching_the_target_is_not_reported(db):
+    asyncio.run(seed(db, count=3, products=2))
+
+    async def concurrent_delete():
+        await db.categories.update_one({"slug": "men"}, {"$inc": {"count": -1}})
+
+    racing = SimpleNamespace(categories=db.categories, products=RacingProducts(db.products, concurrent_delete))
+    corrections = asyncio.run(reconcile_category_counts(racing))
+
+    assert corrections == {}
+    assert asyncio.run(db.categories.find_one({"slug": "men"}))["count"] == 2
@@ -0,0 +1,30 @@
+from datetime import datetime, timezone
+
+import numpy as np
+
+from order_snapshot import flatten
+
+
+def order(order_id: str, created_at, product_id: str) -> dict:
+    return {
+        "id": order_id,
+        "status": "Delivered",
+        "created_at": created_at,
+        "total": 10.0,
+        "shipping_address": {"email": "a@example.com"},
+        "items": [{"product_id": product_id, "product_name": "Shirt", "quantity": 1, "price": 10.0}],
+    }
+
+
+def test_flatten_reads_legacy_string_timestamps_and_skips_unreadable_ones():
+    columns = flatten([
+        order("bad", "not a date", "p0"),
+        order("legacy", "2024-03-05T10:30:00Z", "p1"),
+        order("current", datetime(2024, 3, 6, tzinfo=timezone.utc), "p2"),
+    ])
+
+    assert columns["orders"]["id"].tolist() == [b"legacy", b"current"]
+    assert columns["orders"]["created_at"].tolist() == [datetime(2024, 3, 5, 10, 30), datetime(2024, 3, 6)]
+    # Item rows point at the orders that were kept
+    assert columns["items"]["product_id"].tolist() == [b"p1", b"p2"]
+    assert np.array_equal(columns["items"]["order"], [0, 1])
@@ -0,0 +1,70 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+
+from models import BulkOrderUpdate, OrderUpdate
+from routes import order_routes
+from sales_rollups import COLLECTION, rebuild_sales_rollups
+
+LEGACY_ORDER = {
+    "id": "order-1",
+    "order_number": "SLAYK-00000001",
+    "items": [{"product_id": "p1", "product_name": "Shirt", "product_image": "img", "quantity": 2, "price": 10.0, "category": "men"}],
+    "shipping_address": {"first_name": "A", "last_name": "B", "email": "a@example.com", "address": "1 Road",
+                         "city": "Pune", "state": "MH", "pincode": "411001", "phone": "9999999999"},
+    "payment_method": "cod",
+    "subtotal": 20.0,
+    "shipping": 0.0,
+    "total": 20.0,
+    "status": "Processing",
+    # Written by a release that stored timestamps as ISO strings, not yet migrated
+    "created_at": "2024-03-05T10:30:00.000000+00:00",
+    "updated_at": "2024-03-05T10:30:00.000000+00:00",
+}
+
+
+@pytest.fixture
+def orders_db(db, monkeypatch):
+    monkeypatch.setattr(order_routes, "db", db)
+    asyncio.run(db.orders.insert_one(dict(LEGACY_ORDER)))
+    asyncio.run(rebuild_sales_rollups(db))
+    return db
+
+
+def day_total(db) -> dict:
+    return asyncio.run(db[COLLECTION].find_one({"_id": "day|2024-03-05T00|total|"}))
+
+
+def test_rebuild_buckets_legacy_string_timestamps(orders_db):
+    assert day_total(orders_db)["revenue"] == 20.0
+    asyncio.run(rebuild_sales_rollups(orders_db, since=datetime(2024, 3, 1)))
+    assert day_total(orders_db)["revenue"] == 20.0
+
+
+def test_status_change_on_legacy_order_moves_rollups(orders_db):
+    updated = asyncio.run(order_routes.update_order("order-1", OrderUpdate(status="Cancelled")))
+
+    assert updated["status"] == "Cancelled"
+    totals = day_total(orders_db)
+    assert totals["orders"] == 0
+    assert totals["revenue"] == 0
+    assert totals["placed"] == 1
+
+
+def test_deleting_legacy_order_removes_it_from_rollups(orders_db):
+    asyncio.run(order_routes.delete_order("order-1"))
+
+    assert asyncio.run(orders_db.orders.count_documents({})) == 0
+    totals = day_total(orders_db)
+    assert totals["placed"] == 0
+    assert totals["revenue"] == 0
+
+
+def test_bulk_status_change_on_legacy_order_moves_rollups(orders_db):
+    response = asyncio.run(order_routes.bulk_update_orders([BulkOrderUpdate(order_id="order-1", status="Cancelled")]))
+
+    assert response.updated == 1
+    totals = day_total(orders_db)
+    assert totals["orders"] == 0
+    assert totals["revenue"] == 0